@@ -0,0 +1,52 @@
+"""
+將 data/mygo.json 編譯成 MyGO 搜尋用的索引檔
+
+MyGo cog 載入時會直接 mmap 這個檔案，不必每次解析 JSON 與重建索引。
+更新 mygo.json 後請重新執行：
+
+    python build_mygo_index.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from src.constants import MYGO_FILE, MYGO_INDEX_FILE
+from src.utils.mygo_index import MmapQuoteIndex, write_artifact
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="編譯 MyGO 台詞搜尋索引")
+    parser.add_argument("--input", default=MYGO_FILE, help="台詞 JSON 檔")
+    parser.add_argument("--output", default=MYGO_INDEX_FILE, help="輸出的索引檔")
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, "r", encoding="utf-8") as f:
+            quotes = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"❌ 無法讀取 {args.input}：{e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index = write_artifact(quotes, args.output)
+    elapsed = time.perf_counter() - start
+
+    # 以 mmap 重新載入，確認輸出的檔案可以正常使用
+    loaded = MmapQuoteIndex(args.output)
+    if len(loaded) != len(index) or list(loaded.texts) != list(index.texts):
+        print("❌ 索引檔驗證失敗")
+        sys.exit(1)
+
+    size = os.path.getsize(args.output)
+    print(
+        f"✅ 已將 {len(quotes)} 句台詞編譯至 {args.output}"
+        f"（{size / 1024:.0f} KB，耗時 {elapsed:.2f} 秒）"
+    )
+
+
+if __name__ == "__main__":
+    main()
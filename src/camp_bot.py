@@ -17,6 +17,7 @@ from discord.ext import commands
 
 from src import config
 from src.utils.user_data import user_data_manager
+from src.utils import image_gen
 
 
 class CampBot:
@@ -109,15 +110,26 @@ class CampBot:
             return
 
         async with self.bot:
-            # 載入用戶資料
+            # 載入用戶資料並啟動背景寫檔任務
             await user_data_manager.load_data()
+            user_data_manager.start_flusher()
+            # 舊格式資料在背景逐批升級，不阻塞登入
+            user_data_manager.start_migration()
+            # 在背景預先建立圖片生成用的 Gradio 客戶端
+            image_gen.start()
 
-            # 載入功能模組
-            await self.load_cogs()
-
-            # 啟動機器人
-            print("🚀 機器人即將啟動...")
-            await self.bot.start(config.DISCORD_TOKEN)
+            try:
+                # 載入功能模組
+                await self.load_cogs()
+
+                # 啟動機器人
+                print("🚀 機器人即將啟動...")
+                await self.bot.start(config.DISCORD_TOKEN)
+            finally:
+                # 關閉前寫入尚未保存的用戶資料
+                await user_data_manager.close()
+                # 停止圖片生成的 worker 並關閉連線
+                await image_gen.close()
 
 
 async def main():
@@ -4,6 +4,8 @@ from discord.ext import commands
 
 from src.utils.achievements import AchievementManager
 from src.utils.user_data import user_data_manager
+from src.utils.llm import get_cache_stats, get_scheduler_stats
+from src.utils.image_gen import get_client_pool_stats
 from src.constants import Emojis, Colors
 from src import config
 
@@ -131,6 +133,41 @@ class Admin(commands.Cog):
             inline=True,
         )
 
+        cache_stats = get_cache_stats()
+        if cache_stats:
+            embed.add_field(
+                name="🧠 LLM 快取",
+                value=(
+                    f"命中: `{cache_stats['hits']}`（磁碟 `{cache_stats['disk_hits']}`）\n"
+                    f"未命中: `{cache_stats['misses']}`\n"
+                    f"命中率: `{cache_stats['hit_rate']:.0%}`"
+                ),
+                inline=True,
+            )
+
+        scheduler_stats = get_scheduler_stats()
+        embed.add_field(
+            name="🚦 LLM 排程",
+            value=(
+                f"進行中: `{scheduler_stats['active']}`，排隊: `{scheduler_stats['queued']}`"
+                f"（背景 `{scheduler_stats['queued_background']}`）\n"
+                f"丟棄的背景請求: `{scheduler_stats['shed']}`\n"
+                f"429 次數: `{scheduler_stats['rate_limited']}`"
+            ),
+            inline=True,
+        )
+
+        pool_stats = get_client_pool_stats()
+        embed.add_field(
+            name="🎨 圖片生成客戶端",
+            value=(
+                f"閒置: `{pool_stats['idle']}`，使用中: `{pool_stats['in_use']}`"
+                f"（上限 `{pool_stats['size']}`）\n"
+                f"重複使用: `{pool_stats['reused']}`，重建: `{pool_stats['discarded']}`"
+            ),
+            inline=True,
+        )
+
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(
@@ -161,12 +198,7 @@ class Admin(commands.Cog):
     )
     async def reset_daily_data(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        count = 0
-        for user_data in self.user_data.users.values():
-            if user_data.get("last_sign_in"):
-                user_data["last_sign_in"] = None
-                count += 1
-        await self.user_data.update_user_data(0, {})
+        count = await self.user_data.reset_all_sign_ins()
         await interaction.followup.send(
             f"✅ 已重置 {count} 位用戶的每日簽到數據！所有用戶現在都可以重新簽到。",
             ephemeral=True,
@@ -298,17 +330,20 @@ class Admin(commands.Cog):
     async def modify_money(
         self, interaction: discord.Interaction, user: discord.Member, amount: int
     ):
-        user_data = await self.user_data.get_user(user.id, user)
-        old_money = user_data.get("money", 0)
-        user_data["money"] = max(0, old_money + amount)
-        await self.user_data.update_user_data(user.id, user_data)
+        def apply(user_data: dict) -> int:
+            old_money = user_data.get("money", 0)
+            user_data["money"] = max(0, old_money + amount)
+            return old_money
+
+        old_money = await self.user_data.update_fields(user, apply)
+        user_data = await self.user_data.get_user(user)
         action = "增加" if amount > 0 else "減少"
         await interaction.response.send_message(
             f"✅ 已為 {user.mention} {action} {abs(amount)} 元！\n"
             f"原有金錢: {old_money} 元 → 現有金錢: {user_data['money']} 元",
             ephemeral=True,
         )
-        await AchievementManager.check_money_achievements(user.id, user_data_manager['money'], self.bot)
+        await AchievementManager.check_money_achievements(user.id, user_data["money"], self.bot)
 
     @commands.Cog.listener()
     async def on_app_command_error(
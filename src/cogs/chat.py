@@ -6,7 +6,9 @@ import discord
 from discord.ext import commands
 
 from src.utils.prompt import BOT_PROMPT
-from src.utils.llm import llm_model
+from src import config
+from src.utils.llm import generate_content, llm_model, stream_content
+from src.utils.progressive_message import ProgressiveMessage, split_message
 import datetime
 
 from src.utils.achievements import achievement_manager
@@ -81,18 +83,46 @@ class Chat(commands.Cog):
             await message.channel.send("找我有什麼事嗎？")
             return
 
+        if config.LLM_STREAMING_ENABLED:
+            await self._stream_llm_response(message.channel, prompt)
+            return
+
         async with message.channel.typing():
             try:
-                response = await self.model.generate_content_async([BOT_PROMPT, prompt])
-                # Discord 訊息長度限制為 2000 字元
-                if len(response.text) > 2000:
-                    await message.channel.send(response.text[:1990] + "...")
-                else:
-                    await message.channel.send(response.text)
+                response = await generate_content([BOT_PROMPT, prompt])
+                # Discord 訊息長度限制為 2000 字元，過長的回應分成多則訊息
+                for part in split_message(response.text):
+                    await message.channel.send(part)
             except Exception as e:
                 await message.channel.send("抱歉，我的腦袋好像有點短路了... 😵")
                 print(f"使用 Gemini 生成內容時發生錯誤: {e}")
 
+    async def _stream_llm_response(self, channel: discord.abc.Messageable, prompt: str):
+        """以串流方式生成回應，邊生成邊編輯訊息"""
+
+        async def edit(sent: discord.Message, content: str):
+            await sent.edit(content=content)
+
+        reply = ProgressiveMessage(
+            channel.send, edit, edit_interval=config.LLM_STREAM_EDIT_INTERVAL
+        )
+        async with channel.typing():
+            try:
+                await reply.consume(stream_content([BOT_PROMPT, prompt]))
+            except Exception as e:
+                print(f"使用 Gemini 串流生成內容時發生錯誤: {e}")
+                if reply.has_content:
+                    try:
+                        await reply.finish("……（回應中斷了）")
+                    except discord.HTTPException:
+                        pass
+                else:
+                    await channel.send("抱歉，我的腦袋好像有點短路了... 😵")
+                return
+
+        if not reply.has_content:
+            await channel.send("抱歉，我的腦袋好像有點短路了... 😵")
+
 
 async def setup(bot: commands.Bot):
     """Set up the Chat cog."""
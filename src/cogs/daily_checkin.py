@@ -3,6 +3,7 @@
 
 整合了簽到和抽籤功能，用戶簽到後會自動抽取今日運勢，
 並根據運勢等級獲得不同的金錢獎勵，同時顯示隨機引言和生成圖片。
+圖片優先使用背景預先生成好的，沒有現成圖片時先送出文字版本，生成後再補上圖片。
 """
 
 import discord
@@ -16,7 +17,10 @@ from io import BytesIO
 # 導入共享的 user_data_manager 實例，確保資料操作的同步與一致性
 from src.utils.user_data import user_data_manager
 from src.utils.achievements import AchievementManager
+from src.utils import image_gen
 from src.utils.image_gen import generate_image
+from src.utils.image_postprocess import image_filename
+from src.utils.fortune_pool import FortuneImagePool
 from src.constants import FORTUNE_LEVELS, QUOTE_REPLACEMENTS, ACG_QUOTES_FILE
 from src import config
 
@@ -29,6 +33,25 @@ class DailyCheckin(commands.Cog):
         # 載入 ACG 名言
         self.quotes = self._load_quotes()
         self.checkin_count: dict[datetime.date, int] = {}
+        # 預先生成的「語錄 + 圖片」，在 cog_load 啟動背景補充
+        self.image_pool = FortuneImagePool(
+            pick_quote=self._pick_quote,
+            generate=generate_image,
+            is_idle=image_gen.is_idle,
+            target_size=config.FORTUNE_IMAGE_POOL_SIZE,
+            refill_interval=config.FORTUNE_IMAGE_POOL_REFILL_INTERVAL,
+        )
+        # 簽到後才補上圖片的背景任務
+        self._late_image_tasks: set[asyncio.Task] = set()
+
+    async def cog_load(self):
+        if config.HUGGINGFACE_TOKEN:
+            self.image_pool.start()
+
+    async def cog_unload(self):
+        await self.image_pool.stop()
+        for task in self._late_image_tasks:
+            task.cancel()
 
     def _load_quotes(self) -> list:
         """載入 ACG 名言"""
@@ -90,8 +113,14 @@ class DailyCheckin(commands.Cog):
                 user_id, "attendance_award", self.bot
             )
             
-        # 抽取今日運勢
-        fortune, color, quote = self._get_random_fortune()
+        # 抽取今日運勢；有預先生成的圖片時直接使用該圖片的語錄
+        ready = self.image_pool.take() if config.HUGGINGFACE_TOKEN else None
+        if ready:
+            quote, image_bytes = ready
+            fortune, color = self._get_random_fortune_level()
+        else:
+            image_bytes = None
+            fortune, color, quote = self._get_random_fortune()
 
         # 根據運勢等級計算金錢獎勵
         base_reward = self._calculate_fortune_reward(fortune)
@@ -127,36 +156,36 @@ class DailyCheckin(commands.Cog):
             text=f"為 {interaction.user.display_name} 抽取 | 總金錢: {user['money']} 元"
         )
 
-        # 嘗試生成圖片（添加超時保護）
-        image_bytes = None
-        try:
-            image_bytes = await asyncio.wait_for(
-                self._generate_fortune_image(quote), timeout=30.0
-            )
-        except asyncio.TimeoutError:
-            print("⏰ 圖片生成超時，將只顯示文字版本")
-        except (ConnectionError, ValueError, ImportError) as e:
-            print(f"❌ 圖片生成失敗: {e}")
-
-        # 根據圖片生成結果決定回傳方式
+        # 有現成圖片時一起送出；否則先送出文字版本，圖片生成後再補上
         if image_bytes:
-            file = discord.File(image_bytes, filename="fortune.png")
-            embed.set_image(url="attachment://fortune.png")
+            filename = image_filename("fortune", image_bytes)
+            file = discord.File(image_bytes, filename=filename)
+            embed.set_image(url=f"attachment://{filename}")
             await interaction.followup.send(embed=embed, file=file)
         else:
-            await interaction.followup.send(embed=embed)
+            message = await interaction.followup.send(embed=embed, wait=True)
+            if config.HUGGINGFACE_TOKEN:
+                task = asyncio.create_task(self._attach_late_image(message, embed, quote))
+                self._late_image_tasks.add(task)
+                task.add_done_callback(self._late_image_tasks.discard)
             
         # 追蹤功能使用
         await AchievementManager.track_feature_usage(interaction.user.id, "checkin", self.bot)
 
     def _get_random_fortune(self) -> tuple[str, int, str]:
         """隨機取得運勢和名言"""
-        # 使用權重來選擇運勢
+        fortune, color = self._get_random_fortune_level()
+        return fortune, color, self._pick_quote()
+
+    def _get_random_fortune_level(self) -> tuple[str, int]:
+        """依權重隨機取得運勢等級與顏色"""
         weights = [weight for _, _, weight in FORTUNE_LEVELS]
         chosen_fortune = random.choices(FORTUNE_LEVELS, weights=weights, k=1)[0]
         fortune, color, _ = chosen_fortune
+        return fortune, color
 
-        # 隨機選擇一個名言並處理替換
+    def _pick_quote(self) -> str:
+        """隨機選擇一個名言並處理替換"""
         raw_quote = (
             random.choice(self.quotes) if self.quotes else "今天也要元氣滿滿喔！"
         )
@@ -165,7 +194,7 @@ class DailyCheckin(commands.Cog):
         for old, new in QUOTE_REPLACEMENTS.items():
             quote = quote.replace(old, new)
 
-        return fortune, color, quote
+        return quote
 
     def _calculate_fortune_reward(self, fortune: str) -> int:
         """根據運勢等級計算金錢獎勵"""
@@ -181,6 +210,24 @@ class DailyCheckin(commands.Cog):
         }
         return fortune_rewards.get(fortune, 100)
 
+    async def _attach_late_image(
+        self, message: discord.WebhookMessage, embed: discord.Embed, quote: str
+    ):
+        """圖片生成完成後，把圖片補到已送出的簽到訊息上"""
+        # 背景任務的例外沒有人接手，全部在這裡記錄；簽到訊息維持文字版本
+        try:
+            image_bytes = await self._generate_fortune_image(quote)
+            if not image_bytes:
+                print("⏰ 圖片生成失敗，簽到訊息只顯示文字版本")
+                return
+
+            filename = image_filename("fortune", image_bytes)
+            file = discord.File(image_bytes, filename=filename)
+            embed.set_image(url=f"attachment://{filename}")
+            await message.edit(embed=embed, attachments=[file])
+        except Exception as e:
+            print(f"⚠️ 補上運勢圖片失敗: {e}")
+
     async def _generate_fortune_image(self, quote: str) -> BytesIO | None:
         """生成運勢圖片"""
         # 如果沒有配置 HUGGINGFACE_TOKEN，則跳過圖片生成
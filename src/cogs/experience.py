@@ -7,7 +7,6 @@
 import discord
 from discord.ext import commands
 import random
-import asyncio
 
 # 導入共享的 user_data_manager 以確保資料操作的同步與一致性
 from src.utils.user_data import user_data_manager
@@ -20,8 +19,10 @@ class GameEvents(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # 為每個使用者的經驗值操作建立一個鎖，防止同時處理多條訊息時發生競爭條件
-        self.user_exp_locks: dict[int, asyncio.Lock] = {}
+
+    async def cog_unload(self):
+        """卸載時立即寫入尚未保存的用戶資料"""
+        await user_data_manager.flush()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -34,93 +35,96 @@ class GameEvents(commands.Cog):
         ):
             return
 
-        user_id = message.author.id
-        user_obj = message.author
-
-        # 獲取或為該使用者建立一個鎖
-        if user_id not in self.user_exp_locks:
-            self.user_exp_locks[user_id] = asyncio.Lock()
-        lock = self.user_exp_locks[user_id]
-
-        # 使用該使用者的專屬鎖來確保經驗值計算的原子性
-        async with lock:
-            user = await user_data_manager.get_user(user_id, user_obj)
-            original_level = user.get("lv", 1)
-
-            # --- 經驗值與金錢獎勵 ---
-            # 每次發言給予少量經驗值與金錢
-            exp_gain = random.randint(1, 3)
-            money_gain = random.randint(1, 2)
-            user["exp"] += exp_gain
-            user["money"] += money_gain
-
-            # --- 隨機事件 ---
-            # 有 5% 的機率觸發一個隨機事件
-            if random.random() < 0.05:  # 5% 機率
-                event_type = random.choice(["money_gain", "money_loss"])
-
-                if event_type == "money_gain":
-                    found_money = random.randint(5, 20)
-                    user["money"] += found_money
-                    event_embed = discord.Embed(
-                        title="✨ 好運降臨！",
-                        description=f"{message.author.mention} 在路上撿到了 **{found_money}** 元！",
-                        color=Colors.WARNING,
-                    )
-                    await message.channel.send(embed=event_embed)
-
-                elif event_type == "money_loss":
-                    lost_money = random.randint(5, 20)
-                    # 確保錢不會變負數
-                    user["money"] = max(0, user["money"] - lost_money)
-                    event_embed = discord.Embed(
-                        title="💸 壞事發生了...",
-                        description=f"{message.author.mention} 不小心弄丟了 **{lost_money}** 元...",
-                        color=Colors.ERROR,
-                    )
-                    await message.channel.send(embed=event_embed)
-
-            # --- 升級檢查 ---
-            # 使用 while 迴圈處理一次獲得大量經驗值時可能發生的連續升級
-            new_level = user.get("lv", 1)
-            new_exp = user["exp"]
-
-            # 每次迴圈都重新計算當前等級所需的經驗值
-            required_exp_for_current_level = 10 * new_level
-            while new_exp >= required_exp_for_current_level:
-                new_level += 1
-                new_exp -= required_exp_for_current_level
-                # 更新下一次迴圈的經驗值需求
-                required_exp_for_current_level = 10 * new_level
-
-            # 如果等級有變化，才更新等級、經驗值並發送通知
-            if new_level > original_level:
-                user["lv"] = new_level
-                user["exp"] = new_exp
-
-                # 發送升級通知
-                level_up_embed = discord.Embed(
-                    title="🎉 等級提升！",
-                    description=f"恭喜 {message.author.mention} 升級到 **Lv. {user['lv']}**！",
-                    color=Colors.PRIMARY,
+        # update_fields 會在該使用者的資料鎖內執行，確保經驗值計算的原子性
+        event, new_level = await user_data_manager.update_fields(
+            message.author, self._apply_message_rewards
+        )
+
+        # --- 隨機事件通知 ---
+        if event is not None:
+            event_type, amount = event
+            if event_type == "money_gain":
+                event_embed = discord.Embed(
+                    title="✨ 好運降臨！",
+                    description=f"{message.author.mention} 在路上撿到了 **{amount}** 元！",
+                    color=Colors.WARNING,
+                )
+            else:
+                event_embed = discord.Embed(
+                    title="💸 壞事發生了...",
+                    description=f"{message.author.mention} 不小心弄丟了 **{amount}** 元...",
+                    color=Colors.ERROR,
                 )
-                level_up_embed.set_thumbnail(
-                    url=(
-                        message.author.avatar.url
-                        if message.author.avatar
-                        else message.author.default_avatar.url
-                    )
+            await message.channel.send(embed=event_embed)
+
+        # --- 升級通知 ---
+        if new_level is not None:
+            level_up_embed = discord.Embed(
+                title="🎉 等級提升！",
+                description=f"恭喜 {message.author.mention} 升級到 **Lv. {new_level}**！",
+                color=Colors.PRIMARY,
+            )
+            level_up_embed.set_thumbnail(
+                url=(
+                    message.author.avatar.url
+                    if message.author.avatar
+                    else message.author.default_avatar.url
                 )
-                # 通知到公告頻道
-                announce_channel = self.bot.get_channel(config.ANNOUNCEMENT_CHANNEL_ID)
-                if announce_channel:
-                    await announce_channel.send(embed=level_up_embed)
-                else:
-                    await message.channel.send(embed=level_up_embed)
-
-            # --- 儲存資料 ---
-            # 使用 update_user_data 將更新後的資料寫回檔案
-            await user_data_manager.update_user_data(user_id, user)
+            )
+            # 通知到公告頻道
+            announce_channel = self.bot.get_channel(config.ANNOUNCEMENT_CHANNEL_ID)
+            if announce_channel:
+                await announce_channel.send(embed=level_up_embed)
+            else:
+                await message.channel.send(embed=level_up_embed)
+
+    @staticmethod
+    def _apply_message_rewards(user: dict) -> tuple:
+        """
+        發放發言獎勵並處理升級（在用戶資料鎖內執行）
+
+        Returns:
+            (隨機事件, 新等級)：隨機事件為 (事件類型, 金額) 或 None，沒有升級時新等級為 None
+        """
+        original_level = user.get("lv", 1)
+
+        # --- 經驗值與金錢獎勵 ---
+        # 每次發言給予少量經驗值與金錢
+        user["exp"] += random.randint(1, 3)
+        user["money"] += random.randint(1, 2)
+
+        # --- 隨機事件 ---
+        # 有 5% 的機率觸發一個隨機事件
+        event = None
+        if random.random() < 0.05:  # 5% 機率
+            event_type = random.choice(["money_gain", "money_loss"])
+            amount = random.randint(5, 20)
+            if event_type == "money_gain":
+                user["money"] += amount
+            else:
+                # 確保錢不會變負數
+                user["money"] = max(0, user["money"] - amount)
+            event = (event_type, amount)
+
+        # --- 升級檢查 ---
+        # 使用 while 迴圈處理一次獲得大量經驗值時可能發生的連續升級
+        new_level = original_level
+        new_exp = user["exp"]
+
+        # 每次迴圈都重新計算當前等級所需的經驗值
+        required_exp_for_current_level = 10 * new_level
+        while new_exp >= required_exp_for_current_level:
+            new_level += 1
+            new_exp -= required_exp_for_current_level
+            # 更新下一次迴圈的經驗值需求
+            required_exp_for_current_level = 10 * new_level
+
+        # 如果等級有變化，才更新等級與經驗值
+        if new_level > original_level:
+            user["lv"] = new_level
+            user["exp"] = new_exp
+            return event, new_level
+        return event, None
 
 
 async def setup(bot: commands.Bot):
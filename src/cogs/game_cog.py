@@ -23,7 +23,7 @@ class Games(commands.Cog):
         return await check_channel(interaction)
 
     @staticmethod
-    async def in_class_game_check(interaction: discord.Interaction, amount: int, user: dict):
+    async def in_class_game_check(interaction: discord.Interaction, amount: int):
         now = datetime.datetime.now()
         if  datetime.datetime(2025, 7, 1, 13, 30) < now < datetime.datetime(2025, 7, 1, 17, 30) or\
             datetime.datetime(2025, 7, 2,  9, 40) < now < datetime.datetime(2025, 7, 2, 12, 10) or\
@@ -37,9 +37,10 @@ class Games(commands.Cog):
                     description = f"你在上課玩賭錢被老師發現，\n所以老師贏了。\n{interaction.user.mention} 輸掉了 {amount} 元！"
                 )
                 await interaction.response.send_message(embed=embed)
-                user["money"] -= amount
-                if user["money"] < 0:
-                    user["money"] = 0
+                await user_data_manager.update_fields(
+                    interaction.user,
+                    lambda user: user.update(money=max(0, user["money"] - amount)),
+                )
                 return True
         return False
 
@@ -59,11 +60,10 @@ class Games(commands.Cog):
                 f"你現在只有 {current_money} 元，你卻想花 {amount} 元，我們不支援賒帳系統啦>.<",
                 ephemeral=True,
             )
-            user["debt"] += 1
+            user = await user_data_manager.incr(interaction.user, debt=1)
             await AchievementManager.check_debt_achievements(
                 interaction.user.id, user["debt"], self.bot
             )
-            await user_data_manager.update_user_data(interaction.user.id, user)
             return
         if amount <= 0:
             await interaction.response.send_message(
@@ -71,7 +71,7 @@ class Games(commands.Cog):
             )
             return
 
-        if await self.in_class_game_check(interaction, amount * 2, user):
+        if await self.in_class_game_check(interaction, amount * 2):
             return
         
         await interaction.response.defer()
@@ -85,8 +85,7 @@ class Games(commands.Cog):
             "<:monitor:1385577094393757768>",
         ]
         result_str, winnings, msg, max_count = slot_game(user, amount, symbols)
-        user["money"] += winnings
-        await user_data_manager.update_user_data(interaction.user.id, user)
+        user = await user_data_manager.incr(interaction.user, money=winnings)
         user_name = interaction.user.display_name
         if max_count > 3:
             user_name = interaction.user.mention
@@ -124,7 +123,7 @@ class Games(commands.Cog):
             )
             return
 
-        if await self.in_class_game_check(interaction, amount * 2, user):
+        if await self.in_class_game_check(interaction, amount * 2):
             return
         
         if opponent and not opponent.bot:
@@ -161,12 +160,10 @@ class Games(commands.Cog):
                 return
             await interaction.response.defer()
             msg, result = dice.dice_roll(interaction.user, self.bot.user, amount)
-            if result > 0:
-                user["money"] += amount
-            elif result < 0:
-                user["money"] -= amount
             if result != 0:
-                await user_data_manager.update_user_data(interaction.user.id, user)
+                user = await user_data_manager.incr(
+                    interaction.user, money=amount if result > 0 else -amount
+                )
             embed = discord.Embed(title = "骰子比大小結果", description = msg)
             await interaction.followup.send(embed = embed)
             await AchievementManager.check_money_achievements(
@@ -206,8 +203,7 @@ class Games(commands.Cog):
             )
             return
         
-        user = await user_data_manager.get_user(interaction.user.id, interaction.user)
-        if await self.in_class_game_check(interaction, amount * 2, user):
+        if await self.in_class_game_check(interaction, amount * 2):
             return
         
         if opponent and not opponent.bot:
@@ -251,7 +247,7 @@ class Games(commands.Cog):
             )
             return
 
-        if await self.in_class_game_check(interaction, amount * 2, user):
+        if await self.in_class_game_check(interaction, amount * 2):
             return
         
         view = GuessButtonView(interaction.user, amount, interaction.channel, self.bot)
@@ -33,16 +33,10 @@ class DiceView(discord.ui.View):
     async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         msg, result = dice_roll(self.player, self.opponent, self.amount)
-        user_data = await user_data_manager.get_user(self.player.id, self.player)
-        opponent_data = await user_data_manager.get_user(self.opponent.id, self.opponent)
-        if result > 0:
-            user_data["money"] += self.amount
-            opponent_data["money"] -= self.amount
-        elif result < 0:
-            user_data["money"] -= self.amount
-            opponent_data["money"] += self.amount
-        await user_data_manager.update_user_data(self.player.id, user_data)
-        await user_data_manager.update_user_data(self.opponent.id, opponent_data)
+        # 贏家拿走賭注；平手時雙方金額不變
+        stake = self.amount if result > 0 else -self.amount if result < 0 else 0
+        user_data = await user_data_manager.incr(self.player, money=stake)
+        opponent_data = await user_data_manager.incr(self.opponent, money=-stake)
         embed = discord.Embed(title = "骰子比大小結果", description = msg)
         await interaction.followup.send(embed = embed)
         await AchievementManager.check_money_achievements(
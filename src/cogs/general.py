@@ -69,33 +69,10 @@ class General(commands.Cog):
         progress_bar = self._create_progress_bar(progress)
         exp_to_next = max(required_exp - exp, 0)
 
-        # 取得所有用戶資料以計算排名
-        all_user_data = user_data_manager.users
-        user_list = list(all_user_data.values())
-        # 等級排名
-        sorted_by_level = sorted(
-            user_list, key=lambda u: (-u.get("lv", 0), -u.get("exp", 0))
-        )
-        level_total = len(sorted_by_level)
-        level_rank = next(
-            (
-                i + 1
-                for i, u in enumerate(sorted_by_level)
-                if u.get("name") == user_data.get("name")
-            ),
-            None,
-        )
-        # 金錢排名
-        sorted_by_money = sorted(user_list, key=lambda u: -u.get("money", 0))
-        money_total = len(sorted_by_money)
-        money_rank = next(
-            (
-                i + 1
-                for i, u in enumerate(sorted_by_money)
-                if u.get("name") == user_data.get("name")
-            ),
-            None,
-        )
+        # 從排行榜索引查詢排名
+        level_rank = user_data_manager.rank_of(target.id, "exp")
+        money_rank = user_data_manager.rank_of(target.id, "money")
+        level_total = money_total = len(user_data_manager.users)
 
         # 成就與彩蛋數
         achievements_count = len(achievements)
@@ -7,14 +7,15 @@ from discord import app_commands
 from discord.ext import commands
 import aiohttp
 import random
-import json
 from types import SimpleNamespace
 from datetime import datetime
 
 from src.utils.prompt import MYGO_QUOTE_SIMILAR_PROMPT, MYGO_CHARACTER_GEN_PROMPT
 from src import config
-from src.utils.llm import llm_model
-from src.constants import MYGO_FILE
+from src.utils.llm import generate_content, generate_text, llm_model
+from src.constants import MYGO_FILE, MYGO_INDEX_FILE
+from src.utils.mygo_index import load_quotes
+from src.utils.image_cache import mygo_image_cache
 import io
 from datetime import datetime
 from src.utils.achievements import AchievementManager
@@ -31,12 +32,27 @@ class MyGo(commands.Cog):
         self._cd = commands.CooldownMapping.from_cooldown(
             1, 10.0, commands.BucketType.user
         )
-        # Load MyGo quotes
-        try:
-            with open(MYGO_FILE, "r", encoding="utf-8") as f:
-                self.mygo_quotes = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.mygo_quotes = []
+        # Load MyGo quotes and the search index
+        # 有預先編譯的索引檔時直接 mmap，LLM 只需要從索引篩選出的候選中挑選
+        self.mygo_quotes, self.quote_index = load_quotes(MYGO_FILE, MYGO_INDEX_FILE)
+        # 下載 ave-mujica 圖片共用的連線池，在 cog_load 建立
+        self.session: aiohttp.ClientSession | None = None
+
+    async def cog_load(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=8, ttl_dns_cache=300)
+        )
+
+    async def cog_unload(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _fetch_image(self, url: str) -> bytes | None:
+        """取得 ave-mujica 圖片，重複的圖片直接使用快取；失敗時返回 None"""
+        if self.session is None or self.session.closed:
+            await self.cog_load()
+        return await mygo_image_cache.fetch(self.session, url)
 
     @app_commands.command(
         name="mygo", description="從 MyGO!!!!! 和 ave-mujica 圖庫中搜尋一張圖片。"
@@ -97,11 +113,9 @@ class MyGo(commands.Cog):
             image_url = quote["url"]
             image_alt = quote["alt"]
             if "ave-mujica" in image_url:
-                async with aiohttp.ClientSession() as sess:
-                    async with sess.get(image_url) as resp:
-                        if resp.status != 200:
-                            return await send("讀取失敗")
-                        data = await resp.read()
+                data = await self._fetch_image(image_url)
+                if data is None:
+                    return await send("讀取失敗")
                 random_color = random.randint(0, 0xFFFFFF)
                 file = discord.File(fp=io.BytesIO(data), filename="image.webp")
                 embed = discord.Embed(
@@ -175,22 +189,29 @@ class MyGo(commands.Cog):
         status_message = None
 
         try:
-            # --- 1. First attempt: Direct search in local JSON ---
+            # --- 1. First attempt: Local index (exact, then fuzzy match) ---
             matches = [
-                item
-                for item in self.mygo_quotes
-                if isinstance(item, dict) and keyword in item.get("alt", "")
+                self.mygo_quotes[doc_id]
+                for doc_id in self.quote_index.find_exact(keyword)
             ]
+            if not matches:
+                # 沒有完全包含關鍵字的台詞時，相似度夠高的近似台詞也直接採用
+                ranked = self.quote_index.search(keyword, limit=5)
+                if ranked and ranked[0][0] >= config.MYGO_FUZZY_MATCH_THRESHOLD:
+                    best_score = ranked[0][0]
+                    matches = [
+                        self.mygo_quotes[doc_id]
+                        for score, doc_id in ranked
+                        if score == best_score
+                    ]
             if matches:
-                index = random.randint(0, len(matches))
-                image_url = matches[index]["url"]
-                image_alt = matches[index]["alt"]
+                match = random.choice(matches)
+                image_url = match["url"]
+                image_alt = match["alt"]
                 if "ave-mujica" in image_url:
-                    async with aiohttp.ClientSession() as sess:
-                        async with sess.get(image_url) as resp:
-                            if resp.status != 200:
-                                return await send("讀取失敗")
-                            data = await resp.read()
+                    data = await self._fetch_image(image_url)
+                    if data is None:
+                        return await send("讀取失敗")
                     random_color = random.randint(0, 0xFFFFFF)
                     file = discord.File(fp=io.BytesIO(data), filename="image.webp")
                     embed = discord.Embed(
@@ -237,26 +258,24 @@ class MyGo(commands.Cog):
                         f"試著找找看與「{keyword}」接近的台詞...",
                     )
 
-                quotes_str = "\n".join(
-                    item["alt"]
-                    for item in self.mygo_quotes
-                    if isinstance(item, dict) and "alt" in item
-                )
-                prompt1 = MYGO_QUOTE_SIMILAR_PROMPT.format(
-                    keyword=keyword, quotes_str=quotes_str
+                # 只把檢索出的候選台詞交給 LLM，而不是整份台詞列表
+                candidates = self.quote_index.shortlist(
+                    keyword, config.MYGO_LLM_SHORTLIST_SIZE
                 )
+                closest_quote = ""
+                if candidates:
+                    quotes_str = "\n".join(candidates)
+                    prompt1 = MYGO_QUOTE_SIMILAR_PROMPT.format(
+                        keyword=keyword, quotes_str=quotes_str
+                    )
 
-                closest_quote_response = await self.model.generate_content_async(
-                    prompt1
-                )
-                closest_quote = closest_quote_response.text.strip()
+                    # 同樣的關鍵字與候選台詞會得到同樣的結果，使用回應快取
+                    closest_quote = await generate_text(prompt1, default="")
 
                 if closest_quote:
                     matches2 = [
-                        item
-                        for item in self.mygo_quotes
-                        if isinstance(item, dict)
-                        and closest_quote in item.get("alt", "")
+                        self.mygo_quotes[doc_id]
+                        for doc_id in self.quote_index.find_exact(closest_quote)
                     ]
                     if matches2:
                         if status_message:
@@ -269,11 +288,9 @@ class MyGo(commands.Cog):
                         image_alt_2 = match2["alt"]
                         random_color = random.randint(0, 0xFFFFFF)
                         if "ave-mujica" in image_url_2:
-                            async with aiohttp.ClientSession() as sess:
-                                async with sess.get(image_url_2) as resp:
-                                    if resp.status != 200:
-                                        return await send("讀取失敗")
-                                    data = await resp.read()
+                            data = await self._fetch_image(image_url_2)
+                            if data is None:
+                                return await send("讀取失敗")
                             file = discord.File(
                                 fp=io.BytesIO(data), filename="image.webp"
                             )
@@ -312,7 +329,7 @@ class MyGo(commands.Cog):
 
                 prompt2 = MYGO_CHARACTER_GEN_PROMPT.format(keyword=keyword)
 
-                llm_response = await self.model.generate_content_async(prompt2)
+                llm_response = await generate_content(prompt2)
                 if status_message:
                     await edit_message(
                         status_message,
@@ -2,7 +2,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import json
-from src.utils.llm import llm_model
+from src.utils.llm import generate_text
 from src.utils.achievements import AchievementManager
 
 from src.constants import NOTES_FILE
@@ -89,8 +89,8 @@ class Notes(commands.Cog):
             note_names_str = "\n".join(note_names)
             prompt = f"從下的筆記名稱中，選出與使用者輸入的「{keyword}」敘述最符合的一條筆記。請「只」回傳筆記名稱，不要包含任何其他文字或引號。\n\n筆記名稱：\n{note_names_str}\n\n此外此外提供筆記原始資料作為參照：\n```json\n{self.notes_json.__str__()}\n```"
 
-            closest_name_response = await llm_model.generate_content_async(prompt)
-            closest_name = closest_name_response.text.strip()
+            # 同樣的關鍵字與筆記列表會得到同樣的結果，使用回應快取
+            closest_name = await generate_text(prompt, default="")
 
             if not self.notes_json.get(closest_name):
                 interaction.followup.send(
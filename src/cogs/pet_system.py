@@ -38,9 +38,12 @@ import discord
 from src.utils.user_data import user_data_manager
 from src import config
 from src.utils.llm import generate_text
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND
 from src.utils.pet_ai import pet_ai_generator
 from src.utils.achievements import AchievementManager, track_feature_usage
 from src.utils.image_gen import generate_image
+from src.utils.image_postprocess import image_filename
+from src.utils.snapshot import load_json_snapshot, submit_json_snapshot
 import random
 import datetime
 import asyncio
@@ -194,42 +197,38 @@ class PetSystem(commands.Cog):
         """Cog 卸載時清理任務"""
         if hasattr(self, "timer_task"):
             self.timer_task.cancel()
-        self.save_pets_data()  # 確保在關閉時保存資料
+        self.save_pets_data(blocking=True)  # 確保在關閉時保存資料
 
     def load_pets_data(self):
         """載入寵物資料"""
         try:
-            if os.path.exists(self.pets_data_file):
-                with open(self.pets_data_file, "r", encoding="utf-8") as f:
-                    # 讀取原始資料
-                    raw_data = json.load(f)
-
-                    # 處理 base64 編碼的頭像
-                    self.pets = {}
-                    for user_id, pet_data in raw_data.items():
-                        if (
-                            pet_data
-                            and pet_data.get("avatar")
-                            and isinstance(pet_data["avatar"], str)
-                        ):
-                            try:
-                                # 將 base64 字串解碼回 bytes
-                                pet_data["avatar"] = base64.b64decode(
-                                    pet_data["avatar"]
-                                )
-                            except (base64.binascii.Error, ValueError) as e:
-                                print(
-                                    f"⚠️ Base64 解碼失敗 for user {user_id}: {e}. 設置 avatar 為 None."
-                                )
-                                pet_data["avatar"] = None
+            # 讀取原始資料（最新檔案損毀時會自動退回較舊的快照）
+            raw_data = load_json_snapshot(self.pets_data_file)
+
+            # 處理 base64 編碼的頭像
+            self.pets = {}
+            for user_id, pet_data in raw_data.items():
+                if (
+                    pet_data
+                    and pet_data.get("avatar")
+                    and isinstance(pet_data["avatar"], str)
+                ):
+                    try:
+                        # 將 base64 字串解碼回 bytes
+                        pet_data["avatar"] = base64.b64decode(pet_data["avatar"])
+                    except (base64.binascii.Error, ValueError) as e:
+                        print(
+                            f"⚠️ Base64 解碼失敗 for user {user_id}: {e}. 設置 avatar 為 None."
+                        )
+                        pet_data["avatar"] = None
 
-                        # 確保每個寵物都有 comfort_lock
-                        if user_id not in self.comfort_locks:
-                            self.comfort_locks[user_id] = asyncio.Lock()
+                # 確保每個寵物都有 comfort_lock
+                if user_id not in self.comfort_locks:
+                    self.comfort_locks[user_id] = asyncio.Lock()
 
-                        self.pets[user_id] = pet_data
-            else:
-                self.pets = {}
+                self.pets[user_id] = pet_data
+        except FileNotFoundError:
+            self.pets = {}
         except json.JSONDecodeError as e:
             print(f"❌ 載入寵物資料失敗 (JSONDecodeError): {e}")
             print("⚠️ 偵測到寵物資料檔案格式錯誤，將嘗試備份並重置。")
@@ -262,15 +261,13 @@ class PetSystem(commands.Cog):
                 try:
                     user = self.bot.get_user(int(user_id))
                     if user:
-                        user_data = await user_data_manager.get_user(user)
+                        before = await user_data_manager.get_user(user)
                         if (
-                            user_data.get("pet_name") != pet_name
-                            or user_data.get("pet_affection") != affection
+                            before.get("pet_name") != pet_name
+                            or before.get("pet_affection") != affection
                         ):
-                            user_data["pet_name"] = pet_name
-                            user_data["pet_affection"] = affection
-                            await user_data_manager.update_user_data(
-                                int(user_id), user_data
+                            await user_data_manager.set_fields(
+                                user, pet_name=pet_name, pet_affection=affection
                             )
                             print(f"🔄 已同步用戶 {user.display_name} 的寵物資料")
                 except Exception as e:
@@ -279,27 +276,37 @@ class PetSystem(commands.Cog):
         except Exception as e:
             print(f"❌ 批量同步寵物資料失敗: {e}")
 
-    def save_pets_data(self):
-        """保存寵物資料"""
-        try:
-            # 創建一個可序列化的副本
-            pets_to_save = {}
-            for user_id, pet_data in self.pets.items():
-                if not pet_data:
-                    continue  # 跳過空的寵物資料
+    def save_pets_data(self, blocking: bool = False):
+        """
+        保存寵物資料
+
+        只在事件迴圈中複製一份寵物字典，base64 編碼與寫檔都交給快照執行緒，
+        以原子性寫入並保留舊版本。blocking=True 時會等待寫入完成。
+        """
+        # 淺層複製即可：頭像 bytes 不可變，其餘欄位都是基本型別
+        pets_copy = {
+            user_id: pet_data.copy()
+            for user_id, pet_data in self.pets.items()
+            if pet_data  # 跳過空的寵物資料
+        }
 
-                serializable_pet = pet_data.copy()
-                # 將頭像 bytes 轉換為 base64 字串以便儲存
+        def build_serializable():
+            # 將頭像 bytes 轉換為 base64 字串以便儲存
+            for serializable_pet in pets_copy.values():
                 if serializable_pet.get("avatar") and isinstance(
                     serializable_pet["avatar"], bytes
                 ):
                     serializable_pet["avatar"] = base64.b64encode(
                         serializable_pet["avatar"]
                     ).decode("utf-8")
-                pets_to_save[user_id] = serializable_pet
+            return pets_copy
 
-            with open(self.pets_data_file, "w", encoding="utf-8") as f:
-                json.dump(pets_to_save, f, indent=4, ensure_ascii=False)
+        try:
+            future = submit_json_snapshot(
+                self.pets_data_file, build_serializable, indent=4
+            )
+            if blocking:
+                future.result()
         except Exception as e:
             print(f"❌ 保存寵物資料失敗: {e}")
 
@@ -344,9 +351,7 @@ class PetSystem(commands.Cog):
         try:
             user = self.bot.get_user(int(user_id))
             if user:
-                user_data = await user_data_manager.get_user(user)
-                user_data["pet_affection"] = affection
-                await user_data_manager.update_user_data(int(user_id), user_data)
+                await user_data_manager.set_fields(user, pet_affection=affection)
 
                 # 檢查好感度相關成就
                 await self.check_pet_achievements(int(user_id))
@@ -408,17 +413,31 @@ class PetSystem(commands.Cog):
                 # 檢查等待安慰的寵物是否超時
                 await self.check_comfort_timeouts(current_time)
 
+                # 先收集這一輪到期的事件
+                due_events = []
                 for user_id, timers in self.pet_timers.items():
                     if user_id not in self.pets:
                         continue
 
-                    pet = self.pets[user_id]
-
                     # 檢查各種定時事件
                     for timer_type, due_time in timers.items():
                         if current_time >= due_time:
-                            await self.handle_pet_event(user_id, pet, timer_type)
-                            self.reset_timer(user_id, timer_type)
+                            due_events.append((user_id, timer_type))
+
+                for user_id, timer_type in due_events:
+                    self.reset_timer(user_id, timer_type)
+
+                # 同時處理所有事件，讓行為描述能合併成同一批 LLM 請求
+                results = await asyncio.gather(
+                    *(
+                        self.handle_pet_event(user_id, self.pets[user_id], timer_type)
+                        for user_id, timer_type in due_events
+                    ),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        print(f"❌ 寵物事件處理失敗: {result}")
 
             except Exception as e:
                 print(f"❌ 寵物定時器錯誤: {e}")
@@ -475,7 +494,7 @@ class PetSystem(commands.Cog):
                     # 生成失望的回應
                     context = "主人沒有來安慰我，我感到很失望和難過..."
                     response_msg = await pet_ai_generator.generate_pet_response(
-                        pet_name, pet["description"], context
+                        pet_name, pet["description"], context, priority=PRIORITY_BACKGROUND
                     )
 
                     # 發送超時訊息
@@ -547,7 +566,7 @@ class PetSystem(commands.Cog):
 
             # 生成行為描述
             response = await pet_ai_generator.generate_pet_behavior_description(
-                pet_name, pet_description, event_type
+                pet_name, pet_description, event_type, pet_id=user_id
             )
 
             # --- Treasure Hunt Special Logic ---
@@ -568,11 +587,14 @@ class PetSystem(commands.Cog):
                     if image_prompt:
                         print(f"💎 正在為「{treasure_description}」生成寶物圖片...")
                         print(f"📝 圖片提示詞: {image_prompt}")
-                        image_data = await generate_image(image_prompt)
+                        image_data = await generate_image(
+                            image_prompt, priority=PRIORITY_BACKGROUND
+                        )
                         if image_data:
                             print("✅ 寶物圖片生成成功！")
                             image_file = discord.File(
-                                fp=image_data, filename="treasure.png"
+                                fp=image_data,
+                                filename=image_filename("treasure", image_data),
                             )
                         else:
                             print("❌ 寶物圖片生成失敗。")
@@ -935,10 +957,11 @@ class PetSystem(commands.Cog):
                 interaction.user.id, has_ai_avatar=(avatar_data is not None)
             )
 
-            user_data = await user_data_manager.get_user(interaction.user)
-            user_data["pet_name"] = pet_name
-            user_data["pet_affection"] = self.pets[user_id]["affection"]
-            await user_data_manager.update_user_data(interaction.user.id, user_data)
+            await user_data_manager.set_fields(
+                interaction.user,
+                pet_name=pet_name,
+                pet_affection=self.pets[user_id]["affection"],
+            )
 
             await track_feature_usage(interaction.user.id, "pet_adoption")
 
@@ -165,10 +165,25 @@ class Scoreboard(commands.Cog):
                     color=discord.Color.pink(),
                 )
 
-            # 按好感度排序，取前3名
-            sorted_pets = sorted(
-                pets_data.items(), key=lambda x: x[1].get("affection", 0), reverse=True
-            )[:3]
+            # 依用戶資料中同步的好感度索引取前3名（只保留目前仍有寵物的用戶），
+            # 顯示的好感度同樣取自索引，名次與數值才會一致
+            sorted_pets = [
+                (user_id, pets_data[user_id], user_record.get("pet_affection", 0))
+                for user_id, user_record in self.user_data.get_top_users(
+                    "pet_affection", 10
+                )
+                if user_id in pets_data
+            ][:3]
+            if len(sorted_pets) < min(3, len(pets_data)):
+                # 用戶資料尚未同步時退回直接排序寵物資料
+                sorted_pets = [
+                    (user_id, pet_data, pet_data.get("affection", 0))
+                    for user_id, pet_data in sorted(
+                        pets_data.items(),
+                        key=lambda x: x[1].get("affection", 0),
+                        reverse=True,
+                    )[:3]
+                ]
 
             if not sorted_pets:
                 return discord.Embed(
@@ -180,7 +195,7 @@ class Scoreboard(commands.Cog):
             medals = {1: "🥇", 2: "🥈", 3: "🥉"}
             lines = []
 
-            for i, (user_id, pet_data) in enumerate(sorted_pets, 1):
+            for i, (user_id, pet_data, affection) in enumerate(sorted_pets, 1):
                 try:
                     user = await self.bot.fetch_user(int(user_id))
                     user_mention = user.mention
@@ -188,7 +203,6 @@ class Scoreboard(commands.Cog):
                     user_mention = f"`ID:{user_id}`"
 
                 pet_name = pet_data.get("name", "未知寵物")
-                affection = pet_data.get("affection", 0)
 
                 # 根據好感度顯示愛心等級
                 if affection >= 50:
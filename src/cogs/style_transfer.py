@@ -11,13 +11,22 @@
 import discord
 from discord.ext import commands
 import aiohttp
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit, urlunsplit
 import datetime
 from src.utils.user_data import user_data_manager
 
 from src import config
 from src.utils.prompt import STYLE_PROMPTS
-from src.utils.llm import llm_model
+from src.utils.llm import generate_text, llm_model, stream_content
+from src.utils.progressive_message import ProgressiveMessage, split_message
+
+
+def webhook_message_url(webhook_url: str, message_id: str) -> str:
+    """Webhook 所發送訊息的 URL，保留原本的查詢字串（例如 thread_id）"""
+    parts = urlsplit(webhook_url)
+    path = f"{parts.path.rstrip('/')}/messages/{message_id}"
+    return urlunsplit(parts._replace(path=path))
 
 
 class StyleTransfer(commands.Cog):
@@ -83,11 +92,10 @@ class StyleTransfer(commands.Cog):
             datetime.datetime(2025, 7, 3,  9, 40) < now < datetime.datetime(2025, 7, 3, 12, 10) or\
             datetime.datetime(2025, 7, 3, 13, 30) < now < datetime.datetime(2025, 7, 3, 15,  0):
             await message.channel.send('再不專心上課，我要生氣氣囉 ><\n你因為上課不專心不小心弄丟了 10 元')
-            user_data = await user_data_manager.get_user(message.author.id, message.author)
-            user_data["money"] -= 10
-            if user_data["money"] < 0:
-                user_data["money"] = 0
-            await user_data_manager.update_user_data(message.author.id, user_data)
+            await user_data_manager.update_fields(
+                message.author,
+                lambda user: user.update(money=max(0, user["money"] - 10)),
+            )
             return 
         
         # 檢查冷卻時間
@@ -156,26 +164,93 @@ class StyleTransfer(commands.Cog):
         self, original_content: str, style_config: Dict[str, Any], prompt: str
     ) -> None:
         """發送風格轉換後的訊息"""
-        # 生成 AI 回應
         full_prompt = f"{prompt}\n\n用戶輸入：\n```{original_content}```"
-        response = await self.model.generate_content_async(full_prompt)
+        # 常見的短句會被反覆轉換，依（風格, 原文）快取轉換結果
+        cache_on = ["style_transfer", style_config["style_key"], original_content]
+
+        async with aiohttp.ClientSession() as session:
+            if config.LLM_STREAMING_ENABLED:
+                # 串流模式：先送出第一段，再逐步編輯同一則 Webhook 訊息
+                reply = ProgressiveMessage(
+                    lambda content: self._post_webhook(
+                        session, style_config, content, wait=True
+                    ),
+                    lambda message_id, content: self._edit_webhook(
+                        session, style_config, message_id, content
+                    ),
+                    edit_interval=config.LLM_STREAM_EDIT_INTERVAL,
+                )
+                try:
+                    await reply.consume(
+                        stream_content(full_prompt, cache=True, cache_on=cache_on)
+                    )
+                except Exception as e:
+                    print(f"❌ 風格轉換串流生成失敗：{e}")
+                    try:
+                        if reply.has_content:
+                            # 已送出部分內容時，補上中斷提示
+                            await reply.finish("……（回應中斷了）")
+                        else:
+                            await self._post_webhook(
+                                session,
+                                style_config,
+                                "抱歉，處理你的訊息時出了點問題，請稍後再試～",
+                            )
+                    except aiohttp.ClientError:
+                        pass  # 忽略錯誤訊息發送失敗的情況
+                    return
+                if not reply.has_content:
+                    await self._post_webhook(
+                        session, style_config, "🤔 我不知道該說什麼..."
+                    )
+                return
 
-        if not response.text or response.text.strip() == "":
-            final_content = "🤔 我不知道該說什麼..."
-        else:
-            final_content = response.text
+            # 生成 AI 回應
+            final_content = await generate_text(
+                full_prompt, cache_on=cache_on, default="🤔 我不知道該說什麼..."
+            )
 
-        # 直接發送最終訊息
+            # 超過 Discord 字數上限時分成多則訊息發送
+            for part in split_message(final_content):
+                await self._post_webhook(session, style_config, part)
+
+    async def _post_webhook(
+        self,
+        session: aiohttp.ClientSession,
+        style_config: Dict[str, Any],
+        content: str,
+        wait: bool = False,
+    ) -> Optional[str]:
+        """以角色身份透過 Webhook 發送訊息，wait=True 時返回訊息 ID 供之後編輯"""
         payload = {
-            "content": final_content,
+            "content": content,
             "username": style_config["username"],
             "avatar_url": style_config["avatar_url"],
         }
+        params = {"wait": "true"} if wait else None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(style_config["webhook_url"], json=payload) as resp:
-                if resp.status not in [200, 204]:
-                    raise aiohttp.ClientError(f"Webhook 請求失敗：{resp.status}")
+        async with session.post(
+            style_config["webhook_url"], json=payload, params=params
+        ) as resp:
+            if resp.status not in [200, 204]:
+                raise aiohttp.ClientError(f"Webhook 請求失敗：{resp.status}")
+            if wait:
+                data = await resp.json()
+                return data["id"]
+        return None
+
+    async def _edit_webhook(
+        self,
+        session: aiohttp.ClientSession,
+        style_config: Dict[str, Any],
+        message_id: str,
+        content: str,
+    ) -> None:
+        """編輯先前透過 Webhook 發送的訊息"""
+        url = webhook_message_url(style_config["webhook_url"], message_id)
+        async with session.patch(url, json={"content": content}) as resp:
+            if resp.status != 200:
+                raise aiohttp.ClientError(f"Webhook 編輯失敗：{resp.status}")
 
 
 async def setup(bot: commands.Bot) -> None:
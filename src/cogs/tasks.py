@@ -82,10 +82,8 @@ class Tasks(commands.Cog):
             self.claimed_users.add(user.id)
 
             # 發放獎金，並傳入 user 物件以更新使用者名稱
-            user_account = await user_data_manager.get_user(user)
             reward = random.randint(100, 200)
-            user_account["money"] += reward
-            await user_data_manager.update_user_data(user.id, user_account)
+            await user_data_manager.incr(user, money=reward)
 
             await interaction.response.send_message(
                 f"恭喜你搶到 {reward} 元獎金！", ephemeral=True
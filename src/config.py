@@ -31,11 +31,123 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 HUGGINGFACE_IMAGE_GEN_MODEL = os.getenv("HUGGINGFACE_IMAGE_GEN_MODEL")
 
+# ===== LLM 設定 =====
+# 同時送往 Gemini 的最大請求數
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# 單次 LLM 請求的逾時秒數
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# 每個模型每分鐘最多送出的請求數（0 表示不限制）與可突發的請求數
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+# 背景請求（寵物事件等）最多排隊幾個，超過時直接改用預設內容
+LLM_BACKGROUND_QUEUE_LIMIT = int(os.getenv("LLM_BACKGROUND_QUEUE_LIMIT", "8"))
+# 收到 429 時暫停送出的秒數（連續發生時加倍，直到上限）
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+# 聊天與風格轉換以串流方式逐步顯示回應，以及兩次編輯訊息之間的最短秒數
+LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "true").lower() == "true"
+LLM_STREAM_EDIT_INTERVAL = float(os.getenv("LLM_STREAM_EDIT_INTERVAL", "1.0"))
+# LLM 回應快取：記憶體中最多保存的回應數與存活秒數
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(6 * 60 * 60)))
+# 磁碟快取目錄（留空則只使用記憶體快取）與檔案數上限
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "data/llm_cache")
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "5000"))
+
+# ===== 圖片生成設定 =====
+# 同時進行的圖片生成工作數（同時也是呼叫 gradio 的執行緒數）
+IMAGE_GEN_WORKERS = int(os.getenv("IMAGE_GEN_WORKERS", "2"))
+# 單一圖片生成工作的逾時秒數
+IMAGE_GEN_TIMEOUT = float(os.getenv("IMAGE_GEN_TIMEOUT", "90"))
+# 背景圖片工作（寵物寶物圖等）最多排隊幾個，超過時直接放棄
+IMAGE_GEN_BACKGROUND_QUEUE_LIMIT = int(os.getenv("IMAGE_GEN_BACKGROUND_QUEUE_LIMIT", "4"))
+# 共用的 Gradio 客戶端數量（預設與 worker 數相同）與健康檢查間隔秒數
+IMAGE_GEN_CLIENT_POOL_SIZE = int(
+    os.getenv("IMAGE_GEN_CLIENT_POOL_SIZE", str(IMAGE_GEN_WORKERS))
+)
+IMAGE_GEN_CLIENT_HEALTH_INTERVAL = float(
+    os.getenv("IMAGE_GEN_CLIENT_HEALTH_INTERVAL", "300")
+)
+# 生成圖片的磁碟快取目錄（留空則停用）與容量上限（位元組）
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "data/image_cache/generated")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 啟動時匯入的預先生成圖片清單（JSON，留空則不匯入）
+IMAGE_CACHE_PREWARM_MANIFEST = os.getenv("IMAGE_CACHE_PREWARM_MANIFEST", "")
+# 生成圖片的後處理：縮小並重新編碼後再上傳（停用則直接使用 Space 回傳的原圖）
+IMAGE_POSTPROCESS_ENABLED = (
+    os.getenv("IMAGE_POSTPROCESS_ENABLED", "true").lower() == "true"
+)
+# 訊息中圖片的最長邊（像素）、格式（WEBP 或 PNG）與容量預算（位元組）
+IMAGE_DISPLAY_MAX_SIDE = int(os.getenv("IMAGE_DISPLAY_MAX_SIDE", "768"))
+IMAGE_DISPLAY_FORMAT = os.getenv("IMAGE_DISPLAY_FORMAT", "WEBP").upper()
+IMAGE_DISPLAY_MAX_BYTES = int(os.getenv("IMAGE_DISPLAY_MAX_BYTES", str(300 * 1024)))
+# 寵物頭像（PNG）的最長邊與容量預算
+IMAGE_AVATAR_MAX_SIDE = int(os.getenv("IMAGE_AVATAR_MAX_SIDE", "256"))
+IMAGE_AVATAR_MAX_BYTES = int(os.getenv("IMAGE_AVATAR_MAX_BYTES", str(128 * 1024)))
+# 每日簽到預先生成的運勢圖片數（0 表示停用）與檢查補充的間隔秒數
+FORTUNE_IMAGE_POOL_SIZE = int(os.getenv("FORTUNE_IMAGE_POOL_SIZE", "5"))
+FORTUNE_IMAGE_POOL_REFILL_INTERVAL = float(
+    os.getenv("FORTUNE_IMAGE_POOL_REFILL_INTERVAL", "60")
+)
+
+# ===== 寵物系統設定 =====
+# 寵物行為敘述的微批次：收集請求的等待秒數與單一批次的最大數量
+PET_BEHAVIOR_BATCH_WINDOW = float(os.getenv("PET_BEHAVIOR_BATCH_WINDOW", "0.5"))
+PET_BEHAVIOR_BATCH_SIZE = int(os.getenv("PET_BEHAVIOR_BATCH_SIZE", "10"))
+
+# ===== MyGO 搜尋設定 =====
+# 找不到完全符合的台詞時，先以本地索引篩選出多少句候選再交給 LLM 挑選
+MYGO_LLM_SHORTLIST_SIZE = int(os.getenv("MYGO_LLM_SHORTLIST_SIZE", "30"))
+# 本地模糊搜尋的相似度門檻（0～1），最佳結果低於此分數時才改由 LLM 尋找
+MYGO_FUZZY_MATCH_THRESHOLD = float(os.getenv("MYGO_FUZZY_MATCH_THRESHOLD", "0.6"))
+# ave-mujica 圖片快取：記憶體上限（位元組）、多久後向伺服器重新驗證（秒）
+MYGO_IMAGE_CACHE_MAX_BYTES = int(
+    os.getenv("MYGO_IMAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+MYGO_IMAGE_CACHE_MAX_AGE = float(os.getenv("MYGO_IMAGE_CACHE_MAX_AGE", str(24 * 60 * 60)))
+# 磁碟快取目錄（留空則只使用記憶體快取）與容量上限（位元組）
+MYGO_IMAGE_CACHE_DIR = os.getenv("MYGO_IMAGE_CACHE_DIR", "data/image_cache/mygo")
+MYGO_IMAGE_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("MYGO_IMAGE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
 # ===== 檔案路徑 =====
 COGS_DIR = "src/cogs"
 DATA_DIR = "data"
 USER_DATA_FILE = os.getenv("USER_DATA_FILE", "data/user_data.json")
 
+# ===== 用戶資料寫入設定 =====
+# 寫回模式：更新只標記為待寫入，由背景任務合併後一次寫檔
+USER_DATA_WRITE_BEHIND = os.getenv("USER_DATA_WRITE_BEHIND", "true").lower() == "true"
+# 背景寫檔的最長間隔（秒）
+USER_DATA_FLUSH_INTERVAL = float(os.getenv("USER_DATA_FLUSH_INTERVAL", "5"))
+# 待寫入的用戶數達到此門檻時立即寫檔
+USER_DATA_FLUSH_THRESHOLD = int(os.getenv("USER_DATA_FLUSH_THRESHOLD", "50"))
+# 儲存方式：json（每次寫入完整快照）、journal（追加變更日誌，定期壓縮成快照）
+# 或 sqlite（SQLite 資料庫，只寫入有變更的用戶；首次啟動時自動匯入 JSON 資料）
+USER_DATA_BACKEND = os.getenv("USER_DATA_BACKEND", "json").lower()
+USER_DATA_JOURNAL_FILE = os.getenv(
+    "USER_DATA_JOURNAL_FILE", f"{USER_DATA_FILE}.journal"
+)
+# 日誌超過此大小（位元組）時壓縮成新的快照
+USER_DATA_JOURNAL_MAX_BYTES = int(
+    os.getenv("USER_DATA_JOURNAL_MAX_BYTES", str(1024 * 1024))
+)
+# sqlite 模式使用的資料庫檔案
+USER_DATA_DB_FILE = os.getenv("USER_DATA_DB_FILE", "data/user_data.db")
+# 背景升級舊格式用戶資料時，每批處理的用戶數
+USER_DATA_MIGRATION_BATCH_SIZE = int(os.getenv("USER_DATA_MIGRATION_BATCH_SIZE", "200"))
+# 以精簡的 __slots__ 物件保存用戶資料（成就等 ID 列表改存為字串表編號）
+USER_DATA_COMPACT_RECORDS = (
+    os.getenv("USER_DATA_COMPACT_RECORDS", "false").lower() == "true"
+)
+# 用戶資料分段鎖的數量（不同用戶的更新只有落在同一段時才需要互相等待）
+USER_LOCK_STRIPES = int(os.getenv("USER_LOCK_STRIPES", "64"))
+
+
+# 快照寫入時保留的舊版本數量（file.json.1、file.json.2 ...）
+SNAPSHOT_GENERATIONS = int(os.getenv("SNAPSHOT_GENERATIONS", "3"))
 
 # ===== 主要頻道 ID =====
 SCOREBOARD_CHANNEL_ID = get_int_env("SCOREBOARD_CHANNEL_ID")
@@ -40,6 +40,8 @@ QUOTE_REPLACEMENTS: Dict[str, str] = {
 }
 
 # ===== 預設使用者資料結構 =====
+# 用戶資料格式版本：新增或調整欄位時遞增，舊資料會在存取時或由背景任務升級
+USER_SCHEMA_VERSION = 1
 DEFAULT_USER_FIELDS: Dict[str, any] = {
     "achievements": [],
     "found_flags": [],
@@ -58,6 +60,7 @@ ACHIEVEMENTS_FILE = f"{DATA_DIR}/achievement.json"
 FLAGS_FILE = f"{DATA_DIR}/flags.json"
 FLAGS_URL="https://docs.google.com/spreadsheets/d/1crf23wVyL0NPJH6DWcoAw_5qHgNEHUXPl4aaN6xCeHc/export?format=csv"
 MYGO_FILE = f"{DATA_DIR}/mygo.json"
+MYGO_INDEX_FILE = f"{DATA_DIR}/mygo.idx"  # 由 build_mygo_index.py 產生
 SCHEDULE_FILE = f"{DATA_DIR}/schedule.json"
 LINKS_FILE = f"{DATA_DIR}/links.json"
 NOTES_FILE = f"{DATA_DIR}/notes.json"
@@ -0,0 +1,189 @@
+"""
+精簡的用戶資料格式
+
+以 __slots__ 物件取代每位用戶一個 dict，並將成就、彩蛋、使用過的功能
+這類重複出現的短字串 ID 改存為共用字串表中的編號：
+- IdList：保留原本的順序（2 bytes 的編號陣列），並以位元集合做 O(1) 的成員判斷
+- CompactUserRecord：實作 MutableMapping，現有 cog 仍可用 user["money"]、
+  user.get(...)、user["achievements"].append(...) 等寫法存取
+
+由 USER_DATA_COMPACT_RECORDS 開啟，寫入儲存時會轉回一般的 dict 與 list。
+"""
+
+import sys
+from array import array
+from collections.abc import MutableMapping, MutableSequence, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class _InternTable:
+    """所有 IdList 共用的字串表：字串 ↔ 編號"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def id_of(self, value: str) -> int:
+        value = sys.intern(str(value))
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self._values)
+            self._values.append(value)
+        return index
+
+    def find(self, value: Any) -> Optional[int]:
+        """查詢字串的編號，不存在時不會新增"""
+        return self._index.get(value) if isinstance(value, str) else None
+
+    def value_of(self, index: int) -> str:
+        return self._values[index]
+
+
+_intern_table = _InternTable()
+
+
+class IdList(MutableSequence):
+    """以字串表編號儲存的字串列表，成員判斷為 O(1)"""
+
+    __slots__ = ("_order", "_bits")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._order = array("H")
+        self._bits = 0
+        for value in values:
+            self.append(value)
+
+    def _rebuild_bits(self) -> None:
+        bits = 0
+        for index in self._order:
+            bits |= 1 << index
+        self._bits = bits
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [_intern_table.value_of(index) for index in self._order[position]]
+        return _intern_table.value_of(self._order[position])
+
+    def __setitem__(self, position, value) -> None:
+        if isinstance(position, slice):
+            self._order[position] = array("H", map(_intern_table.id_of, value))
+        else:
+            self._order[position] = _intern_table.id_of(value)
+        self._rebuild_bits()
+
+    def __delitem__(self, position) -> None:
+        del self._order[position]
+        self._rebuild_bits()
+
+    def insert(self, position: int, value: str) -> None:
+        index = _intern_table.id_of(value)
+        self._order.insert(position, index)
+        self._bits |= 1 << index
+
+    def append(self, value: str) -> None:
+        index = _intern_table.id_of(value)
+        self._order.append(index)
+        self._bits |= 1 << index
+
+    def __contains__(self, value: Any) -> bool:
+        index = _intern_table.find(value)
+        return index is not None and bool(self._bits >> index & 1)
+
+    def __iter__(self) -> Iterator[str]:
+        return (_intern_table.value_of(index) for index in self._order)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, IdList):
+            return self._order == other._order
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class CompactUserRecord(MutableMapping):
+    """以 __slots__ 儲存常用欄位的用戶資料，其餘欄位放在 _extra"""
+
+    FIELDS = (
+        "name",
+        "lv",
+        "exp",
+        "money",
+        "debt",
+        "last_sign_in",
+        "sign_in_streak",
+        "pet_name",
+        "pet_affection",
+        "schema_version",
+        "achievements",
+        "found_flags",
+        "used_features",
+    )
+    LIST_FIELDS = frozenset(("achievements", "found_flags", "used_features"))
+    _FIELD_SET = frozenset(FIELDS)
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self._extra: Optional[Dict[str, Any]] = None
+        if data:
+            for field, value in data.items():
+                self[field] = value
+
+    def __getitem__(self, field: str) -> Any:
+        if field in self._FIELD_SET:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+        if self._extra is None:
+            raise KeyError(field)
+        return self._extra[field]
+
+    def __setitem__(self, field: str, value: Any) -> None:
+        if field in self._FIELD_SET:
+            if field in self.LIST_FIELDS and not isinstance(value, IdList):
+                value = IdList(value or ())
+            setattr(self, field, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[field] = value
+
+    def __delitem__(self, field: str) -> None:
+        if field in self._FIELD_SET:
+            try:
+                delattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+        elif self._extra is not None and field in self._extra:
+            del self._extra[field]
+        else:
+            raise KeyError(field)
+
+    def __contains__(self, field: Any) -> bool:
+        if field in self._FIELD_SET:
+            return hasattr(self, field)
+        return self._extra is not None and field in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        """與 dict.copy 相同，返回淺複製的一般 dict"""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"CompactUserRecord({dict(self.items())!r})"
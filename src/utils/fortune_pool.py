@@ -0,0 +1,112 @@
+"""
+預先生成的運勢圖片池
+
+簽到時的語錄來自固定的清單，因此可以事先把圖片生成好：
+- 背景任務維持一定數量「語錄 + 圖片」的現成組合
+- 只在圖片生成佇列空閒時補充，並使用背景優先順序，不會擠掉使用者的請求
+- 簽到時直接從池中取用，不必等待圖片生成
+"""
+
+import asyncio
+import random
+from io import BytesIO
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND
+
+
+class FortuneImagePool:
+    """維持一定數量預先生成的運勢圖片"""
+
+    def __init__(
+        self,
+        pick_quote: Callable[[], str],
+        generate: Callable[[str, int], Awaitable[Optional[BytesIO]]],
+        is_idle: Callable[[], bool],
+        target_size: int,
+        refill_interval: float,
+    ):
+        """
+        參數:
+            pick_quote: 隨機挑選一句語錄的函式
+            generate: 生成圖片的協程函式，參數為 prompt 與優先順序
+            is_idle: 圖片生成佇列是否空閒
+            target_size: 池中要維持的圖片數
+            refill_interval: 檢查是否需要補充的間隔秒數
+        """
+        self._pick_quote = pick_quote
+        self._generate = generate
+        self._is_idle = is_idle
+        self.target_size = target_size
+        self.refill_interval = refill_interval
+
+        self._ready: List[Tuple[str, bytes]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.served = 0
+        self.empty = 0
+        self.generated = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def take(self) -> Optional[Tuple[str, BytesIO]]:
+        """取出一組語錄與圖片；池是空的時返回 None"""
+        # 取出後提醒背景任務補充
+        self._wakeup.set()
+        if not self._ready:
+            self.empty += 1
+            return None
+        quote, image_bytes = self._ready.pop(random.randrange(len(self._ready)))
+        self.served += 1
+        return quote, BytesIO(image_bytes)
+
+    def start(self) -> None:
+        """啟動背景補充任務（需在事件迴圈中呼叫）"""
+        if self.target_size <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        """停止背景補充任務"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refill_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            # 一次只補一張，每張之間都重新確認佇列是否空閒
+            while len(self._ready) < self.target_size and self._is_idle():
+                if not await self._refill_one():
+                    break
+
+    async def _refill_one(self) -> bool:
+        """生成一張新的圖片放進池中，失敗時返回 False"""
+        ready_quotes = {quote for quote, _ in self._ready}
+        quote = self._pick_quote()
+        if quote in ready_quotes:
+            # 語錄清單很短時可能抽到重複的，換一句再試；仍重複就等下一輪
+            quote = self._pick_quote()
+            if quote in ready_quotes:
+                return False
+
+        try:
+            image = await self._generate(quote, PRIORITY_BACKGROUND)
+        except Exception as e:
+            print(f"⚠️ 預先生成運勢圖片失敗：{e}")
+            return False
+        if image is None:
+            return False
+
+        self._ready.append((quote, image.getvalue()))
+        self.generated += 1
+        return True
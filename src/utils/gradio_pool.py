@@ -0,0 +1,199 @@
+"""
+Gradio 客戶端連線池
+
+建立 gradio_client.Client 時會下載 Space 的設定並完成握手，往往要花上好幾秒。
+連線池讓整個程序共用少數幾個預先建立好的客戶端：
+- 啟動時在背景建立客戶端，不阻塞登入
+- 每個客戶端同一時間只借給一個工作使用（Client 不保證執行緒安全）
+- 使用時出錯的客戶端直接丟棄，並在背景補建新的
+- 定期對閒置的客戶端做健康檢查，失敗的同樣丟棄重建
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+
+class GradioClientPool:
+    """固定大小、可自動補建的 Gradio 客戶端池"""
+
+    def __init__(
+        self,
+        create: Callable[[], Any],
+        size: int,
+        health_check: Optional[Callable[[Any], Awaitable[bool]]] = None,
+        health_interval: float = 300.0,
+        retry_delay: float = 30.0,
+    ):
+        """
+        參數:
+            create: 建立客戶端的同步函式（會在執行緒中呼叫）
+            size: 池中最多的客戶端數
+            health_check: 檢查閒置客戶端是否可用的協程函式，None 表示不檢查
+            health_interval: 健康檢查的間隔秒數
+            retry_delay: 建立客戶端失敗後，背景補建前等待的秒數
+        """
+        self._create = create
+        self.size = max(1, size)
+        self._health_check = health_check
+        self.health_interval = health_interval
+        self.retry_delay = retry_delay
+
+        self._idle: List[Any] = []
+        # 已建立（閒置或借出中）加上建立中的客戶端數
+        self._count = 0
+        self._waiters: List[asyncio.Future] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self._health_task: Optional[asyncio.Task] = None
+
+        self.created = 0
+        self.discarded = 0
+        self.reused = 0
+        self._last_checked = 0.0
+
+    # ----- 建立與歸還 -----
+
+    async def _build(self) -> Optional[Any]:
+        """建立一個客戶端，失敗時返回 None（名額會被釋放）"""
+        try:
+            client = await asyncio.to_thread(self._create)
+        except Exception as e:
+            self._count -= 1
+            print(f"⚠️ 建立 Gradio 客戶端失敗：{e}")
+            return None
+        self.created += 1
+        return client
+
+    def _give(self, client: Any) -> None:
+        """把客戶端交給等待中的工作，沒有人等待時放回閒置清單"""
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(client)
+                return
+        self._idle.append(client)
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, delay: float = 0.0) -> None:
+        """在背景補建一個客戶端"""
+        if delay:
+            await asyncio.sleep(delay)
+        if self._count >= self.size:
+            return
+        self._count += 1
+        client = await self._build()
+        if client is None:
+            # 服務可能暫時無法使用，稍後再試
+            if self._waiters or self._count == 0:
+                self._spawn(self._refill(self.retry_delay))
+            return
+        self._give(client)
+
+    async def acquire(self) -> Any:
+        """
+        借出一個客戶端，用完後必須呼叫 release() 或 discard()
+
+        例外:
+            建立客戶端時發生的錯誤（池中沒有可用客戶端且當場建立失敗）
+        """
+        self._ensure_health_task()
+        if self._idle:
+            self.reused += 1
+            return self._idle.pop()
+
+        if self._count < self.size:
+            self._count += 1
+            try:
+                client = await asyncio.to_thread(self._create)
+            except BaseException:
+                self._count -= 1
+                raise
+            self.created += 1
+            return client
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            client = await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 剛拿到客戶端就被取消，轉交給下一位
+                self._give(waiter.result())
+            raise
+        self.reused += 1
+        return client
+
+    def release(self, client: Any) -> None:
+        """歸還正常運作的客戶端"""
+        self._give(client)
+
+    def discard(self, client: Any) -> None:
+        """丟棄出錯的客戶端，並在背景補建一個新的"""
+        self._count -= 1
+        self.discarded += 1
+        self._spawn(self._refill())
+
+    # ----- 啟動與健康檢查 -----
+
+    def start(self) -> None:
+        """在背景預先建立所有客戶端（需在事件迴圈中呼叫）"""
+        for _ in range(self.size - self._count):
+            self._spawn(self._refill())
+        self._ensure_health_task()
+
+    def _ensure_health_task(self) -> None:
+        if self._health_check is None:
+            return
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(
+                self._health_loop()
+            )
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_idle()
+
+    async def check_idle(self) -> None:
+        """檢查所有閒置的客戶端，不健康的丟棄重建"""
+        self._last_checked = time.time()
+        # 檢查期間先從閒置清單取出，避免同時被借出
+        clients, self._idle = self._idle, []
+        for client in clients:
+            try:
+                healthy = await self._health_check(client)
+            except Exception as e:
+                print(f"⚠️ Gradio 客戶端健康檢查失敗：{e}")
+                healthy = False
+            if healthy:
+                self._give(client)
+            else:
+                self.discard(client)
+
+    def stats(self) -> Dict[str, Any]:
+        """連線池統計資料"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self._count - len(self._idle),
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded,
+            "last_checked": self._last_checked,
+        }
+
+    async def close(self) -> None:
+        """停止背景任務並清空連線池"""
+        tasks = list(self._tasks)
+        if self._health_task is not None:
+            tasks.append(self._health_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._health_task = None
+        self._idle = []
+        self._count = 0
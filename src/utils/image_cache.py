@@ -0,0 +1,243 @@
+"""
+遠端圖片的位元組快取
+
+以 URL 為鍵保存下載過的圖片：
+- 記憶體層：LRU，以總位元組數為上限
+- 可選的磁碟層：每張圖片一個資料檔加一個中繼資料檔，重啟後仍可命中，
+  超過容量上限時刪除最久未使用的檔案
+- 超過 max_age 的項目會帶著 ETag / Last-Modified 重新驗證，伺服器回 304 時沿用原本的內容
+- 重新驗證失敗（網路錯誤）時仍返回舊的內容
+- 同一個 URL 同時只會下載一次
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from src import config
+from src.utils.single_flight import SingleFlight
+
+
+@dataclass
+class CachedImage:
+    """快取中的一張圖片"""
+
+    data: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+
+
+class ImageByteCache:
+    """以 URL 為鍵的圖片位元組 LRU 快取，支援 HTTP 條件式重新驗證"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_age: float,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+        request_timeout: float = 15.0,
+    ):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_writes = 0
+        self.request_timeout = request_timeout
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._total_bytes = 0
+        self._fetches = SingleFlight()
+
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # ----- 記憶體層 -----
+
+    def _remember(self, url: str, entry: CachedImage) -> None:
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self._total_bytes -= len(old.data)
+        if len(entry.data) > self.max_bytes:
+            return
+        self._entries[url] = entry
+        self._total_bytes += len(entry.data)
+        while self._total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= len(evicted.data)
+
+    # ----- 磁碟層（在執行緒中執行） -----
+
+    def _disk_paths(self, url: str):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.disk_dir, name)
+        return f"{base}.bin", f"{base}.json"
+
+    def _read_disk(self, url: str) -> Optional[CachedImage]:
+        data_path, meta_path = self._disk_paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+            # 更新修改時間，讓清理時依最近使用的順序淘汰
+            os.utime(data_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return None
+        return CachedImage(
+            data=data,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            fetched_at=float(meta.get("fetched_at", 0)),
+        )
+
+    def _write_disk(self, url: str, entry: CachedImage) -> None:
+        data_path, meta_path = self._disk_paths(url)
+        tmp_path = f"{data_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(entry.data)
+        os.replace(tmp_path, data_path)
+
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "url": url,
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "fetched_at": entry.fetched_at,
+                },
+                f,
+            )
+        os.replace(tmp_path, meta_path)
+
+        self._disk_writes += 1
+        if self._disk_writes % 50 == 1:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """磁碟快取超過容量上限時，從最久未使用的圖片開始刪除"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".bin"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            for stale in (path, f"{path[:-4]}.json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    async def _store(self, url: str, entry: CachedImage) -> None:
+        self._remember(url, entry)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, url, entry)
+            except OSError as e:
+                print(f"⚠️ 寫入圖片快取檔失敗：{e}")
+
+    # ----- 下載 -----
+
+    async def _download(
+        self, session: aiohttp.ClientSession, url: str, cached: Optional[CachedImage]
+    ) -> Optional[bytes]:
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            async with session.get(
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            ) as resp:
+                if resp.status == 304 and cached is not None:
+                    self.revalidated += 1
+                    cached.fetched_at = time.time()
+                    await self._store(url, cached)
+                    return cached.data
+                if resp.status != 200:
+                    print(f"⚠️ 下載圖片失敗（HTTP {resp.status}）：{url}")
+                    return cached.data if cached is not None else None
+                data = await resp.read()
+                entry = CachedImage(
+                    data=data,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    fetched_at=time.time(),
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠️ 下載圖片失敗：{e}")
+            # 重新驗證失敗時沿用舊的內容
+            return cached.data if cached is not None else None
+
+        self.downloads += 1
+        await self._store(url, entry)
+        return data
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        cached = self._entries.get(url)
+        if cached is None and self.disk_dir:
+            cached = await asyncio.to_thread(self._read_disk, url)
+            if cached is not None:
+                self._remember(url, cached)
+
+        if cached is not None and time.time() - cached.fetched_at < self.max_age:
+            self.hits += 1
+            if url in self._entries:
+                self._entries.move_to_end(url)
+            return cached.data
+
+        return await self._download(session, url, cached)
+
+    # ----- 公開介面 -----
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        """取得圖片位元組，優先使用快取；下載失敗且沒有快取時返回 None"""
+        return await self._fetches.run(url, lambda: self._fetch(session, url))
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計資料"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "downloads": self.downloads,
+        }
+
+
+# MyGO / ave-mujica 圖片共用的快取（模組層級，重新載入 cog 時不會清空）
+mygo_image_cache = ImageByteCache(
+    max_bytes=config.MYGO_IMAGE_CACHE_MAX_BYTES,
+    max_age=config.MYGO_IMAGE_CACHE_MAX_AGE,
+    disk_dir=config.MYGO_IMAGE_CACHE_DIR,
+    disk_max_bytes=config.MYGO_IMAGE_CACHE_DISK_MAX_BYTES,
+)
@@ -2,56 +2,132 @@
 圖片生成工具函式。
 
 此模組負責與 Hugging Face Spaces 的 Gradio 應用程序進行溝通。
+同時進行中的相同 prompt 只會實際生成一次，所有呼叫端共用同一張圖片。
+
+生成工作經由 ImageJobQueue 排隊，由固定數量的 worker 處理：
+gradio_client 的同步呼叫在專用執行緒池中執行，結果以 aiohttp 非同步下載，
+事件迴圈不會因為圖片生成而卡住。
+Gradio 客戶端由連線池共用，不必每張圖都重新建立連線。
+生成結果保存在磁碟快取中，重複的 prompt 直接返回之前的圖片。
+返回給呼叫端前會依用途縮小並重新編碼（見 image_postprocess）。
 """
 
+import asyncio
 from io import BytesIO
 from typing import Optional
-import requests
+
+import aiohttp
 from gradio_client import Client
 from src import config
 
 from .prompt import LLM_GEN_IMAGE_PROMPT
-from .llm import llm_model
+from .llm import PRIORITY_INTERACTIVE, generate_content, llm_model
+from .llm_cache import make_cache_key
+from .single_flight import SingleFlight
+from .image_pipeline import ImageJobQueue
+from .gradio_pool import GradioClientPool
+from .image_result_cache import ImageResultCache
+from .image_postprocess import postprocess_image
+
+DEFAULT_IMAGE_GEN_MODEL = "black-forest-labs/FLUX.1-schnell"
+
+# 合併同時進行中的相同圖片生成請求
+_image_requests = SingleFlight()
+
+# 圖片生成工作佇列
+_image_jobs = ImageJobQueue(
+    worker_count=config.IMAGE_GEN_WORKERS,
+    job_timeout=config.IMAGE_GEN_TIMEOUT,
+    background_queue_limit=config.IMAGE_GEN_BACKGROUND_QUEUE_LIMIT,
+)
+
+# 共用的 Gradio 客戶端（啟動時預先建立）
+_client_pool = GradioClientPool(
+    lambda: _create_client(),
+    size=config.IMAGE_GEN_CLIENT_POOL_SIZE,
+    health_check=lambda client: _check_client(client),
+    health_interval=config.IMAGE_GEN_CLIENT_HEALTH_INTERVAL,
+)
+
+# 生成結果的磁碟快取（IMAGE_CACHE_DIR 留空則停用）
+_result_cache: Optional[ImageResultCache] = (
+    ImageResultCache(
+        config.IMAGE_CACHE_DIR,
+        max_bytes=config.IMAGE_CACHE_MAX_BYTES,
+        prewarm_manifest=config.IMAGE_CACHE_PREWARM_MANIFEST,
+    )
+    if config.IMAGE_CACHE_DIR
+    else None
+)
 
+# 下載生成結果共用的連線池（第一次下載時建立）
+_session: Optional[aiohttp.ClientSession] = None
 
-async def generate_image(prompt: str) -> Optional[BytesIO]:
+
+async def generate_image(
+    prompt: str, priority: int = PRIORITY_INTERACTIVE, profile: Optional[str] = "display"
+) -> Optional[BytesIO]:
     """
     使用 Hugging Face Spaces 的 Gradio 應用程序生成圖片。
 
     Args:
         prompt: 用於生成圖片的提示詞。
+        priority: 排程優先順序（LLM 調整 prompt 與圖片生成佇列），背景工作請用 PRIORITY_BACKGROUND。
+        profile: 後處理規格（"display" 或 "avatar"），None 表示返回原圖。
+            上傳時請用 image_postprocess.image_filename() 取得符合格式的檔名。
 
     Returns:
         包含圖片資料的 BytesIO 物件，失敗時返回 None。
     """
+    key = make_cache_key(_image_model_name(), prompt)
+    image_bytes = await _image_requests.run(
+        key, lambda: _generate_image_bytes(prompt, priority), priority
+    )
+    if image_bytes is None:
+        return None
+    # 快取中保存原圖，依各呼叫端的用途分別處理；每個呼叫端各自拿到一份 BytesIO
+    return BytesIO(await postprocess_image(image_bytes, profile))
+
+
+async def _generate_image_bytes(prompt: str, priority: int) -> Optional[bytes]:
+    """實際生成圖片並返回原始位元組，失敗時返回 None。"""
     try:
         # 驗證環境配置
         if not _validate_config():
             return None
 
+        # 同一句 prompt 生成過的圖片直接使用，連 LLM 調整都省略
+        model_name = _image_model_name()
+        if _result_cache is not None:
+            cached = await _result_cache.get_by_prompt(model_name, prompt)
+            if cached is not None:
+                return cached
+
         # 先經過 LLM 進行 prompt 調整，再進行 format 注入
         gen_prompt = prompt
         if llm_model is not None:
             try:
-                llm_response = await _call_llm_for_image_prompt(prompt)
+                llm_response = await _call_llm_for_image_prompt(prompt, priority)
                 if llm_response:
                     gen_prompt = llm_response
             except Exception as e:
                 print(f"⚠️ LLM prompt 轉換失敗，將使用原始 prompt: {e}")
         print(f"🖼️ 生成圖片的 prompt: {gen_prompt}")
 
-        # 建立客戶端並生成圖片
-        client = _create_client()
-        result = client.predict(gen_prompt)
+        if _result_cache is not None:
+            cached = await _result_cache.get(model_name, prompt, gen_prompt)
+            if cached is not None:
+                return cached
 
-        if result is None:
-            print("❌ 無法連接到圖片生成服務")
-            return None
+        # 排入工作佇列，由 worker 生成並取回圖片
+        image_bytes = await _image_jobs.submit(lambda: _render_image(gen_prompt), priority)
+        if image_bytes is not None and _result_cache is not None:
+            await _result_cache.put(model_name, prompt, gen_prompt, image_bytes)
+        return image_bytes
 
-        # 處理並返回結果
-        return _process_result(result)
-
-    except (ConnectionError, requests.RequestException) as e:
+    except asyncio.TimeoutError:
+        return None
+    except (ConnectionError, aiohttp.ClientError) as e:
         print(f"❌ 網路錯誤: {e}")
         return None
     except (ValueError, AttributeError) as e:
@@ -59,26 +135,40 @@ async def generate_image(prompt: str) -> Optional[BytesIO]:
         return None
 
 
-# LLM prompt 轉換輔助函式
-import asyncio
+async def _render_image(gen_prompt: str) -> Optional[bytes]:
+    """在工作佇列中執行：呼叫 Space 生成圖片並取回位元組。"""
+    client = await _client_pool.acquire()
+    try:
+        result = await _image_jobs.run_blocking(client.predict, gen_prompt)
+    except BaseException:
+        # 出錯或逾時（執行緒可能仍在使用）的客戶端不再放回池中
+        _client_pool.discard(client)
+        raise
+    _client_pool.release(client)
+
+    if result is None:
+        print("❌ 無法連接到圖片生成服務")
+        return None
 
+    # 處理並返回結果
+    return await _process_result(result)
 
-async def _call_llm_for_image_prompt(user_prompt: str) -> Optional[str]:
+
+async def _call_llm_for_image_prompt(
+    user_prompt: str, priority: int = PRIORITY_INTERACTIVE
+) -> Optional[str]:
     """
     使用 LLM 將使用者輸入轉換為適合圖片生成的 prompt。
+    背景請求被丟棄時返回 None，改用原始 prompt。
     """
     if llm_model is None:
         return None
-    # Gemini API 目前僅同步，需用執行緒 offload
-    loop = asyncio.get_event_loop()
-
-    def sync_llm():
-        # 使用和主流程一致的 prompt 格式
-        prompt = LLM_GEN_IMAGE_PROMPT.format(user_prompt=user_prompt)
-        response = llm_model.generate_content(prompt)
-        return response.text.strip() if hasattr(response, "text") else str(response)
-
-    return await loop.run_in_executor(None, sync_llm)
+    # 使用和主流程一致的 prompt 格式
+    prompt = LLM_GEN_IMAGE_PROMPT.format(user_prompt=user_prompt)
+    response = await generate_content(prompt, priority=priority)
+    if response is None:
+        return None
+    return response.text.strip() if hasattr(response, "text") else str(response)
 
 
 def _validate_config() -> None:
@@ -89,33 +179,49 @@ def _validate_config() -> None:
     return True
 
 
-def _create_client() -> Client:
-    """建立並返回 Gradio 客戶端。"""
-    space_name = (
-        getattr(config, "HUGGINGFACE_IMAGE_GEN_MODEL", None)
-        or "black-forest-labs/FLUX.1-schnell"
+def _image_model_name() -> str:
+    """目前使用的圖片生成 Space 名稱。"""
+    return (
+        getattr(config, "HUGGINGFACE_IMAGE_GEN_MODEL", None) or DEFAULT_IMAGE_GEN_MODEL
     )
-    return Client(space_name, hf_token=config.HUGGINGFACE_TOKEN)
 
 
-def _process_result(result) -> Optional[BytesIO]:
+def _create_client() -> Client:
+    """建立並返回 Gradio 客戶端（同步，由連線池在執行緒中呼叫）。"""
+    return Client(_image_model_name(), hf_token=config.HUGGINGFACE_TOKEN)
+
+
+async def _check_client(client: Client) -> bool:
+    """確認客戶端連線的 Space 仍可使用（讀取 Space 的設定頁面）。"""
+    src = getattr(client, "src", None)
+    if not src:
+        return True
+    headers = {"Authorization": f"Bearer {config.HUGGINGFACE_TOKEN}"}
+    try:
+        async with _get_session().get(f"{src.rstrip('/')}/config", headers=headers) as response:
+            return response.status == 200
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return False
+
+
+async def _process_result(result) -> Optional[bytes]:
     """
-    處理 Gradio 返回的結果並轉換為 BytesIO。
+    處理 Gradio 返回的結果並取出圖片位元組。
 
     Args:
         result: Gradio 客戶端返回的結果。
 
     Returns:
-        包含圖片資料的 BytesIO 物件，失敗時返回 None。
+        圖片的位元組，失敗時返回 None。
     """
     # 解析結果格式
     actual_result = _extract_actual_result(result)
 
     # 根據結果類型進行處理
     if isinstance(actual_result, str):
-        return _handle_string_result(actual_result)
+        return await _handle_string_result(actual_result)
     if hasattr(actual_result, "read"):
-        return _handle_file_object(actual_result)
+        return await asyncio.to_thread(actual_result.read)
 
     print(f"❓ 未知的結果格式: {type(actual_result)}")
     print(f"結果內容: {actual_result}")
@@ -130,38 +236,71 @@ def _extract_actual_result(result):
     return result
 
 
-def _handle_string_result(result_str: str) -> Optional[BytesIO]:
+async def _handle_string_result(result_str: str) -> Optional[bytes]:
     """處理字串類型的結果（URL 或檔案路徑）。"""
     if result_str.startswith("http"):
-        return _download_from_url(result_str)
+        return await _download_from_url(result_str)
     else:
-        return _read_local_file(result_str)
+        return await asyncio.to_thread(_read_local_file, result_str)
 
 
-def _download_from_url(url: str) -> Optional[BytesIO]:
+def _get_session() -> aiohttp.ClientSession:
+    """取得共用的 aiohttp 連線池。"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return _session
+
+
+async def _download_from_url(url: str) -> Optional[bytes]:
     """從 URL 下載圖片。"""
     try:
         print(f"📥 下載圖片 URL: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return BytesIO(response.content)
-    except requests.RequestException as e:
+        async with _get_session().get(url) as response:
+            response.raise_for_status()
+            return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"❌ 下載圖片失敗: {e}")
         return None
 
 
-def _read_local_file(file_path: str) -> Optional[BytesIO]:
+def _read_local_file(file_path: str) -> Optional[bytes]:
     """讀取本地檔案。"""
     try:
         with open(file_path, "rb") as f:
-            return BytesIO(f.read())
+            return f.read()
     except FileNotFoundError:
         return None
 
 
-def _handle_file_object(file_obj) -> BytesIO:
-    """處理檔案物件。"""
-    return BytesIO(file_obj.read())
+def start() -> None:
+    """在背景載入圖片快取並預先建立 Gradio 客戶端（需在事件迴圈中呼叫）。"""
+    if _result_cache is not None:
+        # 先載入快取與預熱清單，第一次生成時就能命中
+        asyncio.get_running_loop().create_task(_result_cache.load(_image_model_name()))
+    if not config.HUGGINGFACE_TOKEN:
+        return
+    _client_pool.start()
+
+
+def is_idle() -> bool:
+    """圖片生成佇列目前是否空閒（可以安排背景預先生成）。"""
+    return _image_jobs.idle
+
+
+def get_client_pool_stats() -> dict:
+    """Gradio 客戶端連線池的統計資料。"""
+    return _client_pool.stats()
+
+
+async def close() -> None:
+    """關閉圖片生成的 worker 與連線池（機器人關閉時呼叫）。"""
+    global _session
+    await _image_jobs.close()
+    await _client_pool.close()
+    if _session is not None:
+        await _session.close()
+        _session = None
 
 
 def _handle_api_error(error_msg: str) -> None:
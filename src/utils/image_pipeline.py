@@ -0,0 +1,138 @@
+"""
+圖片生成工作佇列
+
+圖片生成很慢（數十秒），而且 gradio_client 只有同步 API，因此：
+- 所有生成工作排入同一個佇列，由固定數量的 worker 依優先順序處理
+- 同步的呼叫在專用的執行緒池中執行（run_blocking），不會卡住事件迴圈
+- 每個工作都有逾時；呼叫端只需要 await 結果
+- 排隊中的背景工作過多時直接放棄新的背景工作，避免擠掉使用者的指令
+"""
+
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional
+
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+class ImageJobQueue:
+    """以固定數量的 worker 處理圖片生成工作的優先佇列"""
+
+    def __init__(self, worker_count: int, job_timeout: float, background_queue_limit: int):
+        self.worker_count = max(1, worker_count)
+        self.job_timeout = job_timeout
+        self.background_queue_limit = background_queue_limit
+        # 同步呼叫專用的執行緒池，大小與 worker 數相同
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.worker_count, thread_name_prefix="image-gen"
+        )
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        # 目前正在執行的工作數
+        self.running = 0
+        # 排隊中的背景工作數（判斷是否放棄背景工作時不計入互動工作）
+        self.queued_background = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.shed = 0
+
+    def _ensure_workers(self) -> None:
+        """第一次送出工作時才建立佇列與 worker（需要執行中的事件迴圈）"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, factory, future = await self._queue.get()
+            if priority >= PRIORITY_BACKGROUND:
+                self.queued_background -= 1
+            try:
+                if future.done():
+                    # 呼叫端在排隊時已取消
+                    continue
+                job = asyncio.ensure_future(factory())
+                # 呼叫端取消時一併取消進行中的工作
+                future.add_done_callback(
+                    lambda done, job=job: job.cancel() if done.cancelled() else None
+                )
+                self.running += 1
+                try:
+                    result = await asyncio.wait_for(job, timeout=self.job_timeout)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    print(f"⏰ 圖片生成超過 {self.job_timeout:.0f} 秒，已放棄")
+                    if not future.done():
+                        future.set_exception(asyncio.TimeoutError())
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                except Exception as e:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    self.completed += 1
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    self.running -= 1
+            finally:
+                self._queue.task_done()
+
+    async def submit(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Any:
+        """
+        排入一個工作並等待結果
+
+        參數:
+            factory: 產生工作協程的函式，由 worker 呼叫
+            priority: PRIORITY_INTERACTIVE 或 PRIORITY_BACKGROUND
+        回傳:
+            工作的結果；背景工作因佇列過長被放棄時返回 None
+        例外:
+            asyncio.TimeoutError: 工作執行超過 job_timeout
+        """
+        self._ensure_workers()
+        if priority >= PRIORITY_BACKGROUND:
+            if self.queued_background >= self.background_queue_limit:
+                self.shed += 1
+                print("⚠️ 圖片生成佇列過長，略過背景工作")
+                return None
+            self.queued_background += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._sequence), factory, future))
+        return await future
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在圖片生成專用的執行緒池中執行同步函式"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def idle(self) -> bool:
+        """沒有排隊中或執行中的工作"""
+        return self.queued == 0 and self.running == 0
+
+    async def close(self) -> None:
+        """停止所有 worker 並關閉執行緒池"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+"""
+生成圖片的後處理
+
+Space 回傳的通常是很大的 PNG，直接上傳既慢又佔空間，因此在使用前先處理：
+- 縮小到實際顯示的尺寸
+- 重新編碼為 WebP（或減色的 PNG），並控制在容量預算內
+- 去除 EXIF 等中繼資料
+處理是 CPU 密集的工作，在執行緒池中執行；處理失敗時沿用原本的圖片。
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, Optional
+
+from PIL import Image, UnidentifiedImageError
+
+from src import config
+
+# 減色使用的演算法（舊版 Pillow 沒有 Image.Quantize）
+_FAST_OCTREE = getattr(Image, "Quantize", Image).FASTOCTREE
+# 超過容量預算時依序嘗試的 WebP 品質
+_WEBP_QUALITIES = (85, 75, 65, 50)
+# 仍超過預算時每次縮小的比例與最小邊長
+_SHRINK_RATIO = 0.75
+_MIN_SIDE = 128
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """一種用途的輸出規格"""
+
+    max_side: int
+    format: str
+    max_bytes: int
+
+
+PROFILES: Dict[str, ImageProfile] = {
+    # 訊息中的圖片（運勢、寶物等）
+    "display": ImageProfile(
+        max_side=config.IMAGE_DISPLAY_MAX_SIDE,
+        format=config.IMAGE_DISPLAY_FORMAT,
+        max_bytes=config.IMAGE_DISPLAY_MAX_BYTES,
+    ),
+    # 寵物頭像（Webhook 頭像並以 base64 存進用戶資料），維持 PNG
+    "avatar": ImageProfile(
+        max_side=config.IMAGE_AVATAR_MAX_SIDE,
+        format="PNG",
+        max_bytes=config.IMAGE_AVATAR_MAX_BYTES,
+    ),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-post")
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    """以指定格式編碼；新建的輸出不帶任何中繼資料"""
+    output = BytesIO()
+    if image_format == "WEBP":
+        image.save(output, format="WEBP", quality=quality, method=4)
+    else:
+        image.quantize(colors=256, method=_FAST_OCTREE).save(
+            output, format="PNG", optimize=True
+        )
+    return output.getvalue()
+
+
+def process_image(data: bytes, profile: ImageProfile) -> bytes:
+    """
+    縮小並重新編碼圖片（同步，在執行緒中執行）
+
+    回傳:
+        處理後的圖片；無法辨識的圖片或處理結果反而較大時返回原本的資料
+    """
+    try:
+        with Image.open(BytesIO(data)) as source:
+            source.load()
+            mode = "RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB"
+            image = source.convert(mode)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        print(f"⚠️ 無法處理生成的圖片，沿用原圖：{e}")
+        return data
+
+    image.thumbnail((profile.max_side, profile.max_side), Image.LANCZOS)
+    qualities = _WEBP_QUALITIES if profile.format == "WEBP" else (0,)
+
+    while True:
+        for quality in qualities:
+            encoded = _encode(image, profile.format, quality)
+            if len(encoded) <= profile.max_bytes:
+                return encoded if len(encoded) < len(data) else data
+        if max(image.size) * _SHRINK_RATIO < _MIN_SIDE:
+            # 已縮到最小仍超過預算，使用最後一次的結果
+            return encoded if len(encoded) < len(data) else data
+        image = image.resize(
+            (
+                max(1, int(image.width * _SHRINK_RATIO)),
+                max(1, int(image.height * _SHRINK_RATIO)),
+            ),
+            Image.LANCZOS,
+        )
+
+
+async def postprocess_image(data: bytes, profile: Optional[str] = "display") -> bytes:
+    """在執行緒池中處理圖片；profile 為 None 或停用後處理時直接返回原圖"""
+    if not config.IMAGE_POSTPROCESS_ENABLED or profile is None:
+        return data
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, process_image, data, PROFILES[profile])
+
+
+def image_filename(stem: str, image: BytesIO) -> str:
+    """依圖片內容的格式產生檔名，例如 fortune.webp"""
+    header = image.getvalue()[:12]
+    if header.startswith(b"\x89PNG"):
+        extension = "png"
+    elif header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        extension = "webp"
+    elif header.startswith(b"\xff\xd8"):
+        extension = "jpg"
+    elif header[:4] == b"GIF8":
+        extension = "gif"
+    else:
+        extension = "png"
+    return f"{stem}.{extension}"
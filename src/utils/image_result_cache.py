@@ -0,0 +1,268 @@
+"""
+生成圖片的結果快取（內容定址）
+
+同一句 prompt 經常被重複拿來生成圖片（例如每日簽到的運勢語錄），因此把生成結果保存在磁碟上：
+- 圖片檔以「模型名稱 + 最終生成 prompt（LLM 調整後）」的雜湊命名
+- 另外記錄「原始 prompt → 圖片」的對應，命中時連 LLM 調整 prompt 的步驟都能省略
+- 總容量超過上限時，從最久未使用的圖片開始刪除
+- 對應表保存在 manifest.json，重啟後仍可命中；也可以從預先準備好的 manifest 匯入圖片
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.utils.llm_cache import make_cache_key
+
+MANIFEST_FILE = "manifest.json"
+IMAGE_SUFFIX = ".img"
+
+
+class ImageResultCache:
+    """以內容雜湊為鍵、容量上限 LRU 的圖片磁碟快取"""
+
+    def __init__(self, cache_dir: str, max_bytes: int, prewarm_manifest: Optional[str] = None):
+        """
+        參數:
+            cache_dir: 快取目錄
+            max_bytes: 圖片檔的總容量上限（位元組）
+            prewarm_manifest: 啟動時匯入的 manifest 路徑，None 表示不匯入
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.prewarm_manifest = prewarm_manifest or None
+
+        # 圖片雜湊 → 檔案大小，依最近使用的順序排列
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # 原始 prompt 的鍵 → 圖片雜湊
+        self._aliases: Dict[str, str] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        # 對應表同一時間只寫入一次，避免暫存檔互相覆蓋
+        self._manifest_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.prompt_hits = 0
+        self.misses = 0
+
+    # ----- 鍵與路徑 -----
+
+    @staticmethod
+    def image_key(model_name: str, gen_prompt: str) -> str:
+        """最終生成 prompt 對應的圖片雜湊"""
+        return make_cache_key(model_name, gen_prompt)
+
+    @staticmethod
+    def prompt_key(model_name: str, prompt: str) -> str:
+        """原始 prompt 的鍵（與圖片雜湊分開保存，不會互相衝突）"""
+        return make_cache_key(model_name, ["prompt", prompt])
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}{IMAGE_SUFFIX}")
+
+    # ----- 載入（在執行緒中執行） -----
+
+    def _scan(self) -> Dict[str, Any]:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(IMAGE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, entry.name[: -len(IMAGE_SUFFIX)], stat.st_size))
+        files.sort()
+
+        aliases = {}
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                aliases = json.load(f).get("aliases", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ 讀取圖片快取對應表失敗，將重新建立：{e}")
+        return {"files": files, "aliases": aliases}
+
+    def _import_manifest(self, model_name: str) -> List[Any]:
+        """
+        匯入預先準備的圖片，manifest 格式：
+        [{"prompt": "...", "file": "圖片路徑（相對於 manifest）", "gen_prompt": "（可省略）", "model": "（可省略）"}]
+        """
+        try:
+            with open(self.prewarm_manifest, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 讀取圖片預熱清單失敗：{e}")
+            return []
+
+        base_dir = os.path.dirname(os.path.abspath(self.prewarm_manifest))
+        imported = []
+        for item in items:
+            try:
+                model = item.get("model") or model_name
+                prompt = item["prompt"]
+                digest = self.image_key(model, item.get("gen_prompt") or prompt)
+                target = self._path(digest)
+                if not os.path.exists(target):
+                    shutil.copyfile(os.path.join(base_dir, item["file"]), f"{target}.tmp")
+                    os.replace(f"{target}.tmp", target)
+                imported.append((self.prompt_key(model, prompt), digest, os.path.getsize(target)))
+            except (KeyError, TypeError, AttributeError, OSError) as e:
+                print(f"⚠️ 略過無效的圖片預熱項目：{e}")
+        return imported
+
+    async def load(self, model_name: str) -> None:
+        """讀取快取目錄與對應表（只會執行一次），並匯入預熱清單"""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            scanned = await asyncio.to_thread(self._scan)
+            for _, digest, size in scanned["files"]:
+                self._sizes[digest] = size
+                self._total_bytes += size
+            self._aliases = {
+                key: digest
+                for key, digest in scanned["aliases"].items()
+                if digest in self._sizes
+            }
+
+            if self.prewarm_manifest:
+                imported = await asyncio.to_thread(self._import_manifest, model_name)
+                for key, digest, size in imported:
+                    if digest not in self._sizes:
+                        self._sizes[digest] = size
+                        self._total_bytes += size
+                    self._aliases[key] = digest
+                if imported:
+                    print(f"🖼️ 已從預熱清單匯入 {len(imported)} 張圖片")
+                    await self._save_manifest()
+
+            self._loaded = True
+            await self._evict()
+
+    # ----- 讀寫 -----
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 更新修改時間，讓重啟後仍能依最近使用的順序淘汰
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def _write_manifest(self, aliases: Dict[str, str]) -> None:
+        path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "aliases": aliases}, f)
+        os.replace(f"{path}.tmp", path)
+
+    async def _save_manifest(self) -> None:
+        try:
+            async with self._manifest_lock:
+                await asyncio.to_thread(self._write_manifest, dict(self._aliases))
+        except OSError as e:
+            print(f"⚠️ 寫入圖片快取對應表失敗：{e}")
+
+    async def _evict(self) -> None:
+        """超過容量上限時刪除最久未使用的圖片"""
+        removed = []
+        while self._total_bytes > self.max_bytes and self._sizes:
+            digest, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            removed.append(digest)
+        if not removed:
+            return
+
+        def remove_files():
+            for digest in removed:
+                try:
+                    os.remove(self._path(digest))
+                except OSError:
+                    pass
+
+        await asyncio.to_thread(remove_files)
+        gone = set(removed)
+        self._aliases = {key: d for key, d in self._aliases.items() if d not in gone}
+        await self._save_manifest()
+
+    async def _get(self, digest: str) -> Optional[bytes]:
+        if digest not in self._sizes:
+            return None
+        data = await asyncio.to_thread(self._read, digest)
+        if data is None:
+            # 檔案被外部刪除
+            self._total_bytes -= self._sizes.pop(digest, 0)
+            return None
+        self._sizes.move_to_end(digest)
+        return data
+
+    # ----- 公開介面 -----
+
+    async def get_by_prompt(self, model_name: str, prompt: str) -> Optional[bytes]:
+        """以原始 prompt 查詢（命中時不需要再經過 LLM 調整 prompt）"""
+        await self.load(model_name)
+        digest = self._aliases.get(self.prompt_key(model_name, prompt))
+        data = await self._get(digest) if digest else None
+        if data is not None:
+            self.prompt_hits += 1
+        return data
+
+    async def get(self, model_name: str, prompt: str, gen_prompt: str) -> Optional[bytes]:
+        """以最終生成 prompt 查詢，命中時一併記錄原始 prompt 的對應"""
+        await self.load(model_name)
+        digest = self.image_key(model_name, gen_prompt)
+        data = await self._get(digest)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        await self._alias(model_name, prompt, digest)
+        return data
+
+    async def _alias(self, model_name: str, prompt: str, digest: str) -> None:
+        key = self.prompt_key(model_name, prompt)
+        if self._aliases.get(key) != digest:
+            self._aliases[key] = digest
+            await self._save_manifest()
+
+    async def put(self, model_name: str, prompt: str, gen_prompt: str, data: bytes) -> None:
+        """保存生成結果"""
+        await self.load(model_name)
+        if len(data) > self.max_bytes:
+            return
+        digest = self.image_key(model_name, gen_prompt)
+        try:
+            await asyncio.to_thread(self._write, digest, data)
+        except OSError as e:
+            print(f"⚠️ 寫入圖片快取失敗：{e}")
+            return
+        self._total_bytes += len(data) - self._sizes.pop(digest, 0)
+        self._sizes[digest] = len(data)
+        self._aliases[self.prompt_key(model_name, prompt)] = digest
+        await self._save_manifest()
+        await self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計資料"""
+        return {
+            "entries": len(self._sizes),
+            "bytes": self._total_bytes,
+            "prompt_hits": self.prompt_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,78 @@
+"""
+用戶資料變更日誌（append-only journal）
+
+每次變更都以一行 JSON 追加到日誌檔，而不是重寫整個資料檔：
+- {"id": "<用戶 ID>", "record": {...}}  以完整資料取代該用戶
+- {"id": "<用戶 ID>", "set": {...}}     只更新變更的欄位
+
+每筆記錄都是「設定值」而非「增量」，因此重播是冪等的：
+即使在寫入快照後、清空日誌前當機，重新載入時重播同一段日誌也不會出錯。
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable
+
+
+class UserDataJournal:
+    """用戶資料的追加式變更日誌"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def append(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """將多筆變更一次追加到日誌並落盤，返回寫入的筆數"""
+        lines = [
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+            for entry in entries
+        ]
+        if not lines:
+            return 0
+
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return len(lines)
+
+    def replay(self, users: Dict[str, Dict[str, Any]]) -> int:
+        """將日誌依序套用到 users 上，返回成功套用的筆數"""
+        try:
+            f = open(self.file_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return 0
+
+        applied = 0
+        with f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    user_id = str(entry["id"])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # 通常是當機時寫到一半的最後一行，略過即可
+                    print(f"⚠️ 略過無法解析的日誌記錄（第 {line_no} 行）")
+                    continue
+
+                if "record" in entry:
+                    users[user_id] = entry["record"]
+                elif "set" in entry:
+                    users.setdefault(user_id, {}).update(entry["set"])
+                applied += 1
+
+        return applied
+
+    def size(self) -> int:
+        """日誌檔目前的大小（位元組）"""
+        try:
+            return os.path.getsize(self.file_path)
+        except OSError:
+            return 0
+
+    def reset(self) -> None:
+        """清空日誌（在寫入新快照之後呼叫）"""
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
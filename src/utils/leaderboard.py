@@ -0,0 +1,77 @@
+"""
+排行榜索引
+
+為每個排行榜維護一個已排序的陣列，在用戶資料寫入時以 bisect 增量更新，
+查詢前 K 名或某位用戶的名次時不需要重新排序所有用戶。
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+UserRecord = Dict[str, Any]
+ScoreFunc = Callable[[UserRecord], Tuple[Any, ...]]
+
+
+def _number(value: Any) -> Any:
+    """將缺少或無效的數值視為 0，避免排序時比較到 None"""
+    return value if isinstance(value, (int, float)) else 0
+
+
+# 排行榜名稱 → 分數（由大到小排序，tuple 依序比較）
+LEADERBOARD_METRICS: Dict[str, ScoreFunc] = {
+    "money": lambda user: (_number(user.get("money")),),
+    "exp": lambda user: (_number(user.get("lv", 1)), _number(user.get("exp"))),
+    "achievements": lambda user: (len(user.get("achievements") or []),),
+    "found_flags": lambda user: (len(user.get("found_flags") or []),),
+    "pet_affection": lambda user: (_number(user.get("pet_affection")),),
+}
+
+
+class SortedIndex:
+    """以分數由大到小排序的用戶索引，同分時依用戶 ID 排序"""
+
+    def __init__(self, score: ScoreFunc):
+        self._score = score
+        # 排序鍵為 (-分數..., 用戶 ID)，讓 bisect 的遞增順序等於名次順序
+        self._keys: List[Tuple[Any, ...]] = []
+        self._key_of: Dict[str, Tuple[Any, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _make_key(self, user_id: str, record: UserRecord) -> Tuple[Any, ...]:
+        return (*(-value for value in self._score(record)), user_id)
+
+    def rebuild(self, users: Dict[str, UserRecord]) -> None:
+        """以所有用戶重新建立索引（載入資料時使用）"""
+        self._key_of = {
+            user_id: self._make_key(user_id, record) for user_id, record in users.items()
+        }
+        self._keys = sorted(self._key_of.values())
+
+    def update(self, user_id: str, record: UserRecord) -> None:
+        """更新單一用戶的位置，分數沒變時不做任何事"""
+        new_key = self._make_key(user_id, record)
+        old_key = self._key_of.get(user_id)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+        insort(self._keys, new_key)
+        self._key_of[user_id] = new_key
+
+    def remove(self, user_id: str) -> None:
+        old_key = self._key_of.pop(user_id, None)
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+
+    def top(self, limit: int) -> List[str]:
+        """前 limit 名的用戶 ID"""
+        return [key[-1] for key in self._keys[:limit]]
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """用戶的名次（從 1 開始），不在索引中時返回 None"""
+        key = self._key_of.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
@@ -1,31 +1,282 @@
+"""
+Gemini LLM 用戶端
+
+所有 LLM 呼叫都走非同步 API，不會卡住事件迴圈：
+- 經由排程器（見 llm_scheduler）限制速率與同時請求數，互動指令優先於背景工作，
+  背景請求排隊過長時會被丟棄，收到 429 時自動退避
+- 每次呼叫都有逾時（LLM_TIMEOUT，可逐次覆寫）
+- 呼叫端的任務被取消時，進行中的請求也會一併取消
+- generate_text 的回應會依 prompt 快取（見 llm_cache），創意類呼叫可用 cache=False 停用
+- 同時進行中的相同 prompt 只會送出一次請求（single-flight）
+- stream_content 逐段產生回應文字，讓呼叫端在生成完成前就能顯示內容；
+  可選擇快取完整的回應，命中時一次產生全部文字
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
 import google.generativeai as genai
 
 from src import config
+from src.utils.llm_cache import LLMResponseCache, make_cache_key
+from src.utils.llm_scheduler import (
+    PRIORITY_INTERACTIVE,
+    get_scheduler,
+    is_rate_limit_error,
+)
+from src.utils.single_flight import SingleFlight
+
+LLM_MODEL_NAME = "gemini-2.0-flash"
 
 llm_model = None
 if config.GEMINI_API_KEY:
     genai.configure(api_key=config.GEMINI_API_KEY)
-    llm_model = genai.GenerativeModel("gemini-2.0-flash")
+    llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
+
+# 送往此模型的所有請求都經過同一個排程器
+_scheduler = get_scheduler(LLM_MODEL_NAME)
+
+# 串流回應結束的標記
+_STREAM_END = object()
+
+# 合併同時進行中的相同 generate_text 請求
+_text_requests = SingleFlight()
+
+# generate_text 的回應快取
+response_cache: Optional[LLMResponseCache] = None
+if config.LLM_CACHE_ENABLED:
+    response_cache = LLMResponseCache(
+        max_entries=config.LLM_CACHE_MAX_ENTRIES,
+        ttl=config.LLM_CACHE_TTL,
+        disk_dir=config.LLM_CACHE_DIR,
+        disk_max_entries=config.LLM_CACHE_DISK_MAX_ENTRIES,
+    )
+
+
+async def generate_content(
+    contents: Any,
+    timeout: Optional[float] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> Any:
+    """
+    非同步送出一次 Gemini 請求並返回原始回應
+
+    參數:
+        contents: 傳給 generate_content_async 的內容（字串或內容列表）
+        timeout: 請求逾時秒數（不含排隊時間），預設為 config.LLM_TIMEOUT
+        priority: PRIORITY_INTERACTIVE（使用者指令）或 PRIORITY_BACKGROUND（背景工作）
+    回傳:
+        Gemini 回應物件；AI 服務未設定或背景請求被丟棄時返回 None
+    例外:
+        asyncio.TimeoutError: 請求逾時
+    """
+    if not llm_model:
+        return None
+
+    if not await _scheduler.acquire(priority):
+        print("⚠️ LLM 背景請求過多，略過此次請求")
+        return None
+    try:
+        response = await asyncio.wait_for(
+            llm_model.generate_content_async(contents),
+            timeout=config.LLM_TIMEOUT if timeout is None else timeout,
+        )
+    except Exception as e:
+        if is_rate_limit_error(e):
+            _scheduler.report_rate_limited()
+        raise
+    finally:
+        _scheduler.release()
+    _scheduler.report_success()
+    return response
+
+
+async def stream_content(
+    contents: Any,
+    timeout: Optional[float] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    cache: bool = False,
+    cache_on: Any = None,
+    cache_ttl: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    以串流方式送出 Gemini 請求，逐段產生回應文字
+
+    參數:
+        contents: 傳給 generate_content_async 的內容（字串或內容列表）
+        timeout: 等待每一段回應的逾時秒數，預設為 config.LLM_TIMEOUT
+        priority: 排程優先順序
+        cache: 是否快取完整的回應；命中時一次產生全部文字
+        cache_on: 快取鍵依據的內容，預設為 contents
+        cache_ttl: 此回應在快取中的存活秒數，預設為 config.LLM_CACHE_TTL
+    產生:
+        str: 依序到達的回應文字片段；AI 服務未設定或背景請求被丟棄時不產生任何內容
+    例外:
+        asyncio.TimeoutError: 等待下一段回應逾時
+    """
+    if not llm_model:
+        return
+
+    cache_key = None
+    if cache and response_cache is not None:
+        cache_key = make_cache_key(
+            LLM_MODEL_NAME, contents if cache_on is None else cache_on
+        )
+    if cache_key is not None:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    async for text in _stream_chunks(contents, timeout, priority):
+        parts.append(text)
+        yield text
+
+    # 只快取完整結束的回應，中斷或出錯的不會執行到這裡
+    full_text = "".join(parts).strip()
+    if cache_key is not None and full_text:
+        await response_cache.set(cache_key, full_text, ttl=cache_ttl)
+
+
+async def _stream_chunks(
+    contents: Any, timeout: Optional[float], priority: int
+) -> AsyncIterator[str]:
+    """
+    實際送出串流請求並逐段產生文字
+
+    回應由獨立的任務讀進佇列，排程器的名額只在模型生成期間佔用：
+    呼叫端處理每一段（例如編輯 Discord 訊息）的時間不會卡住其他 LLM 請求。
+    """
+    limit = config.LLM_TIMEOUT if timeout is None else timeout
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        # 在任務中取得名額，任務還沒開始就被取消時不會佔用名額
+        if not await _scheduler.acquire(priority):
+            print("⚠️ LLM 背景請求過多，略過此次請求")
+            queue.put_nowait(_STREAM_END)
+            return
+        try:
+            response = await asyncio.wait_for(
+                llm_model.generate_content_async(contents, stream=True), timeout=limit
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=limit)
+                except StopAsyncIteration:
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 被安全過濾或沒有文字內容的片段
+                    continue
+                if text:
+                    queue.put_nowait(text)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                _scheduler.report_rate_limited()
+            queue.put_nowait(e)
+            return
+        finally:
+            _scheduler.release()
+        _scheduler.report_success()
+        queue.put_nowait(_STREAM_END)
 
+    reader = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 呼叫端中途停止讀取時，一併停止接收回應並釋放名額
+        if not reader.done():
+            reader.cancel()
+
+
+async def _request_text(prompt: Any, timeout: Optional[float], priority: int) -> Optional[str]:
+    """送出請求並取出回應文字，沒有有效回應時返回 None"""
+    response = await generate_content(prompt, timeout=timeout, priority=priority)
+    if response and response.text:
+        return response.text.strip()
+    return None
 
-async def generate_text(prompt: str) -> str:
+
+async def generate_text(
+    prompt: Any,
+    timeout: Optional[float] = None,
+    cache: bool = True,
+    cache_ttl: Optional[float] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    default: Optional[str] = None,
+    cache_on: Any = None,
+) -> str:
     """
     使用 Gemini AI 生成文字回應
     參數:
-        prompt (str): 輸入給 AI 的提示文字
+        prompt: 輸入給 AI 的提示文字（或由多段文字組成的列表）
+        timeout (float): 請求逾時秒數，預設為 config.LLM_TIMEOUT
+        cache (bool): 是否使用回應快取與請求合併；每次都需要不同結果的創意呼叫請設為 False
+        cache_ttl (float): 此回應在快取中的存活秒數，預設為 config.LLM_CACHE_TTL
+        priority (int): 排程優先順序，背景工作請用 PRIORITY_BACKGROUND
+        default (str): 失敗、逾時、被丟棄或沒有回應時改為返回此內容（預設返回錯誤說明）
+        cache_on: 快取鍵依據的內容，預設為 prompt（例如只依風格與原文快取，而不是整段 prompt）
     回傳:
         str: AI 生成的回應文字
     """
     try:
         if not llm_model:
-            return "AI 服務暫時不可用，請稍後再試。"
+            return default if default is not None else "AI 服務暫時不可用，請稍後再試。"
 
-        response = llm_model.generate_content(prompt)
-        if response and response.text:
-            return response.text.strip()
+        cache_key = (
+            make_cache_key(LLM_MODEL_NAME, prompt if cache_on is None else cache_on)
+            if cache
+            else None
+        )
+        if cache_key is None:
+            text = await _request_text(prompt, timeout, priority)
         else:
-            return "抱歉，AI 沒有生成有效的回應。"
+            if response_cache is not None:
+                cached = await response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            async def fetch_and_store() -> Optional[str]:
+                text = await _request_text(prompt, timeout, priority)
+                # 只快取成功的回應，錯誤與空回應下次仍會重試
+                if text and response_cache is not None:
+                    await response_cache.set(cache_key, text, ttl=cache_ttl)
+                return text
+
+            # 逾時不同的請求不合併，避免等待較短的逾時
+            text = await _text_requests.run(
+                (cache_key, timeout), fetch_and_store, priority
+            )
 
+        if text:
+            return text
+        return default if default is not None else "抱歉，AI 沒有生成有效的回應。"
+
+    except asyncio.TimeoutError:
+        print("❌ AI 文字生成逾時")
+        return default if default is not None else "AI 回應逾時，請稍後再試。"
     except Exception as e:
         print(f"❌ AI 文字生成失敗: {e}")
-        return "AI 服務發生錯誤，請稍後再試。"
+        if is_rate_limit_error(e):
+            return default if default is not None else "AI 服務目前太忙碌，請稍後再試。"
+        return default if default is not None else "AI 服務發生錯誤，請稍後再試。"
+
+
+def get_cache_stats() -> Optional[dict]:
+    """回應快取的命中統計；未啟用快取時返回 None"""
+    return response_cache.stats() if response_cache is not None else None
+
+
+def get_scheduler_stats() -> dict:
+    """LLM 排程器的狀態（排隊數、丟棄數、429 次數等）"""
+    return _scheduler.stats()
@@ -0,0 +1,197 @@
+"""
+LLM 回應快取
+
+以「模型名稱 + 正規化後的 prompt」的雜湊作為鍵：
+- 記憶體層：LRU，超過數量上限時淘汰最久未使用的項目
+- 每個項目都有 TTL，過期後視為未命中
+- 可選的磁碟層：每個項目一個 JSON 檔，重啟後仍可命中
+- 記錄命中 / 未命中次數，方便觀察快取效果
+
+只應快取結果可重複使用的呼叫；需要每次都不同的創意回應請在呼叫端停用快取。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_prompt(contents: Any) -> Optional[str]:
+    """將 prompt 正規化成穩定的字串；無法快取的內容（例如圖片）返回 None"""
+    if isinstance(contents, str):
+        return " ".join(contents.split())
+    if isinstance(contents, (list, tuple)) and all(
+        isinstance(part, str) for part in contents
+    ):
+        return json.dumps([" ".join(part.split()) for part in contents], ensure_ascii=False)
+    return None
+
+
+def make_cache_key(model_name: str, contents: Any) -> Optional[str]:
+    """產生快取鍵；內容無法快取時返回 None"""
+    normalized = normalize_prompt(contents)
+    if normalized is None:
+        return None
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """LLM 文字回應的 LRU + TTL 快取，可選擇搭配磁碟層"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        disk_dir: Optional[str] = None,
+        disk_max_entries: int = 5000,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self.disk_max_entries = disk_max_entries
+        # 鍵 → (回應文字, 過期時間)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # ----- 記憶體層 -----
+
+    def _remember(self, key: str, text: str, expires_at: float) -> None:
+        self._entries[key] = (text, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    # ----- 磁碟層（在執行緒中執行） -----
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            text, expires_at = entry["text"], float(entry["expires_at"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            # 損毀的快取檔直接丟棄
+            self._remove_file(path)
+            return None
+        if expires_at <= time.time():
+            self._remove_file(path)
+            return None
+        return text, expires_at
+
+    def _write_disk(self, key: str, text: str, expires_at: float) -> None:
+        path = self._disk_path(key)
+        # 每次寫入使用不同的暫存檔，同一個鍵同時寫入時不會互相覆蓋
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"text": text, "expires_at": expires_at}, f, ensure_ascii=False
+                )
+            # 檔案的修改時間設為過期時間，清理時不必逐一讀取內容
+            os.utime(tmp_path, (expires_at, expires_at))
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove_file(tmp_path)
+            raise
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 1:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """刪除過期的快取檔，數量超過上限時再刪除最快過期的"""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                # 修改時間即寫入時記錄的過期時間
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+
+        files.sort()
+        excess = len(files) - self.disk_max_entries
+        for index, (expires_at, path) in enumerate(files):
+            if index < excess or expires_at <= now:
+                self._remove_file(path)
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # ----- 公開介面 -----
+
+    async def get(self, key: str) -> Optional[str]:
+        """查詢快取，未命中時返回 None"""
+        text = self._lookup_memory(key)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, *entry)
+                return entry[0]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, text: str, ttl: Optional[float] = None) -> None:
+        """寫入快取；磁碟層寫入失敗不影響記憶體層"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, text, expires_at)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, text, expires_at)
+            except OSError as e:
+                print(f"⚠️ 寫入 LLM 快取檔失敗：{e}")
+
+    def clear(self) -> None:
+        """清空記憶體層（磁碟層保留）"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計資料"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
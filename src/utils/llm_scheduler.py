@@ -0,0 +1,194 @@
+"""
+LLM 請求排程器
+
+所有送往同一個模型的請求共用一個排程器：
+- 令牌桶：限制每分鐘的請求數，允許短暫突發（LLM_RATE_PER_MINUTE / LLM_BURST）
+- 優先順序：互動指令（PRIORITY_INTERACTIVE）永遠排在背景工作（PRIORITY_BACKGROUND）之前
+- 同時進行中的請求數上限（LLM_MAX_CONCURRENCY）
+- 背景請求排隊過長時直接丟棄，讓呼叫端改用預設內容
+- 收到 429（額度用盡）時暫停送出請求，並以指數退避延長暫停時間
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import config
+
+# 數字越小越優先
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """判斷例外是否為 429 / 額度用盡"""
+    if getattr(error, "code", None) == 429:
+        return True
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    return "429" in str(error)
+
+
+class LLMScheduler:
+    """單一模型的令牌桶 + 優先佇列排程器"""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_concurrency: int,
+        background_queue_limit: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        # rate_per_minute <= 0 表示不限制速率
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.background_queue_limit = background_queue_limit
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._active = 0
+        # 等待中的請求：(優先順序, 序號, future)，序號確保同優先順序先到先得
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._paused_until = 0.0
+        self._backoff = 0.0
+
+        self.shed = 0
+        self.rate_limited = 0
+
+    # ----- 內部排程 -----
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.call_later(max(delay, 0.001), self._dispatch)
+
+    def _dispatch(self) -> None:
+        """依優先順序放行等待中的請求，直到沒有令牌或同時請求數已滿"""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                # 已取消的等待者
+                heapq.heappop(self._waiters)
+                continue
+            if self._active >= self.max_concurrency:
+                # release() 時會再次排程
+                return
+
+            now = time.monotonic()
+            if now < self._paused_until:
+                self._schedule_wakeup(self._paused_until - now)
+                return
+            self._refill(now)
+            if self.rate > 0 and self._tokens < 1:
+                self._schedule_wakeup((1 - self._tokens) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            if self.rate > 0:
+                self._tokens -= 1
+            self._active += 1
+            future.set_result(None)
+
+    def _queued(self, priority: Optional[int] = None) -> int:
+        return sum(
+            1
+            for waiter_priority, _, future in self._waiters
+            if not future.done() and (priority is None or waiter_priority >= priority)
+        )
+
+    # ----- 公開介面 -----
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        """
+        等待送出請求的許可
+
+        回傳:
+            bool: 取得許可時為 True（用完後必須呼叫 release）；
+                  背景請求因排隊過長被丟棄時為 False
+        """
+        if (
+            priority >= PRIORITY_BACKGROUND
+            and self._queued(PRIORITY_BACKGROUND) >= self.background_queue_limit
+        ):
+            self.shed += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已被放行但呼叫端同時被取消，要歸還名額
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        """歸還 acquire 取得的名額"""
+        self._active -= 1
+        self._dispatch()
+
+    def report_rate_limited(self) -> None:
+        """收到 429：清空令牌並暫停送出，連續發生時暫停時間加倍"""
+        self.rate_limited += 1
+        self._backoff = min(
+            self.backoff_max,
+            self._backoff * 2 if self._backoff else self.backoff_base,
+        )
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + self._backoff)
+        print(f"⚠️ LLM 額度用盡（429），暫停 {self._backoff:.1f} 秒")
+
+    def report_success(self) -> None:
+        """請求成功，重設退避時間"""
+        self._backoff = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """排程器狀態"""
+        return {
+            "active": self._active,
+            "queued": self._queued(),
+            "queued_background": self._queued(PRIORITY_BACKGROUND),
+            "tokens": self._tokens if self.rate > 0 else None,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            "shed": self.shed,
+            "rate_limited": self.rate_limited,
+        }
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+
+def get_scheduler(model_name: str) -> LLMScheduler:
+    """取得（必要時建立）指定模型的排程器"""
+    scheduler = _schedulers.get(model_name)
+    if scheduler is None:
+        scheduler = _schedulers[model_name] = LLMScheduler(
+            rate_per_minute=config.LLM_RATE_PER_MINUTE,
+            burst=config.LLM_BURST,
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            background_queue_limit=config.LLM_BACKGROUND_QUEUE_LIMIT,
+            backoff_base=config.LLM_BACKOFF_BASE,
+            backoff_max=config.LLM_BACKOFF_MAX,
+        )
+    return scheduler
@@ -0,0 +1,475 @@
+"""
+MyGO 台詞檢索索引
+
+以字元 n-gram（單字 + 雙字）建立倒排索引：
+- find_exact：以索引找出包含關鍵字的台詞，取代逐句掃描
+- search：以雙字的 Jaccard 相似度與編輯距離為候選排序，找出相近的台詞
+- shortlist：以 BM25 篩選出最相關的少數候選，交給 LLM 挑選，
+  不必每次都把整份台詞列表放進 prompt
+
+比對前會先正規化文字（全形轉半形、英文小寫、簡體轉繁體、去除空白與標點），
+因此「为什么要演奏春日影？」也能找到「為什麼要演奏春日影!」。
+
+索引可以事先編譯成二進位檔（build_mygo_index.py），cog 載入時以 mmap 直接使用，
+不必每次解析 JSON 與重建索引，多個機器人程序也能共用相同的記憶體分頁。
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+# BM25 參數
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# search 只對雙字重疊最多的前幾名計算編輯距離
+FUZZY_CANDIDATES = 20
+
+# 常用簡體字 → 繁體字（台詞為繁體，將簡體輸入轉成繁體再比對）
+_SIMPLIFIED_TRADITIONAL_PAIRS = (
+    "们們 这這 个個 来來 说說 对對 时時 会會 还還 没沒 么麼 为為 样樣 点點 里裡 后後 过過 吗嗎 见見 觉覺 "
+    "话話 让讓 谁誰 请請 谢謝 给給 现現 实實 开開 关關 门門 问問 间間 东東 车車 长長 书書 学學 习習 乐樂 "
+    "团團 队隊 员員 头頭 爱愛 梦夢 怀懷 忆憶 听聽 声聲 词詞 诗詩 语語 读讀 写寫 认認 识識 记記 讨討 厌厭 "
+    "难難 欢歡 泪淚 伤傷 钱錢 买買 卖賣 边邊 远遠 进進 动動 运運 场場 气氣 电電 网網 络絡 发發 须須 复復 "
+    "杂雜 业業 专專 级級 线線 结結 终終 经經 红紅 绿綠 岁歲 万萬 与與 两兩 并並 从從 众眾 体體 饭飯 饿餓 "
+    "鸟鳥 鱼魚 马馬 龙龍 风風 飞飛 云雲 阳陽 阴陰 热熱 凉涼 净淨 啰囉 呜嗚 吓嚇 选選 择擇 决決 应應 该該 "
+    "当當 着著 无無 论論 虽雖 却卻 总總 于於 组組 织織 办辦 处處 变變 态態 历歷 准準 备備 帮幫 输輸 赢贏 "
+    "胜勝 败敗 战戰 争爭 妈媽 孙孫 亲親 戏戲 剧劇 视視 频頻 题題 颜顏 预預 顺順 领領 讲講 谈談 试試 诉訴 "
+    "证證 许許 设設 计計 议議 调調 贝貝 贵貴 费費 资資 赏賞 质質 轻輕 较較 钢鋼 铁鐵 银銀 锁鎖 镜鏡 闭閉 "
+    "闹鬧 闻聞 阵陣 际際 陈陳 鸡雞 齐齊 归歸 宁寧 宝寶 寻尋 导導 层層 属屬 岛島 师師 帅帥 广廣 庆慶 张張 "
+    "弹彈 彻徹 怜憐 恋戀 恼惱 惊驚 惯慣 担擔 挂掛 换換 据據 晓曉 术術 机機 杀殺 权權 枪槍 欧歐 毕畢 满滿 "
+    "汉漢 灵靈 灯燈 烦煩 爷爺 独獨 猫貓 环環 疗療 盖蓋 睁睜 礼禮 离離 种種 稳穩 笔筆 简簡 类類 紧緊 练練 "
+    "续續 缘緣 罗羅 节節 药藥 华華 补補 装裝 规規 贴貼 跃躍 转轉 软軟 辉輝 迟遲 邮郵 酱醬 释釋 丽麗 举舉 "
+    "义義 乌烏 乱亂 亚亞 产產 亿億 仅僅 价價 优優 传傳 伦倫 侠俠 侣侶 债債 倾傾 儿兒 党黨 兴興 冲衝 况況 "
+    "冻凍 几幾 凤鳳 凭憑 击擊 则則 刚剛 创創 删刪 别別 剑劍 劝勸 务務 劳勞 势勢 协協 单單 卫衛 厅廳 厉厲 "
+    "压壓 参參 双雙 叙敘 叶葉 号號 叹嘆 启啟 响響 哑啞 唤喚 喷噴 园園 围圍 图圖 国國 圣聖 坏壞 块塊 坚堅 "
+    "垫墊 墙牆 壮壯 够夠 夸誇 夺奪 奋奮 奖獎 妆妝 妇婦 娱娛 审審 宫宮 寿壽 将將 尔爾 尘塵 尝嘗 尽盡 币幣 "
+    "带帶 庄莊 库庫 废廢 异異 弃棄 强強 录錄 忧憂 恶惡 悬懸 惨慘 愿願 户戶 扑撲 执執 扩擴 扫掃 扬揚 抢搶 "
+    "护護 报報 拥擁 挤擠 挥揮 损損 捡撿 摆擺 敌敵 数數 断斷 旧舊 显顯 暂暫 条條 杨楊 极極 构構 标標 树樹 "
+    "桥橋 检檢 楼樓 毁毀 汤湯 沟溝 泽澤 洁潔 浅淺 测測 济濟 浓濃 涂塗 润潤 涨漲 渐漸 温溫 湾灣 湿濕 滚滾 "
+    "潜潛 灭滅 灾災 炼煉 烂爛 烟煙 烧燒 牵牽 犹猶 狮獅 献獻 画畫 畅暢 疯瘋 皱皺 盐鹽 监監 盘盤 确確 碍礙 "
+    "祸禍 积積 称稱 窃竊 竞競 笼籠 签簽 粮糧 纠糾 纪紀 约約 纸紙 细細 绑綁 绝絕 统統 继繼 绩績 维維 缓緩 "
+    "编編 缩縮 罚罰 职職 联聯 聪聰 肠腸 肤膚 胆膽 脑腦 脸臉 艰艱 艺藝 苏蘇 荣榮 获獲 营營 虑慮 虫蟲 蚁蟻 "
+    "衬襯 袭襲 观觀 览覽 订訂 训訓 访訪 评評 译譯 诚誠 详詳 误誤 诸諸 课課 谎謊 谜謎 谱譜 负負 贡貢 财財 "
+    "责責 货貨 购購 贱賤 赌賭 赛賽 赞讚 赶趕 践踐 踪蹤 轮輪 载載 辈輩 辞辭 达達 迈邁 连連 递遞 遗遺 邻鄰 "
+    "针針 钟鐘 钥鑰 铃鈴 链鏈 错錯 锅鍋 键鍵 闪閃 阶階 险險 随隨 隐隱 雾霧 静靜 页頁 顶頂 项項 顾顧 顿頓 "
+    "飘飄 饮飲 饰飾 饱飽 饼餅 馆館 驱驅 验驗 骂罵 骑騎 骗騙 鸣鳴 麦麥 黄黃 齿齒 丢丟 亏虧 伞傘 侦偵 兑兌 "
+    "刹剎 剂劑 医醫 厕廁 厨廚 吨噸 呐吶 咏詠 哟喲 啧嘖 喂餵 嗳噯 坟墳 壶壺 妩嫵 娇嬌 婴嬰 孪孿 寝寢 尸屍 "
+    "岂豈 峡峽 巩鞏 帐帳 帜幟 庙廟 忏懺 怂慫 恳懇 悦悅 惧懼 慑懾 扰擾 抛拋 挡擋 挣掙 掳擄 搅攪 摇搖 撑撐 "
+    "敛斂 斋齋 晒曬 杰傑 枣棗 栏欄 桨槳 棂欞 椭橢 欤歟 殴毆 毙斃 氢氫 汇匯 沥瀝 泼潑 浆漿 涡渦 涣渙 渊淵 "
+    "渔漁 滞滯 滥濫 濒瀕 灿燦 炉爐 烛燭 焕煥"
+)
+
+_TO_TRADITIONAL = str.maketrans(
+    {pair[0]: pair[1] for pair in _SIMPLIFIED_TRADITIONAL_PAIRS.split()}
+    | {"妳": "你", "裏": "裡"}
+)
+
+
+def normalize_text(text: str) -> str:
+    """正規化文字：全形轉半形、小寫、簡體轉繁體，只保留文字與數字"""
+    text = unicodedata.normalize("NFKC", text).lower().translate(_TO_TRADITIONAL)
+    return "".join(char for char in text if char.isalnum())
+
+
+def char_ngrams(text: str) -> List[str]:
+    """將正規化後的文字切成單字與相鄰雙字"""
+    grams = list(text)
+    grams.extend(a + b for a, b in zip(text, text[1:]))
+    return grams
+
+
+def _query_grams(text: str) -> Set[str]:
+    """比對用的 n-gram：有雙字時只用雙字，單一字元的查詢才用單字"""
+    if len(text) >= 2:
+        return {a + b for a, b in zip(text, text[1:])}
+    return set(text)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein 編輯距離"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+class QuoteIndex:
+    """台詞的 n-gram 倒排索引"""
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts: Sequence[str] = list(texts)
+        self._normalized: Sequence[str] = [normalize_text(text) for text in self.texts]
+        # n-gram → [(台詞編號, 出現次數)]
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        # 每句台詞不重複的比對用 n-gram 數，用於計算 Jaccard
+        self._gram_counts: List[int] = []
+
+        for doc_id, text in enumerate(self._normalized):
+            grams = char_ngrams(text)
+            self._lengths.append(len(grams))
+            self._gram_counts.append(len(_query_grams(text)))
+            for gram, count in Counter(grams).items():
+                self._postings[gram].append((doc_id, count))
+
+        total = sum(self._lengths)
+        self._average_length = total / len(self._lengths) if total else 1.0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _get_postings(self, gram: str) -> Sequence[Tuple[int, int]]:
+        """n-gram 的倒排列表 [(台詞編號, 出現次數)]，依台詞編號排序"""
+        return self._postings.get(gram, ())
+
+    def _idf(self, gram: str) -> float:
+        df = len(self._get_postings(gram))
+        return math.log(1 + (len(self.texts) - df + 0.5) / (df + 0.5))
+
+    def find_exact(self, query: str) -> List[int]:
+        """包含關鍵字（正規化後）的所有台詞編號"""
+        normalized = normalize_text(query)
+        if not normalized:
+            # 只有標點符號的關鍵字無法正規化，直接比對原文
+            if not query.strip():
+                return []
+            return [doc_id for doc_id, text in enumerate(self.texts) if query in text]
+
+        # 從出現次數最少的 n-gram 取候選，再確認是否包含整個關鍵字
+        postings = [self._get_postings(gram) for gram in _query_grams(normalized)]
+        if not all(postings):
+            return []
+        rarest = min(postings, key=len)
+        return [
+            doc_id for doc_id, _ in rarest if normalized in self._normalized[doc_id]
+        ]
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, int]]:
+        """
+        找出相近的台詞，返回相似度由高到低的 (分數, 台詞編號)
+
+        分數介於 0 到 1：包含關鍵字為 1，否則取雙字 Jaccard 相似度
+        與編輯距離相似度中較高者。
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        query_grams = _query_grams(normalized)
+
+        overlaps: Counter = Counter()
+        for gram in query_grams:
+            for doc_id, _ in self._get_postings(gram):
+                overlaps[doc_id] += 1
+
+        results = []
+        for doc_id, overlap in overlaps.most_common(FUZZY_CANDIDATES):
+            text = self._normalized[doc_id]
+            if normalized in text:
+                score = 1.0
+            else:
+                jaccard = overlap / (
+                    len(query_grams) + self._gram_counts[doc_id] - overlap
+                )
+                longest = max(len(normalized), len(text))
+                # 編輯距離相似度不可能超過長度比，已經不會更高時省略計算
+                score = jaccard
+                if min(len(normalized), len(text)) / longest > jaccard:
+                    similarity = 1 - edit_distance(normalized, text) / longest
+                    score = max(jaccard, similarity)
+            results.append((score, doc_id))
+
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return results[:limit]
+
+    def bm25(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        """以 BM25 計分，返回分數最高的 limit 筆 (分數, 台詞編號)"""
+        scores: Dict[int, float] = defaultdict(float)
+        for gram in set(char_ngrams(normalize_text(query))):
+            postings = self._get_postings(gram)
+            if not postings:
+                continue
+            idf = self._idf(gram)
+            for doc_id, tf in postings:
+                norm = BM25_K1 * (
+                    1 - BM25_B + BM25_B * self._lengths[doc_id] / self._average_length
+                )
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, doc_id) for doc_id, score in ranked[:limit]]
+
+    def shortlist(self, query: str, limit: int) -> List[str]:
+        """最相關的 limit 句不重複台詞，供 LLM 從中挑選"""
+        seen = set()
+        results = []
+        for _, doc_id in self.bm25(query, limit * 2):
+            text = self.texts[doc_id]
+            if text in seen:
+                continue
+            seen.add(text)
+            results.append(text)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def build_quote_index(quotes: Sequence[dict]) -> QuoteIndex:
+    """從 mygo.json 的項目建立索引，台詞編號與 quotes 的索引相同"""
+    return QuoteIndex(
+        item.get("alt", "") if isinstance(item, dict) else "" for item in quotes
+    )
+
+
+# ===== 預先編譯的索引檔 =====
+#
+# 檔案配置（數值皆為本機位元組順序，各區段以 8 bytes 對齊）：
+#   標頭
+#   字串區：所有台詞、正規化台詞與 URL 的 UTF-8，相同字串只存一次
+#   台詞表：每句台詞 8 個 uint32（台詞、正規化台詞、URL 的位移與長度，n-gram 數，比對用 n-gram 數）
+#   n-gram 鍵：排序過的 uint64（第一個字的碼位 << 32 | 第二個字的碼位）
+#   n-gram 範圍：每個 n-gram 2 個 uint32（倒排列表的起點與筆數）
+#   倒排列表：每筆 2 個 uint16（台詞編號、出現次數），因此最多 65535 句台詞
+
+ARTIFACT_MAGIC = b"MYGOIDX\0"
+ARTIFACT_VERSION = 1
+_HEADER = struct.Struct("<8sIIIIdQQQQQ")
+_DOC_FIELDS = 8
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def _gram_key(gram: str) -> int:
+    key = ord(gram[0]) << 32
+    if len(gram) > 1:
+        key |= ord(gram[1])
+    return key
+
+
+def _align(data: bytearray) -> None:
+    data.extend(b"\0" * (-len(data) % 8))
+
+
+def write_artifact(quotes: Sequence[dict], path: str) -> QuoteIndex:
+    """將台詞與索引編譯成二進位檔（先寫入暫存檔再替換），返回建立的索引"""
+    if len(quotes) > 0xFFFF:
+        raise ValueError("台詞數量超過索引檔格式的上限（65535 句）")
+    index = build_quote_index(quotes)
+
+    strings = bytearray()
+    interned: Dict[str, Tuple[int, int]] = {}
+
+    def intern(text: str) -> Tuple[int, int]:
+        location = interned.get(text)
+        if location is None:
+            encoded = text.encode("utf-8")
+            location = interned[text] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return location
+
+    docs = array("I")
+    for doc_id, item in enumerate(quotes):
+        url = item.get("url", "") if isinstance(item, dict) else ""
+        for text in (index.texts[doc_id], index._normalized[doc_id], url):
+            docs.extend(intern(text))
+        docs.append(index._lengths[doc_id])
+        docs.append(index._gram_counts[doc_id])
+
+    keys = array("Q")
+    ranges = array("I")
+    postings = array("H")
+    for key, gram in sorted((_gram_key(gram), gram) for gram in index._postings):
+        gram_postings = index._postings[gram]
+        keys.append(key)
+        ranges.extend((len(postings) // 2, len(gram_postings)))
+        for doc_id, count in gram_postings:
+            postings.extend((doc_id, min(count, 0xFFFF)))
+
+    body = bytearray(b"\0" * _HEADER.size)
+    _align(body)
+    offsets = []
+    for section in (strings, docs.tobytes(), keys.tobytes(), ranges.tobytes(), postings.tobytes()):
+        offsets.append(len(body))
+        body.extend(section)
+        _align(body)
+
+    body[: _HEADER.size] = _HEADER.pack(
+        ARTIFACT_MAGIC,
+        ARTIFACT_VERSION,
+        _BYTE_ORDER,
+        len(quotes),
+        len(keys),
+        index._average_length,
+        *offsets,
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    # 以替換的方式更新，其他程序仍可安全地使用舊檔案的 mmap
+    os.replace(tmp_path, path)
+    return index
+
+
+class _StringColumn(Sequence):
+    """從字串區讀出台詞表中某一欄字串"""
+
+    def __init__(self, strings: memoryview, docs: memoryview, field: int):
+        self._strings = strings
+        self._docs = docs
+        self._field = field
+
+    def __len__(self) -> int:
+        return len(self._docs) // _DOC_FIELDS
+
+    def __getitem__(self, doc_id: int) -> str:
+        if doc_id < 0:
+            doc_id += len(self)
+        base = doc_id * _DOC_FIELDS + self._field
+        offset, length = self._docs[base], self._docs[base + 1]
+        return str(self._strings[offset : offset + length], "utf-8")
+
+
+class _IntColumn(Sequence):
+    """台詞表中某一欄整數"""
+
+    def __init__(self, docs: memoryview, field: int):
+        self._docs = docs
+        self._field = field
+
+    def __len__(self) -> int:
+        return len(self._docs) // _DOC_FIELDS
+
+    def __getitem__(self, doc_id: int) -> int:
+        return self._docs[doc_id * _DOC_FIELDS + self._field]
+
+
+class _PostingList(Sequence):
+    """mmap 中一段倒排列表的 (台詞編號, 出現次數) 檢視"""
+
+    def __init__(self, postings: memoryview, start: int, count: int):
+        self._postings = postings
+        self._start = start
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> Tuple[int, int]:
+        base = (self._start + position) * 2
+        return self._postings[base], self._postings[base + 1]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        values = self._postings[self._start * 2 : (self._start + self._count) * 2]
+        return zip(values[::2], values[1::2])
+
+
+class QuoteTable(Sequence):
+    """以 mmap 提供與 mygo.json 相同的 [{"url", "alt"}] 列表介面"""
+
+    def __init__(self, texts: Sequence[str], urls: Sequence[str]):
+        self._texts = texts
+        self._urls = urls
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __getitem__(self, doc_id: int) -> dict:
+        if not -len(self) <= doc_id < len(self):
+            raise IndexError(doc_id)
+        return {"url": self._urls[doc_id], "alt": self._texts[doc_id]}
+
+
+class MmapQuoteIndex(QuoteIndex):
+    """直接使用 mmap 中預先編譯的索引，載入時不需要解析或建立任何資料"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < _HEADER.size:
+            raise ValueError("索引檔不完整")
+        (
+            magic,
+            version,
+            byte_order,
+            doc_count,
+            gram_count,
+            self._average_length,
+            strings_at,
+            docs_at,
+            keys_at,
+            ranges_at,
+            postings_at,
+        ) = _HEADER.unpack_from(view)
+        if magic != ARTIFACT_MAGIC or version != ARTIFACT_VERSION:
+            raise ValueError("索引檔格式不符")
+        if byte_order != _BYTE_ORDER:
+            raise ValueError("索引檔的位元組順序與本機不同")
+
+        strings = view[strings_at:docs_at]
+        docs = view[docs_at : docs_at + doc_count * _DOC_FIELDS * 4].cast("I")
+        self._keys = view[keys_at : keys_at + gram_count * 8].cast("Q")
+        self._ranges = view[ranges_at : ranges_at + gram_count * 8].cast("I")
+        self._posting_view = view[postings_at:].cast("H")
+
+        self.texts = _StringColumn(strings, docs, 0)
+        self._normalized = _StringColumn(strings, docs, 2)
+        self.urls = _StringColumn(strings, docs, 4)
+        self._lengths = _IntColumn(docs, 6)
+        self._gram_counts = _IntColumn(docs, 7)
+        self.quotes = QuoteTable(self.texts, self.urls)
+
+    def _get_postings(self, gram: str) -> Sequence[Tuple[int, int]]:
+        key = _gram_key(gram)
+        position = bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            return ()
+        start, count = self._ranges[position * 2], self._ranges[position * 2 + 1]
+        return _PostingList(self._posting_view, start, count)
+
+
+def load_quotes(json_path: str, artifact_path: str) -> Tuple[Sequence[dict], QuoteIndex]:
+    """
+    載入台詞與索引
+
+    索引檔存在且不比 JSON 舊時直接 mmap 使用；否則解析 JSON 並在記憶體中建立索引。
+    回傳:
+        (台詞列表, 索引)，台詞列表的項目為 {"url", "alt"}；JSON 無法讀取時為空列表
+    """
+    try:
+        artifact_mtime = os.path.getmtime(artifact_path)
+        json_mtime = os.path.getmtime(json_path) if os.path.exists(json_path) else 0
+        if artifact_mtime >= json_mtime:
+            index = MmapQuoteIndex(artifact_path)
+            return index.quotes, index
+        print(f"⚠️ {artifact_path} 比 {json_path} 舊，請重新執行 build_mygo_index.py")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 無法載入 MyGO 索引檔，改為重新建立：{e}")
+
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            quotes = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        quotes = []
+    return quotes, build_quote_index(quotes)
@@ -6,15 +6,21 @@
 - 寵物個性敘述生成
 - 寵物行為敘述生成
 - 寵物對話生成
+
+同一時間觸發的多隻寵物行為敘述會先收集一小段時間，
+再以一次多寵物的 prompt 生成（微批次），解析失敗的項目才個別重試。
 """
 
+import asyncio
 import random
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from io import BytesIO
 import base64
 import json
 
+from src import config
 from src.utils.llm import generate_text
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
 from src.utils.image_gen import generate_image
 
 
@@ -48,8 +54,22 @@ class PetAIGenerator:
             "panda", "bear", "wolf", "lion", "tiger"
         ]
 
+        # 行為敘述事件 → 情境描述
+        self.behavior_contexts = {
+            "bad_mood": "心情不好，需要主人安慰",
+            "treasure_hunt": "去外面探險，好像發現了什麼寶物",
+            "gift": "帶了一個小禮物回來送給主人",
+            "dance": "開心地跳起了舞",
+            "sleep": "正在安靜地睡覺"
+        }
+
+        # 等待合併生成的行為敘述請求：(請求資料, 等待結果的 future)
+        self._pending_behaviors: List[Tuple[Dict[str, str], asyncio.Future]] = []
+        self._behavior_batch_timer: Optional[asyncio.TimerHandle] = None
+
     async def generate_treasure_image_prompt(self, treasure_description: str) -> Optional[str]:
-        """從寶物描述生成英文圖片提示詞"""
+        """從寶物描述生成英文圖片提示詞（背景工作，AI 忙碌時使用通用提示詞）"""
+        fallback_prompt = "a small, glowing magic treasure chest, fantasy, magical, detailed, high quality"
         try:
             prompt = f"""
             根據以下中文描述，生成一個適合 AI 繪圖的、詳細的英文提示詞。
@@ -64,11 +84,13 @@ class PetAIGenerator:
             中文描述: "一個閃閃發光，像水晶一樣的蘋果"
             英文提示詞: "A sparkling crystal apple, fantasy, magical, detailed, glowing, high quality, cinematic lighting, centered composition"
             """
-            image_prompt = await generate_text(prompt)
+            image_prompt = await generate_text(
+                prompt, priority=PRIORITY_BACKGROUND, default=fallback_prompt
+            )
             return image_prompt
         except Exception as e:
             print(f"❌ 生成寶物圖片提示詞失敗: {e}")
-            return "a small, glowing magic treasure chest, fantasy, magical, detailed, high quality"
+            return fallback_prompt
 
     async def generate_pet_personality(self, pet_name: str) -> str:
         """生成寵物個性描述"""
@@ -95,7 +117,7 @@ class PetAIGenerator:
             範例格式：「我是一隻活潑好動的小貓咪，最喜歡在陽光下打滾和追逐小玩具。雖然有時候會調皮搗蛋，但我最愛和主人撒嬌討抱抱了！」
             """
             
-            personality = await generate_text(prompt)
+            personality = await generate_text(prompt, cache=False)
             return personality if personality else f"我是{pet_name}，一隻{base_personality}的可愛寵物！"
         except Exception as e:
             print(f"❌ 生成寵物個性失敗: {e}")
@@ -125,14 +147,16 @@ class PetAIGenerator:
             The avatar should be a high-quality, adorable, and expressive image suitable for a profile picture.
             """
             
-            image_bytes = await generate_image(prompt)
+            image_bytes = await generate_image(prompt, profile="avatar")
             return image_bytes, avatar_emoji
         except Exception as e:
             print(f"❌ 生成寵物頭像失敗: {e}")
             return None, "🐾"
 
-    async def generate_pet_response(self, pet_name: str, personality: str, context: str) -> str:
-        """根據情境生成寵物回應"""
+    async def generate_pet_response(
+        self, pet_name: str, personality: str, context: str, priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """根據情境生成寵物回應；非主人觸發的事件請傳入 PRIORITY_BACKGROUND"""
         try:
             prompt = f"""
             你是一隻名叫「{pet_name}」的虛擬寵物，你的個性是「{personality}」。
@@ -150,24 +174,138 @@ class PetAIGenerator:
             事件：主人餵我吃了好吃的餅乾。
             回應：謝謝主人～這個餅乾好好吃喔！最喜歡主人了！
             """
-            response = await generate_text(prompt)
+            response = await generate_text(
+                prompt, cache=False, priority=priority, default="..."
+            )
             return response if response else "..."
         except Exception as e:
             print(f"❌ 生成寵物回應失敗: {e}")
             return "...（看起來很開心的樣子）"
 
-    async def generate_pet_behavior_description(self, pet_name: str, personality: str, event_type: str) -> str:
-        """根據事件類型生成寵物行為描述"""
+    async def generate_pet_behavior_description(
+        self, pet_name: str, personality: str, event_type: str, pet_id: Optional[str] = None
+    ) -> str:
+        """
+        根據事件類型生成寵物行為描述
+
+        短時間內的多個請求會合併成一次多寵物的生成（見 PET_BEHAVIOR_BATCH_WINDOW），
+        pet_id 用於在批次回應中對應結果，省略時會自動編號。
+        """
+        context = self.behavior_contexts.get(event_type, "正在做一些有趣的事情")
+        request = {
+            "pet_id": str(pet_id) if pet_id is not None else "",
+            "pet_name": pet_name,
+            "personality": personality,
+            "context": context,
+        }
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_behaviors.append((request, future))
+
+        if len(self._pending_behaviors) >= config.PET_BEHAVIOR_BATCH_SIZE:
+            self._flush_behavior_batch()
+        elif self._behavior_batch_timer is None:
+            self._behavior_batch_timer = loop.call_later(
+                config.PET_BEHAVIOR_BATCH_WINDOW, self._flush_behavior_batch
+            )
+
+        return await future
+
+    def _flush_behavior_batch(self):
+        """將目前收集到的行為敘述請求送出為一個批次"""
+        if self._behavior_batch_timer is not None:
+            self._behavior_batch_timer.cancel()
+            self._behavior_batch_timer = None
+
+        batch, self._pending_behaviors = self._pending_behaviors, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_behavior_batch(batch))
+
+    async def _run_behavior_batch(self, batch: List[Tuple[Dict[str, str], asyncio.Future]]):
+        """生成一個批次的行為敘述，並把結果交給各個等待中的請求"""
+        # 為每個請求分配批次內唯一的鍵
+        keyed: Dict[str, Tuple[Dict[str, str], asyncio.Future]] = {}
+        for index, (request, future) in enumerate(batch):
+            key = request["pet_id"] or f"pet{index}"
+            if key in keyed:
+                key = f"{key}#{index}"
+            keyed[key] = (request, future)
+
+        results: Dict[str, str] = {}
+        if len(keyed) > 1:
+            try:
+                results = await self._generate_behavior_batch(
+                    {key: request for key, (request, _) in keyed.items()}
+                )
+            except Exception as e:
+                print(f"❌ 批次生成寵物行為描述失敗: {e}")
+
+        # 批次結果中缺少或無效的項目個別重新生成
+        missing = [key for key in keyed if key not in results]
+        if missing:
+            if len(keyed) > 1:
+                print(f"⚠️ 批次回應缺少 {len(missing)} 筆行為描述，改為個別生成")
+            singles = await asyncio.gather(
+                *(self._generate_single_behavior(keyed[key][0]) for key in missing)
+            )
+            results.update(zip(missing, singles))
+
+        for key, (request, future) in keyed.items():
+            if not future.done():
+                future.set_result(results[key])
+
+    async def _generate_behavior_batch(self, requests: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+        """以一次 prompt 生成多隻寵物的行為描述，返回成功解析的項目"""
+        pets_text = "\n".join(
+            f'- id: "{key}"，名字：「{request["pet_name"]}」，個性：「{request["personality"]}」，現在正在：「{request["context"]}」'
+            for key, request in requests.items()
+        )
+        prompt = f"""
+        以下是幾隻虛擬寵物和牠們現在正在做的事情：
+        {pets_text}
+
+        請為每一隻寵物用一句話，以牠自己的口吻，生動地描述現在的行為和心情。
+
+        要求：
+        - 語氣要符合各自的個性。
+        - 描述要自然、可愛、簡短，每句不要超過50個字。
+        - 直接說話，不要包含任何標籤或前綴，例如「名字說：」。
+        - 只輸出一個 JSON 物件，鍵為寵物 id，值為該寵物說的話，不要包含其他文字。
+
+        輸出範例：
+        {{"pet0": "嘿嘿，你看我找到了什麼！閃亮亮的！", "pet1": "呼嚕呼嚕...好好睡..."}}
+        """
+        # 失敗時返回空字串，交給個別生成補上
+        response = await generate_text(
+            prompt, cache=False, priority=PRIORITY_BACKGROUND, default=""
+        )
+
+        text = response.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:]
         try:
-            event_map = {
-                "bad_mood": "心情不好，需要主人安慰",
-                "treasure_hunt": "去外面探險，好像發現了什麼寶物",
-                "gift": "帶了一個小禮物回來送給主人",
-                "dance": "開心地跳起了舞",
-                "sleep": "正在安靜地睡覺"
-            }
-            context = event_map.get(event_type, "正在做一些有趣的事情")
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            print(f"⚠️ 無法解析批次行為描述的 JSON: {response[:100]}")
+            return {}
+        if not isinstance(parsed, dict):
+            return {}
+
+        return {
+            key: value.strip()
+            for key, value in parsed.items()
+            if key in requests and isinstance(value, str) and value.strip()
+        }
 
+    async def _generate_single_behavior(self, request: Dict[str, str]) -> str:
+        """為單一寵物生成行為描述"""
+        pet_name = request["pet_name"]
+        personality = request["personality"]
+        context = request["context"]
+        try:
             prompt = f"""
             你是一隻名叫「{pet_name}」的虛擬寵物，你的個性是「{personality}」。
             你現在正在「{context}」。
@@ -184,7 +322,9 @@ class PetAIGenerator:
             事件：去外面探險，好像發現了什麼寶物
             回應：嘿嘿，你看我找到了什麼！閃亮亮的！
             """
-            response = await generate_text(prompt)
+            response = await generate_text(
+                prompt, cache=False, priority=PRIORITY_BACKGROUND, default=f"我正在{context}！"
+            )
             return response if response else f"我正在{context}！"
         except Exception as e:
             print(f"❌ 生成寵物行為描述失敗: {e}")
@@ -254,7 +394,7 @@ class PetAIGenerator:
             範例 (低分): "...？"
             """
 
-            pet_response = await generate_text(response_prompt)
+            pet_response = await generate_text(response_prompt, cache=False)
             
             if not pet_response:
                 pet_response = "..." if quality_score < 5 else "謝謝主人，我感覺好多了！"
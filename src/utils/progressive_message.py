@@ -0,0 +1,113 @@
+"""
+逐步更新的 Discord 訊息
+
+將串流產生的文字即時顯示在訊息上：
+- 第一段文字到達時就送出訊息，之後以固定間隔編輯同一則訊息，避免觸發編輯速率限制
+- 超過 Discord 的 2000 字元上限時，在換行或空白處切開，接著送出新的訊息
+- 送出與編輯的方式由呼叫端提供，因此一般頻道訊息與 Webhook 訊息都能使用
+"""
+
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, List, Optional
+
+# Discord 單則訊息的字元上限
+DISCORD_MESSAGE_LIMIT = 2000
+
+SendFunc = Callable[[str], Awaitable[Any]]
+EditFunc = Callable[[Any, str], Awaitable[Any]]
+
+
+def _split_point(text: str, limit: int) -> int:
+    """找出不超過 limit 的切割位置，優先在換行、其次在空白處切開"""
+    if len(text) <= limit:
+        return len(text)
+    for separator in ("\n", " "):
+        index = text.rfind(separator, limit // 2, limit)
+        if index > 0:
+            return index + 1
+    return limit
+
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """將長文字切成多段，每段都不超過 limit 個字元"""
+    parts = []
+    while len(text) > limit:
+        cut = _split_point(text, limit)
+        parts.append(text[:cut])
+        text = text[cut:]
+    if text:
+        parts.append(text)
+    return parts
+
+
+class ProgressiveMessage:
+    """將不斷增加的文字顯示在一則（或多則）逐步編輯的訊息上"""
+
+    def __init__(
+        self,
+        send: SendFunc,
+        edit: EditFunc,
+        edit_interval: float = 1.0,
+        limit: int = DISCORD_MESSAGE_LIMIT,
+    ):
+        """
+        參數:
+            send: 送出新訊息的函式，返回之後用於編輯的訊息物件
+            edit: 編輯訊息的函式，參數為 send 返回的物件與新內容
+            edit_interval: 兩次編輯之間的最短秒數
+            limit: 單則訊息的字元上限
+        """
+        self._send = send
+        self._edit = edit
+        self.edit_interval = edit_interval
+        self.limit = limit
+
+        # 目前這則訊息的內容、訊息物件與已顯示的內容
+        self._pending = ""
+        self._message: Optional[Any] = None
+        self._shown = ""
+        self._last_update = 0.0
+        self.message_count = 0
+
+    @property
+    def has_content(self) -> bool:
+        """是否已經收到任何文字"""
+        return bool(self.message_count or self._pending.strip())
+
+    async def _show(self, content: str) -> None:
+        if not content.strip() or content == self._shown:
+            return
+        if self._message is None:
+            self._message = await self._send(content)
+            self.message_count += 1
+        else:
+            await self._edit(self._message, content)
+        self._shown = content
+        self._last_update = time.monotonic()
+
+    async def append(self, text: str) -> None:
+        """加入一段新文字，必要時更新或換到下一則訊息"""
+        self._pending += text
+
+        # 超過上限的部分定稿在目前的訊息中，剩下的移到新訊息
+        while len(self._pending) > self.limit:
+            cut = _split_point(self._pending, self.limit)
+            await self._show(self._pending[:cut])
+            self._pending = self._pending[cut:]
+            self._message = None
+            self._shown = ""
+
+        if time.monotonic() - self._last_update >= self.edit_interval:
+            await self._show(self._pending)
+
+    async def finish(self, suffix: str = "") -> None:
+        """顯示最後的完整內容（可附加結尾文字，例如中斷提示）"""
+        if suffix:
+            await self.append(suffix)
+        await self._show(self._pending)
+
+    async def consume(self, chunks: AsyncIterable[str]) -> None:
+        """讀取整個文字串流並顯示，最後一段一定會顯示出來"""
+        async for chunk in chunks:
+            await self.append(chunk)
+        await self.finish()
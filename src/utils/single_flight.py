@@ -0,0 +1,62 @@
+"""
+請求合併（single-flight）
+
+相同鍵的請求同時進行時只實際執行一次，其餘呼叫端等待同一個結果。
+實際的工作在獨立的 Task 中執行，因此某個呼叫端被取消時不會影響其他人。
+
+呼叫端只會加入優先順序相同或更高（數值較小）的請求：背景請求可能因排程器
+忙碌而被放棄，互動請求加入後會一起拿到失敗的結果，因此改為另外執行。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from src.utils.llm_scheduler import PRIORITY_INTERACTIVE
+
+
+class SingleFlight:
+    """以鍵合併同時進行中的相同請求"""
+
+    def __init__(self):
+        # 鍵 → {優先順序: 進行中的工作}
+        self._in_flight: Dict[Hashable, Dict[int, asyncio.Task]] = {}
+        # 合併掉（沒有實際執行）的呼叫次數
+        self.coalesced = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Any:
+        """
+        執行 factory() 並返回結果；相同 key 已在進行中時改為等待該結果
+
+        只會加入優先順序相同或更高的請求，否則另外執行一次。
+        factory 拋出的例外會傳給所有等待中的呼叫端。
+        """
+        flights = self._in_flight.setdefault(key, {})
+        joinable = [p for p in flights if p <= priority]
+        if joinable:
+            task = flights[min(joinable)]
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            flights[priority] = task
+            task.add_done_callback(lambda done: self._finish(key, priority, done))
+
+        # shield：呼叫端被取消時只停止等待，不取消共用的工作
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, priority: int, task: asyncio.Task) -> None:
+        flights = self._in_flight.get(key, {})
+        if flights.get(priority) is task:
+            del flights[priority]
+            if not flights:
+                del self._in_flight[key]
+        # 所有呼叫端都已取消時仍要取出例外，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return sum(len(flights) for flights in self._in_flight.values())
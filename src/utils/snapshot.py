@@ -0,0 +1,184 @@
+"""
+JSON 快照寫入工具
+
+提供防當機的快照寫入與讀取：
+- 先寫入暫存檔並 fsync，再以 os.replace 原子性地取代正式檔案
+- 保留 N 代舊快照（file.json.1、file.json.2 ...）
+- 讀取時若最新檔案損毀，自動退回最新一份可用的舊快照
+- 寫入在專用的單一執行緒中進行，避免大型快照卡住事件迴圈
+
+所有快照寫入共用同一個工作執行緒，因此同一檔案的多次寫入會依序完成。
+"""
+
+import asyncio
+import functools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src import config
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+
+def _generation_path(path: str, generation: int) -> str:
+    return path if generation == 0 else f"{path}.{generation}"
+
+
+def _fsync_dir(path: str) -> None:
+    """確保目錄中的改名操作也已落盤（僅 POSIX 支援）"""
+    if os.name != "posix":
+        return
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _rotate(path: str, generations: int) -> None:
+    """將現有快照往後移一代：file.json → file.json.1 → file.json.2 ..."""
+    if generations <= 0 or not os.path.exists(path):
+        return
+
+    for generation in range(generations - 1, 0, -1):
+        older = _generation_path(path, generation)
+        if os.path.exists(older):
+            os.replace(older, _generation_path(path, generation + 1))
+
+    # 以硬連結保留目前的檔案，正式檔案在整個過程中都不會消失
+    first = _generation_path(path, 1)
+    if os.path.exists(first):
+        os.remove(first)
+    try:
+        os.link(path, first)
+    except OSError:
+        shutil.copy2(path, first)
+
+
+def write_json_snapshot(
+    path: str,
+    data: Any,
+    generations: Optional[int] = None,
+    **dump_kwargs: Any,
+) -> None:
+    """
+    原子性地將資料寫成 JSON 快照（同步版本）
+
+    Args:
+        path: 快照檔案路徑
+        data: 要寫入的資料（寫入期間不可被修改）
+        generations: 保留的舊快照數量，預設為 config.SNAPSHOT_GENERATIONS
+        dump_kwargs: 傳給 json.dump 的其他參數
+    """
+    if generations is None:
+        generations = config.SNAPSHOT_GENERATIONS
+    dump_kwargs.setdefault("ensure_ascii", False)
+    dump_kwargs.setdefault("default", str)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+
+        _rotate(path, generations)
+        os.replace(tmp_path, path)
+        _fsync_dir(path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def write_json_snapshot_async(
+    path: str,
+    data: Any,
+    generations: Optional[int] = None,
+    **dump_kwargs: Any,
+) -> None:
+    """在快照執行緒中寫入 JSON 快照，不阻塞事件迴圈"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        _executor,
+        functools.partial(write_json_snapshot, path, data, generations, **dump_kwargs),
+    )
+
+
+async def run_in_writer_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """在快照執行緒中執行其他寫檔操作，與快照寫入保持先後順序"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args))
+
+
+def submit_json_snapshot(
+    path: str,
+    build: Callable[[], Any],
+    generations: Optional[int] = None,
+    **dump_kwargs: Any,
+) -> Future:
+    """
+    排程一次快照寫入並立即返回（給同步程式碼使用）
+
+    build 會在快照執行緒中被呼叫以產生要寫入的資料，
+    適合把 base64 編碼等較重的轉換也移出事件迴圈。
+    """
+
+    def job() -> None:
+        try:
+            write_json_snapshot(path, build(), generations, **dump_kwargs)
+        except Exception as e:
+            print(f"❌ 寫入快照 {path} 失敗：{e}")
+            raise
+
+    return _executor.submit(job)
+
+
+def load_json_snapshot(path: str, generations: Optional[int] = None) -> Any:
+    """
+    讀取 JSON 快照，最新檔案損毀時退回最新一份可用的舊快照
+
+    Raises:
+        FileNotFoundError: 沒有任何一代快照存在
+        json.JSONDecodeError: 所有快照都無法解析
+    """
+    if generations is None:
+        generations = config.SNAPSHOT_GENERATIONS
+
+    last_error: Optional[json.JSONDecodeError] = None
+    found_any = False
+    for generation in range(generations + 1):
+        candidate = _generation_path(path, generation)
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            continue
+        except json.JSONDecodeError as e:
+            found_any = True
+            last_error = e
+            print(f"⚠️ 快照 {candidate} 已損毀，嘗試較舊的版本")
+            continue
+
+        if generation > 0:
+            print(f"♻️ 已從備份快照 {candidate} 復原資料")
+        return data
+
+    if found_any and last_error is not None:
+        raise last_error
+    raise FileNotFoundError(path)
+
+
+def quarantine_corrupt_file(path: str) -> Optional[str]:
+    """將無法解析的檔案另存一份，避免之後的快照輪替把它覆蓋掉"""
+    if not os.path.exists(path):
+        return None
+    backup_path = f"{path}.corrupt-{int(time.time())}"
+    shutil.copy2(path, backup_path)
+    return backup_path
@@ -4,82 +4,337 @@
 提供線程安全的用戶資料管理功能，包括：
 - 用戶資料的載入、保存和存取
 - 新用戶自動初始化
-- 向後相容性處理
-- 排行榜功能
-
-所有檔案操作都通過 asyncio.Lock 進行同步，確保資料一致性。
+- 向後相容性處理（依資料格式版本在存取時或由背景任務逐批升級）
+- 排行榜功能（寫入時增量維護的排序索引）
+- 欄位層級的原子更新（incr / set_fields / update_fields），只寫入變更的欄位
+- 寫回（write-behind）模式：合併多次更新後由背景任務一次寫檔
+- 可替換的儲存後端：JSON 快照、JSON + 日誌、SQLite（見 user_storage）
+
+同一位用戶的更新透過固定大小的分段鎖表序列化，不同用戶可以並行更新；
+寫入儲存則由獨立的快照鎖同步，確保資料一致性。
 """
 
-import json
 import asyncio
-from typing import Dict, Any, Optional, List, Tuple, Union
+import contextlib
+from collections.abc import MutableSequence
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 import discord
 
 from src import config
-from src.constants import DEFAULT_LEVEL, DEFAULT_EXP, DEFAULT_MONEY, DEFAULT_USER_FIELDS
+from src.utils.compact_record import CompactUserRecord
+from src.utils.leaderboard import LEADERBOARD_METRICS, SortedIndex
+from src.utils.user_storage import UserStorage, create_user_storage
+from src.constants import (
+    DEFAULT_LEVEL,
+    DEFAULT_EXP,
+    DEFAULT_MONEY,
+    DEFAULT_USER_FIELDS,
+    USER_SCHEMA_VERSION,
+)
 
 UserRecord = Dict[str, Any]
 UserIdentifier = Union[int, discord.User, discord.Member]
+DirtyFields = Optional[Set[str]]
+T = TypeVar("T")
+
+# 用於比較欄位變更時區分「不存在」與 None
+_MISSING = object()
 
 
 class UserDataManager:
     """線程安全的用戶資料管理器"""
 
-    def __init__(self, file_path: Optional[str] = None):
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        write_behind: Optional[bool] = None,
+        flush_interval: Optional[float] = None,
+        flush_threshold: Optional[int] = None,
+        storage: Optional[UserStorage] = None,
+        lock_stripes: Optional[int] = None,
+        compact_records: Optional[bool] = None,
+    ):
         self.file_path = file_path or config.USER_DATA_FILE
-        self._lock = asyncio.Lock()
+        # 快照鎖：序列化載入與寫入儲存，一般的資料更新不需要取得
+        self._snapshot_lock = asyncio.Lock()
         self.users: Dict[str, UserRecord] = {}
         self._loaded = False
+        # 以 CompactUserRecord 取代 dict 保存用戶資料（節省記憶體、O(1) 成員判斷）
+        self.compact_records = (
+            config.USER_DATA_COMPACT_RECORDS
+            if compact_records is None
+            else compact_records
+        )
+
+        # 寫回模式設定
+        self.write_behind = (
+            config.USER_DATA_WRITE_BEHIND if write_behind is None else write_behind
+        )
+        self.flush_interval = (
+            config.USER_DATA_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.flush_threshold = (
+            config.USER_DATA_FLUSH_THRESHOLD
+            if flush_threshold is None
+            else flush_threshold
+        )
+        # 待寫入的用戶 → 變更的欄位（None 表示整筆資料）
+        self._dirty: Dict[str, DirtyFields] = {}
+        self._flush_event = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._migration_task: Optional[asyncio.Task] = None
+        self.migration_batch_size = config.USER_DATA_MIGRATION_BATCH_SIZE
+
+        # 固定大小的分段鎖表：以用戶 ID 對應到其中一把鎖，
+        # 不同用戶的更新可以並行，鎖的數量也不會隨用戶數增長
+        stripes = config.USER_LOCK_STRIPES if lock_stripes is None else lock_stripes
+        self._user_locks: Tuple[asyncio.Lock, ...] = tuple(
+            asyncio.Lock() for _ in range(max(1, stripes))
+        )
+
+        # 排行榜索引，在 _persist 中隨每次寫入更新
+        self._indexes: Dict[str, SortedIndex] = {
+            metric: SortedIndex(score) for metric, score in LEADERBOARD_METRICS.items()
+        }
+
+        # 儲存後端（預設依 USER_DATA_BACKEND 建立）
+        self.storage = storage or create_user_storage(file_path=file_path)
 
     async def load_data(self) -> None:
-        """從 JSON 檔案載入用戶資料"""
+        """從儲存後端載入用戶資料"""
         if self._loaded:
             return
 
-        async with self._lock:
+        async with self._snapshot_lock:
             if self._loaded:  # 雙重檢查
                 return
 
             print("📁 正在載入用戶資料...")
-            try:
-                with open(self.file_path, "r", encoding="utf-8") as f:
-                    all_users = json.load(f)
+            all_users = await self.storage.load()
 
-                # 清理無效資料（非數字 ID）
-                valid_users = {k: v for k, v in all_users.items() if k.isdigit()}
+            # 清理無效資料（非數字 ID）
+            valid_users = {k: v for k, v in all_users.items() if k.isdigit()}
 
-                if len(valid_users) != len(all_users):
-                    removed_count = len(all_users) - len(valid_users)
-                    print(f"🧹 已清理 {removed_count} 筆無效資料")
+            if len(valid_users) != len(all_users):
+                removed_count = len(all_users) - len(valid_users)
+                print(f"🧹 已清理 {removed_count} 筆無效資料")
 
-                # 遷移現有用戶資料格式（向後相容）
-                migrated_users = self._migrate_existing_user_data(valid_users)
+            # 舊格式的資料不在這裡遷移：get_user 存取時會升級該用戶，
+            # 其餘的由 start_migration 啟動的背景任務逐批處理
+            self.users = {
+                user_id: self._wrap_record(record)
+                for user_id, record in valid_users.items()
+            }
 
-                self.users = migrated_users
-                if migrated_users != valid_users:
-                    print("🔄 已遷移用戶資料格式以確保一致性")
-                    await self._save_data()
-                else:
-                    self.users = valid_users
+            for index in self._indexes.values():
+                index.rebuild(self.users)
 
+            if all_users:
                 print(f"✅ 已載入 {len(self.users)} 位用戶的資料")
 
-            except FileNotFoundError:
-                print("📁 資料檔案不存在，將建立新檔案")
-                self.users = {}
-            except json.JSONDecodeError:
-                print("⚠️ 資料檔案格式錯誤，使用空資料開始")
-                self.users = {}
-
             self._loaded = True
 
-    async def _save_data(self) -> None:
-        """保存資料到檔案（需要已取得鎖）"""
-        try:
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(self.users, f, indent=4, ensure_ascii=False)
-        except IOError as e:
-            print(f"❌ 保存資料失敗：{e}")
+    def _wrap_record(self, record: UserRecord) -> UserRecord:
+        """依設定將 dict 轉成 CompactUserRecord"""
+        if self.compact_records and not isinstance(record, CompactUserRecord):
+            return CompactUserRecord(record)
+        return record
+
+    @staticmethod
+    def _copy_record(record: UserRecord) -> Dict[str, Any]:
+        """複製成一般的 dict，列表欄位也一併複製"""
+        return {
+            field: list(value) if isinstance(value, MutableSequence) else value
+            for field, value in record.items()
+        }
+
+    def _copy_records(
+        self, user_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, UserRecord]:
+        """複製用戶資料，讓背景執行緒寫檔時不受後續修改影響"""
+        if user_ids is None:
+            user_ids = self.users.keys()
+        return {
+            user_id: self._copy_record(self.users[user_id])
+            for user_id in user_ids
+            if user_id in self.users
+        }
+
+    async def _write_changes(self, changes: Dict[str, DirtyFields]) -> bool:
+        """
+        將指定用戶的變更寫入儲存（需要已取得快照鎖），返回是否成功
+
+        不支援增量寫入的後端（純 JSON）重寫整份快照；
+        其餘後端只寫入這些用戶（或只寫入變更的欄位），需要時再壓縮成完整快照。
+        """
+        if not self.storage.incremental:
+            return await self._compact()
+
+        if not await self.storage.write_changes(self._copy_records(changes), changes):
+            return False
+        if self.storage.needs_compaction():
+            await self._compact()
+        return True
+
+    async def _compact(self) -> bool:
+        """寫入所有用戶的完整快照（需要已取得快照鎖）"""
+        return await self.storage.write_snapshot(self._copy_records())
+
+    def _update_indexes(self, user_ids: Iterable[str]) -> None:
+        """將用戶的最新資料反映到排行榜索引"""
+        for user_id in user_ids:
+            record = self.users.get(user_id)
+            for index in self._indexes.values():
+                if record is None:
+                    index.remove(user_id)
+                else:
+                    index.update(user_id, record)
+
+    def _mark_dirty(self, user_id: str, fields: DirtyFields) -> None:
+        """合併待寫入的欄位；只要有一次是整筆資料，就以整筆寫入"""
+        if user_id in self._dirty:
+            pending = self._dirty[user_id]
+            if pending is None or fields is None:
+                self._dirty[user_id] = None
+            else:
+                pending.update(fields)
+        else:
+            self._dirty[user_id] = None if fields is None else set(fields)
+
+    async def _persist(self, *user_ids: str, fields: DirtyFields = None) -> None:
+        """
+        記錄用戶資料變更（需要已取得該用戶的鎖）
+
+        寫回模式下僅標記為待寫入，由背景任務合併寫檔；
+        否則取得快照鎖後立即寫入儲存。fields 為 None 時表示整筆資料都要寫入。
+        """
+        self._update_indexes(user_ids)
+
+        if not self.write_behind:
+            async with self._snapshot_lock:
+                await self._write_changes(
+                    {
+                        user_id: None if fields is None else set(fields)
+                        for user_id in user_ids
+                    }
+                )
+            return
+
+        for user_id in user_ids:
+            self._mark_dirty(user_id, fields)
+        self.start_flusher()
+        if len(self._dirty) >= self.flush_threshold:
+            self._flush_event.set()
+
+    def start_flusher(self) -> None:
+        """啟動背景寫檔任務（需在事件迴圈中呼叫）"""
+        if not self.write_behind:
+            return
+        if self._flusher_task and not self._flusher_task.done():
+            return
+        self._flusher_task = asyncio.get_running_loop().create_task(
+            self._flush_loop()
+        )
+
+    async def _flush_loop(self) -> None:
+        """背景寫檔循環：每隔固定時間或待寫入數量達門檻時寫檔一次"""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ 背景寫入用戶資料失敗：{e}")
+
+    async def flush(self) -> None:
+        """立即將所有待寫入的變更寫入檔案"""
+        if not self._dirty:
+            return
+
+        # 寫入者只會往 _dirty 加標記，不需要等待快照鎖，
+        # 因此寫檔期間只有其他 flush 會被擋住
+        async with self._snapshot_lock:
+            if not self._dirty:
+                return
+            pending = self._dirty
+            self._dirty = {}
+            if not await self._write_changes(pending):
+                # 寫入失敗時保留待寫入標記，等待下次重試
+                for user_id, fields in pending.items():
+                    self._mark_dirty(user_id, fields)
+
+    def start_migration(self) -> None:
+        """啟動背景任務，將舊格式的用戶資料逐批升級（需在事件迴圈中呼叫）"""
+        if self._migration_task and not self._migration_task.done():
+            return
+        self._migration_task = asyncio.get_running_loop().create_task(
+            self._migration_loop()
+        )
+
+    async def _migration_loop(self) -> None:
+        """逐批升級舊格式的用戶資料，批次之間讓出事件迴圈"""
+        pending = [
+            user_id
+            for user_id, user_data in self.users.items()
+            if user_data.get("schema_version", 0) < USER_SCHEMA_VERSION
+        ]
+        if not pending:
+            return
+
+        print(f"🔄 開始在背景升級 {len(pending)} 位用戶的資料格式")
+        upgraded = 0
+        for start in range(0, len(pending), self.migration_batch_size):
+            chunk = pending[start : start + self.migration_batch_size]
+            # 升級與寫入期間持有這批用戶對應的分段鎖（依固定順序取得，避免死結），
+            # 以免與 update_fields / incr 交錯而寫入過時的資料
+            locks = sorted(
+                {self._get_user_lock(user_id) for user_id in chunk},
+                key=self._user_locks.index,
+            )
+            async with contextlib.AsyncExitStack() as stack:
+                for lock in locks:
+                    await stack.enter_async_context(lock)
+                batch = [
+                    user_id
+                    for user_id in chunk
+                    if user_id in self.users and self._upgrade_record(self.users[user_id])
+                ]
+                if batch:
+                    await self._persist(*batch)
+                    upgraded += len(batch)
+            await asyncio.sleep(0)
+
+        print(f"✅ 已升級 {upgraded} 位用戶的資料格式")
+
+    async def close(self) -> None:
+        """停止背景任務並寫入剩餘變更（用於關閉機器人時）"""
+        for task in (self._migration_task, self._flusher_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._migration_task = None
+        self._flusher_task = None
+        await self.flush()
+        await self.storage.close()
 
     def _create_default_user_data(
         self, user_obj: Optional[discord.User] = None
@@ -97,6 +352,7 @@ class UserDataManager:
             # 從 DEFAULT_USER_FIELDS 複製所有預設欄位
             "achievements": DEFAULT_USER_FIELDS.get("achievements", []).copy(),
             "found_flags": DEFAULT_USER_FIELDS.get("found_flags", []).copy(),
+            "schema_version": USER_SCHEMA_VERSION,
         }
 
         # 確保包含所有 DEFAULT_USER_FIELDS 中的欄位（以防未來新增）
@@ -140,18 +396,21 @@ class UserDataManager:
 
         # 處理新用戶
         if user_id_str not in self.users:
-            async with self._lock:
+            async with self._get_user_lock(user_id_str):
                 if user_id_str not in self.users:  # 雙重檢查
                     print(f"👤 新用戶註冊：{user_obj.name if user_obj else user_id}")
-                    self.users[user_id_str] = self._create_default_user_data(user_obj)
-                    await self._save_data()
+                    self.users[user_id_str] = self._wrap_record(
+                        self._create_default_user_data(user_obj)
+                    )
+                    await self._persist(user_id_str)
                     return self.users[user_id_str]  # 直接返回新創建的完整資料
 
-        # 對於現有用戶，僅更新用戶名稱（如果需要）
+        # 對於現有用戶，升級舊格式並更新用戶名稱（如果需要）
         user_data = self.users[user_id_str]
+        upgraded = self._upgrade_record(user_data)
         name_updated = self._update_user_name_if_needed(user_data, user_obj)
 
-        if name_updated:
+        if upgraded or name_updated:
             await self.update_user_data(user_id, user_data)
 
         return user_data
@@ -159,19 +418,120 @@ class UserDataManager:
     async def update_user_data(self, user_id: int, data: UserRecord) -> None:
         """更新用戶資料並保存"""
         user_id_str = str(user_id)
-        async with self._lock:
-            self.users[user_id_str] = data
-            await self._save_data()
+        async with self._get_user_lock(user_id_str):
+            self.users[user_id_str] = self._wrap_record(data)
+            await self._persist(user_id_str)
+
+    def _get_user_lock(self, user_id_str: str) -> asyncio.Lock:
+        """取得該用戶對應的分段鎖（鎖不可重入，持有時不要再取得其他用戶的鎖）"""
+        key = int(user_id_str) if user_id_str.isdigit() else hash(user_id_str)
+        return self._user_locks[key % len(self._user_locks)]
+
+    async def update_fields(
+        self,
+        user_identifier: UserIdentifier,
+        updater: Callable[[UserRecord], T],
+    ) -> T:
+        """
+        在該用戶的鎖內原地修改資料，只記錄有變更的欄位
+
+        Args:
+            user_identifier: 用戶 ID 或 Discord 用戶物件（新用戶會自動註冊）
+            updater: 接收用戶資料並直接修改的同步函式，其返回值會原樣返回
+
+        Example:
+            def apply(user):
+                user["money"] = max(0, user["money"] - 10)
+
+            await user_data_manager.update_fields(member, apply)
+        """
+        await self.get_user(user_identifier)
+        user_id_str = str(
+            user_identifier.id
+            if isinstance(user_identifier, (discord.User, discord.Member))
+            else user_identifier
+        )
+
+        async with self._get_user_lock(user_id_str):
+            # 在鎖內重新取得資料，避免使用到已被 update_user_data 取代的舊物件
+            user = self.users[user_id_str]
+            before = self._copy_record(user)
+            result = updater(user)
+            changed = {
+                field
+                for field in before.keys() | user.keys()
+                if before.get(field, _MISSING) != user.get(field, _MISSING)
+            }
+            if changed:
+                await self._persist(user_id_str, fields=changed)
+        return result
+
+    async def incr(self, user_identifier: UserIdentifier, **deltas: int) -> UserRecord:
+        """
+        原子性地增減數值欄位，例如 incr(user_id, money=-10, exp=3)
+
+        Returns:
+            更新後的用戶資料
+        """
+
+        def apply(user: UserRecord) -> UserRecord:
+            for field, delta in deltas.items():
+                if delta:
+                    user[field] = user.get(field, 0) + delta
+            return user
+
+        return await self.update_fields(user_identifier, apply)
+
+    async def set_fields(
+        self, user_identifier: UserIdentifier, **values: Any
+    ) -> UserRecord:
+        """
+        原子性地設定一或多個欄位，例如 set_fields(user_id, pet_name="小白")
+
+        Returns:
+            更新後的用戶資料
+        """
+
+        def apply(user: UserRecord) -> UserRecord:
+            user.update(values)
+            return user
+
+        return await self.update_fields(user_identifier, apply)
 
     async def reset_all_flags(self) -> None:
         """重置所有用戶的 'found_flags'"""
-        async with self._lock:
+        # 依固定順序取得所有分段鎖，避免與其他更新交錯
+        async with contextlib.AsyncExitStack() as stack:
+            for lock in self._user_locks:
+                await stack.enter_async_context(lock)
             for user_id in self.users:
                 if "found_flags" in self.users[user_id]:
                     self.users[user_id]["found_flags"] = []
-            await self._save_data()
+            await self._persist(*self.users.keys(), fields={"found_flags"})
             print("🚩 已重置所有用戶的彩蛋旗標")
 
+    async def reset_all_sign_ins(self) -> int:
+        """
+        清除所有用戶的 'last_sign_in'，讓大家可以重新簽到
+
+        Returns:
+            被重置的用戶數
+        """
+        # 依固定順序取得所有分段鎖，所有變更合併成一次寫入
+        async with contextlib.AsyncExitStack() as stack:
+            for lock in self._user_locks:
+                await stack.enter_async_context(lock)
+            reset = [
+                user_id
+                for user_id, user in self.users.items()
+                if user.get("last_sign_in")
+            ]
+            for user_id in reset:
+                self.users[user_id]["last_sign_in"] = None
+            if reset:
+                await self._persist(*reset, fields={"last_sign_in"})
+            return len(reset)
+
     def get_top_users(
         self, sort_by: str, limit: int = 10
     ) -> List[Tuple[str, UserRecord]]:
@@ -179,10 +539,14 @@ class UserDataManager:
         獲取排行榜
 
         Args:
-            sort_by: 排序依據 ('money', 'exp', 'achievements', 'found_flags')
+            sort_by: 排序依據 ('money', 'exp', 'achievements', 'found_flags', 'pet_affection')
             limit: 返回數量限制
         """
+        index = self._indexes.get(sort_by)
+        if index is not None:
+            return [(user_id, self.users[user_id]) for user_id in index.top(limit)]
 
+        # 沒有索引的欄位才需要排序所有用戶
         def get_sort_key(item: Tuple[str, UserRecord]) -> Union[int, float]:
             user_data = item[1]
 
@@ -199,40 +563,44 @@ class UserDataManager:
         sorted_users = sorted(self.users.items(), key=get_sort_key, reverse=True)
         return sorted_users[:limit]
 
-    def _migrate_existing_user_data(
-        self, users_data: Dict[str, UserRecord]
-    ) -> Dict[str, UserRecord]:
-        """遷移現有用戶資料，確保格式統一（向後相容）"""
-        migrated_users = {}
-
-        for user_id, user_data in users_data.items():
-            migrated_data = user_data.copy()
-
-            # 確保所有必要欄位存在
-            for field, default_value in DEFAULT_USER_FIELDS.items():
-                if field not in migrated_data:
-                    if isinstance(default_value, list):
-                        migrated_data[field] = default_value.copy()
-                    else:
-                        migrated_data[field] = default_value
-
-            # 確保基本欄位存在
-            if "lv" not in migrated_data:
-                migrated_data["lv"] = DEFAULT_LEVEL
-            if "exp" not in migrated_data:
-                migrated_data["exp"] = DEFAULT_EXP
-            if "money" not in migrated_data:
-                migrated_data["money"] = DEFAULT_MONEY
-            if "debt" not in migrated_data:
-                migrated_data["debt"] = 0
-            if "last_sign_in" not in migrated_data:
-                migrated_data["last_sign_in"] = None
-            if "sign_in_streak" not in migrated_data:
-                migrated_data["sign_in_streak"] = 0
-
-            migrated_users[user_id] = migrated_data
-
-        return migrated_users
+    def rank_of(self, user_id: Union[int, str], metric: str) -> Optional[int]:
+        """
+        查詢用戶在排行榜上的名次（從 1 開始）
+
+        Args:
+            user_id: 用戶 ID
+            metric: 排行榜名稱（'money', 'exp', 'achievements', 'found_flags', 'pet_affection'）
+
+        Returns:
+            名次；用戶不存在時返回 None
+
+        Raises:
+            KeyError: 沒有這個排行榜
+        """
+        return self._indexes[metric].rank(str(user_id))
+
+    def _upgrade_record(self, user_data: UserRecord) -> bool:
+        """將單一用戶資料原地升級到目前的格式版本，返回是否有變更"""
+        if user_data.get("schema_version", 0) >= USER_SCHEMA_VERSION:
+            return False
+
+        # 版本 1：確保所有必要欄位存在
+        for field, default_value in DEFAULT_USER_FIELDS.items():
+            if field not in user_data:
+                if isinstance(default_value, list):
+                    user_data[field] = default_value.copy()
+                else:
+                    user_data[field] = default_value
+
+        user_data.setdefault("lv", DEFAULT_LEVEL)
+        user_data.setdefault("exp", DEFAULT_EXP)
+        user_data.setdefault("money", DEFAULT_MONEY)
+        user_data.setdefault("debt", 0)
+        user_data.setdefault("last_sign_in", None)
+        user_data.setdefault("sign_in_streak", 0)
+
+        user_data["schema_version"] = USER_SCHEMA_VERSION
+        return True
 
 
 # 全域用戶資料管理器實例
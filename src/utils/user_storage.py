@@ -0,0 +1,423 @@
+"""
+用戶資料儲存後端
+
+UserDataManager 在記憶體中保存所有用戶資料，並透過這裡的後端持久化：
+- JsonFileStorage：JSON 快照檔，可選擇搭配追加式變更日誌（journal）
+- SQLiteUserStorage：SQLite 資料庫（WAL 模式），常用欄位為獨立欄位，
+  列表欄位存在子表中（排行榜由記憶體中的排序索引提供，見 leaderboard）
+
+後端收到的資料都是管理器複製出來的副本，可以安全地在背景執行緒中寫入。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+from src import config
+from src.utils.journal import UserDataJournal
+from src.utils.snapshot import (
+    load_json_snapshot,
+    quarantine_corrupt_file,
+    run_in_writer_thread,
+    write_json_snapshot,
+)
+
+UserRecord = Dict[str, Any]
+# 用戶 ID → 變更的欄位（None 表示整筆資料）
+ChangedFields = Dict[str, Optional[Set[str]]]
+
+
+class UserStorage:
+    """用戶資料儲存後端的共同介面"""
+
+    # True 表示 write_changes 只需要有變更的用戶；False 則每次都寫入完整快照
+    incremental = False
+
+    async def load(self) -> Dict[str, UserRecord]:
+        """載入所有用戶資料"""
+        raise NotImplementedError
+
+    async def write_snapshot(self, users: Dict[str, UserRecord]) -> bool:
+        """寫入所有用戶的完整資料，返回是否成功"""
+        raise NotImplementedError
+
+    async def write_changes(
+        self, changes: Dict[str, UserRecord], fields: Optional[ChangedFields] = None
+    ) -> bool:
+        """
+        只寫入有變更的用戶（incremental 後端才會被呼叫），返回是否成功
+
+        Args:
+            changes: 有變更的用戶的完整資料
+            fields: 每位用戶變更了哪些欄位，未列出或為 None 時寫入整筆資料
+        """
+        return await self.write_snapshot(changes)
+
+    def needs_compaction(self) -> bool:
+        """是否應該寫入完整快照以壓縮增量資料"""
+        return False
+
+    async def close(self) -> None:
+        """釋放後端資源"""
+
+
+class JsonFileStorage(UserStorage):
+    """JSON 快照檔後端，可選擇搭配追加式變更日誌"""
+
+    def __init__(
+        self,
+        file_path: str,
+        journal_file: Optional[str] = None,
+        journal_max_bytes: Optional[int] = None,
+    ):
+        self.file_path = file_path
+        self.journal = UserDataJournal(journal_file) if journal_file else None
+        self.journal_max_bytes = (
+            config.USER_DATA_JOURNAL_MAX_BYTES
+            if journal_max_bytes is None
+            else journal_max_bytes
+        )
+        self.incremental = self.journal is not None
+
+    async def load(self) -> Dict[str, UserRecord]:
+        try:
+            users = load_json_snapshot(self.file_path)
+        except FileNotFoundError:
+            print("📁 資料檔案不存在，將建立新檔案")
+            users = {}
+        except json.JSONDecodeError:
+            backup_path = quarantine_corrupt_file(self.file_path)
+            print(f"⚠️ 資料檔案格式錯誤，已備份至 {backup_path}，使用空資料開始")
+            users = {}
+
+        # 在快照上重播日誌中的變更
+        if self.journal:
+            replayed = self.journal.replay(users)
+            if replayed:
+                print(f"📜 已從日誌重播 {replayed} 筆變更")
+                # 將重播後的結果寫成新快照，同時清掉可能寫到一半的日誌尾端
+                await self.write_snapshot(users)
+
+        return users
+
+    def _write_snapshot_sync(self, users: Dict[str, UserRecord]) -> None:
+        write_json_snapshot(self.file_path, users, indent=4)
+        if self.journal:
+            try:
+                self.journal.reset()
+            except IOError as e:
+                # 日誌內容皆為冪等的設定值，留著也只會在下次載入時重播
+                print(f"⚠️ 清空用戶資料日誌失敗：{e}")
+
+    async def write_snapshot(self, users: Dict[str, UserRecord]) -> bool:
+        try:
+            await run_in_writer_thread(self._write_snapshot_sync, users)
+            return True
+        except (IOError, TypeError, ValueError) as e:
+            print(f"❌ 保存資料失敗：{e}")
+            return False
+
+    async def write_changes(
+        self, changes: Dict[str, UserRecord], fields: Optional[ChangedFields] = None
+    ) -> bool:
+        if self.journal is None:
+            return await super().write_changes(changes, fields)
+
+        fields = fields or {}
+        entries = []
+        for user_id, record in changes.items():
+            changed = fields.get(user_id)
+            if changed is None:
+                entries.append({"id": user_id, "record": record})
+            else:
+                entries.append(
+                    {
+                        "id": user_id,
+                        "set": {f: record[f] for f in changed if f in record},
+                    }
+                )
+        try:
+            await run_in_writer_thread(self.journal.append, entries)
+            return True
+        except (IOError, TypeError, ValueError) as e:
+            print(f"❌ 寫入用戶資料日誌失敗：{e}")
+            return False
+
+    def needs_compaction(self) -> bool:
+        return bool(self.journal) and self.journal.size() >= self.journal_max_bytes
+
+
+class SQLiteUserStorage(UserStorage):
+    """
+    SQLite 後端（WAL 模式）
+
+    - users 表：常用欄位為獨立欄位，其餘欄位以 JSON 存在 extra
+    - 列表欄位（成就、彩蛋、使用過的功能）各自存在子表中
+    - 每次只 upsert 有變更的用戶，不再重寫整份資料
+    """
+
+    # 以獨立欄位儲存的常用欄位
+    COLUMNS = (
+        "name",
+        "lv",
+        "exp",
+        "money",
+        "debt",
+        "last_sign_in",
+        "sign_in_streak",
+        "pet_name",
+        "pet_affection",
+    )
+    # 列表欄位 → 子表名稱
+    LIST_TABLES = {
+        "achievements": "user_achievements",
+        "found_flags": "user_found_flags",
+        "used_features": "user_used_features",
+    }
+    incremental = True
+
+    def __init__(self, db_path: str, import_from: Optional[str] = None):
+        self.db_path = db_path
+        self.import_from = import_from
+        # sqlite3 連線只能在建立它的執行緒使用，因此所有操作都交給同一個執行緒
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ----- 以下方法只在 SQLite 執行緒中執行 -----
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+
+        columns = ", ".join(
+            f"{column} {'TEXT' if column in ('name', 'last_sign_in', 'pet_name') else 'INTEGER'}"
+            for column in self.COLUMNS
+        )
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS users ("
+                f"user_id INTEGER PRIMARY KEY, {columns}, extra TEXT)"
+            )
+            for table in self.LIST_TABLES.values():
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE, "
+                    "position INTEGER NOT NULL, "
+                    "value TEXT NOT NULL, "
+                    "PRIMARY KEY (user_id, position))"
+                )
+
+        self._conn = conn
+        return conn
+
+    def _load_sync(self) -> Dict[str, UserRecord]:
+        conn = self._connect()
+        users: Dict[str, UserRecord] = {}
+
+        column_list = ", ".join(self.COLUMNS)
+        for row in conn.execute(f"SELECT user_id, {column_list}, extra FROM users"):
+            user_id = str(row[0])
+            record: UserRecord = json.loads(row[-1]) if row[-1] else {}
+            for column, value in zip(self.COLUMNS, row[1:-1]):
+                # 遷移後除了名稱以外的欄位都一定存在，NULL 即代表 None
+                if value is not None or column != "name":
+                    record[column] = value
+            for field in self.LIST_TABLES:
+                record[field] = []
+            users[user_id] = record
+
+        for field, table in self.LIST_TABLES.items():
+            for user_id, value in conn.execute(
+                f"SELECT user_id, value FROM {table} ORDER BY user_id, position"
+            ):
+                record = users.get(str(user_id))
+                if record is not None:
+                    record[field].append(value)
+
+        return users
+
+    def _extra_json(self, record: UserRecord) -> str:
+        extra = {
+            field: value
+            for field, value in record.items()
+            if field not in self.COLUMNS and field not in self.LIST_TABLES
+        }
+        return json.dumps(extra, ensure_ascii=False, default=str)
+
+    def _replace_list(
+        self, conn: sqlite3.Connection, table: str, user_id: int, values: List[Any]
+    ) -> None:
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            f"INSERT INTO {table} (user_id, position, value) VALUES (?, ?, ?)",
+            [(user_id, position, str(value)) for position, value in enumerate(values)],
+        )
+
+    def _update_fields_sync(
+        self,
+        conn: sqlite3.Connection,
+        user_id: str,
+        record: UserRecord,
+        changed: Set[str],
+    ) -> bool:
+        """只更新變更的欄位，該用戶還不在資料庫中時返回 False"""
+        assignments = [column for column in self.COLUMNS if column in changed]
+        values = [record.get(column) for column in assignments]
+        if any(f not in self.COLUMNS and f not in self.LIST_TABLES for f in changed):
+            assignments.append("extra")
+            values.append(self._extra_json(record))
+
+        if assignments:
+            set_clause = ", ".join(f"{column} = ?" for column in assignments)
+            cursor = conn.execute(
+                f"UPDATE users SET {set_clause} WHERE user_id = ?",
+                (*values, int(user_id)),
+            )
+            exists = cursor.rowcount > 0
+        else:
+            exists = (
+                conn.execute(
+                    "SELECT 1 FROM users WHERE user_id = ?", (int(user_id),)
+                ).fetchone()
+                is not None
+            )
+        if not exists:
+            return False
+
+        for field, table in self.LIST_TABLES.items():
+            if field in changed:
+                self._replace_list(conn, table, int(user_id), record.get(field) or [])
+        return True
+
+    def _upsert_sync(self, conn: sqlite3.Connection, records: Dict[str, UserRecord]):
+        column_list = ", ".join(self.COLUMNS)
+        placeholders = ", ".join("?" for _ in range(len(self.COLUMNS) + 2))
+        updates = ", ".join(
+            f"{column}=excluded.{column}" for column in self.COLUMNS + ("extra",)
+        )
+        upsert_sql = (
+            f"INSERT INTO users (user_id, {column_list}, extra) VALUES ({placeholders}) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {updates}"
+        )
+
+        for user_id, record in records.items():
+            conn.execute(
+                upsert_sql,
+                (
+                    int(user_id),
+                    *(record.get(column) for column in self.COLUMNS),
+                    self._extra_json(record),
+                ),
+            )
+            for field, table in self.LIST_TABLES.items():
+                self._replace_list(conn, table, int(user_id), record.get(field) or [])
+
+    def _write_changes_sync(
+        self, records: Dict[str, UserRecord], fields: ChangedFields
+    ) -> None:
+        conn = self._connect()
+        with conn:
+            full_records = {}
+            for user_id, record in records.items():
+                changed = fields.get(user_id)
+                if changed is None or not self._update_fields_sync(
+                    conn, user_id, record, changed
+                ):
+                    full_records[user_id] = record
+            self._upsert_sync(conn, full_records)
+
+    def _write_snapshot_sync(self, users: Dict[str, UserRecord]) -> None:
+        conn = self._connect()
+        with conn:
+            existing = {row[0] for row in conn.execute("SELECT user_id FROM users")}
+            removed = existing - {int(user_id) for user_id in users}
+            conn.executemany(
+                "DELETE FROM users WHERE user_id = ?", [(uid,) for uid in removed]
+            )
+            self._upsert_sync(conn, users)
+
+    def _close_sync(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ----- 非同步介面 -----
+
+    async def load(self) -> Dict[str, UserRecord]:
+        users = await self._run(self._load_sync)
+        if users or not self.import_from or not os.path.exists(self.import_from):
+            return users
+
+        # 第一次切換到 SQLite 時，從原本的 JSON 檔匯入資料
+        print(f"📦 正在從 {self.import_from} 匯入用戶資料到 SQLite...")
+        users = await JsonFileStorage(self.import_from).load()
+        users = {k: v for k, v in users.items() if k.isdigit()}
+        if users and await self.write_snapshot(users):
+            print(f"✅ 已匯入 {len(users)} 位用戶的資料")
+        return users
+
+    async def write_snapshot(self, users: Dict[str, UserRecord]) -> bool:
+        try:
+            await self._run(self._write_snapshot_sync, users)
+            return True
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"❌ 保存資料到 SQLite 失敗：{e}")
+            return False
+
+    async def write_changes(
+        self, changes: Dict[str, UserRecord], fields: Optional[ChangedFields] = None
+    ) -> bool:
+        try:
+            await self._run(self._write_changes_sync, changes, fields or {})
+            return True
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"❌ 寫入 SQLite 失敗：{e}")
+            return False
+
+    async def close(self) -> None:
+        await self._run(self._close_sync)
+        self._executor.shutdown(wait=True)
+
+
+def create_user_storage(
+    backend: Optional[str] = None, file_path: Optional[str] = None
+) -> UserStorage:
+    """
+    依設定建立儲存後端
+
+    Args:
+        backend: json、journal 或 sqlite，預設為 config.USER_DATA_BACKEND
+        file_path: JSON 快照路徑，預設為 config.USER_DATA_FILE
+    """
+    backend = (backend or config.USER_DATA_BACKEND).lower()
+    json_path = file_path or config.USER_DATA_FILE
+
+    if backend == "journal":
+        journal_file = (
+            f"{file_path}.journal" if file_path else config.USER_DATA_JOURNAL_FILE
+        )
+        return JsonFileStorage(json_path, journal_file=journal_file)
+    if backend == "sqlite":
+        db_file = (
+            f"{os.path.splitext(file_path)[0]}.db"
+            if file_path
+            else config.USER_DATA_DB_FILE
+        )
+        return SQLiteUserStorage(db_file, import_from=json_path)
+    if backend != "json":
+        print(f"⚠️ 未知的 USER_DATA_BACKEND「{backend}」，改用 json")
+    return JsonFileStorage(json_path)
@@ -0,0 +1,63 @@
+"""
+測試共用的 fixture
+"""
+
+import pytest
+
+from src.utils.user_data import UserDataManager
+from src.utils.user_storage import create_user_storage
+
+
+@pytest.fixture
+def user_data_path(tmp_path):
+    return str(tmp_path / "user_data.json")
+
+
+class _TestUserDataManager(UserDataManager):
+    """測試中可能已先手動關閉，teardown 時不重複關閉"""
+
+    closed = False
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            await super().close()
+
+
+@pytest.fixture
+async def make_manager(user_data_path):
+    """
+    建立並載入使用暫存檔案的 UserDataManager，測試結束時關閉
+
+    backend 為 json、journal 或 sqlite；預設關閉寫回模式，其餘參數直接傳給 UserDataManager。
+    同一個測試中再次呼叫即相當於重新啟動後載入同一份資料。
+    """
+    managers = []
+
+    async def factory(backend="json", journal_max_bytes=None, **options):
+        options.setdefault("write_behind", False)
+        storage = create_user_storage(backend, user_data_path)
+        if journal_max_bytes is not None:
+            storage.journal_max_bytes = journal_max_bytes
+        manager = _TestUserDataManager(user_data_path, storage=storage, **options)
+        await manager.load_data()
+        managers.append(manager)
+        return manager
+
+    yield factory
+    for manager in managers:
+        await manager.close()
+
+
+@pytest.fixture
+def count_writes(monkeypatch):
+    """記錄 UserDataManager 實際寫入儲存的次數"""
+    writes = []
+    original = UserDataManager._write_changes
+
+    async def counting(self, *args, **kwargs):
+        writes.append(args)
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(UserDataManager, "_write_changes", counting)
+    return writes
@@ -0,0 +1,70 @@
+"""
+精簡用戶資料格式的行為測試
+"""
+
+import json
+
+import pytest
+
+from src.utils.compact_record import CompactUserRecord, IdList
+
+
+def test_record_behaves_like_dict():
+    """常用欄位與其他欄位都能像 dict 一樣存取"""
+    data = {"name": "a", "money": 5, "found_flags": ["x", "y"], "custom": {"k": 1}}
+    record = CompactUserRecord(data)
+
+    assert dict(record) == data
+    assert record.get("lv") is None
+    assert "money" in record and "lv" not in record
+    record["money"] += 10
+    record["other"] = 3
+    del record["custom"]
+
+    assert record.copy() == {"name": "a", "money": 15, "found_flags": ["x", "y"], "other": 3}
+    with pytest.raises(KeyError):
+        record["custom"]
+    with pytest.raises(KeyError):
+        del record["lv"]
+
+
+def test_id_list_keeps_order_and_membership():
+    """IdList 保留順序，成員判斷隨修改更新"""
+    flags = IdList(["b", "a"])
+    flags.append("c")
+    flags.insert(0, "z")
+
+    assert list(flags) == ["z", "b", "a", "c"]
+    assert "a" in flags and "missing" not in flags and 1 not in flags
+
+    del flags[2]
+    flags[0] = "y"
+    assert flags == ["y", "b", "c"]
+    assert "a" not in flags and "z" not in flags
+    assert flags[1:] == ["b", "c"]
+
+
+def test_record_serializes_as_plain_json():
+    """轉回 dict 後可直接寫成 JSON"""
+    record = CompactUserRecord({"money": 1, "achievements": ["first"]})
+    plain = {
+        field: list(value) if isinstance(value, IdList) else value
+        for field, value in record.items()
+    }
+
+    assert json.loads(json.dumps(plain)) == {"money": 1, "achievements": ["first"]}
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+async def test_manager_with_compact_records(make_manager, backend):
+    """開啟精簡格式時，列表欄位的原地修改也會被偵測並寫入"""
+    manager = await make_manager(backend=backend, compact_records=True)
+    await manager.update_fields(1, lambda user: user["found_flags"].append("flag_a"))
+    await manager.incr(1, money=5)
+
+    assert isinstance(manager.users["1"], CompactUserRecord)
+    await manager.close()
+
+    restarted = await make_manager(backend=backend, compact_records=True)
+    assert restarted.users["1"]["found_flags"] == ["flag_a"]
+    assert "flag_a" in restarted.users["1"]["found_flags"]
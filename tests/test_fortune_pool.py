@@ -0,0 +1,124 @@
+"""
+預先生成運勢圖片池的行為測試
+"""
+
+import asyncio
+import itertools
+from io import BytesIO
+
+import pytest
+
+from src.utils.fortune_pool import FortuneImagePool
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND
+
+
+class FakeGenerator:
+    """記錄生成請求的假圖片生成函式"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    async def __call__(self, prompt, priority):
+        self.calls.append((prompt, priority))
+        if self.fail:
+            return None
+        return BytesIO(f"image:{prompt}".encode())
+
+
+@pytest.fixture
+def generator():
+    return FakeGenerator()
+
+
+@pytest.fixture
+async def make_pool(generator):
+    """建立使用假生成函式的圖片池，測試結束時停止背景任務"""
+    pools = []
+
+    def factory(quotes=None, idle=lambda: True, **options):
+        quotes = itertools.cycle(quotes or [f"語錄{i}" for i in range(100)])
+        options = {"target_size": 3, "refill_interval": 60, **options}
+        pool = FortuneImagePool(lambda: next(quotes), generator, idle, **options)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        await pool.stop()
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def test_take_from_empty_pool_returns_none(make_pool):
+    pool = make_pool()
+
+    assert pool.take() is None
+    assert pool.empty == 1
+
+
+async def test_refill_fills_to_target_at_background_priority(make_pool, generator):
+    pool = make_pool()
+    pool.start()
+    # 取用（即使是空的）會喚醒背景任務，不必等到 refill_interval
+    pool.take()
+    await _settle()
+
+    assert len(pool) == 3
+    assert pool.generated == 3
+    assert {priority for _, priority in generator.calls} == {PRIORITY_BACKGROUND}
+
+    quote, image = pool.take()
+    assert image.getvalue() == f"image:{quote}".encode()
+    assert pool.served == 1
+    await _settle()
+    assert len(pool) == 3
+
+
+async def test_refill_waits_for_idle_queue(make_pool, generator):
+    """圖片生成佇列忙碌時不補充，空閒後才開始"""
+    idle = [False]
+    pool = make_pool(idle=lambda: idle[0])
+    pool.start()
+    pool.take()
+    await _settle()
+    assert generator.calls == []
+
+    idle[0] = True
+    pool.take()
+    await _settle()
+    assert len(pool) == 3
+
+
+async def test_duplicate_quote_is_not_generated_twice(make_pool, generator):
+    """池中已有相同語錄時換一句，仍重複則放棄這一輪"""
+    pool = make_pool(quotes=["只有一句"])
+
+    assert await pool._refill_one() is True
+    assert await pool._refill_one() is False
+    assert len(pool) == 1
+    assert len(generator.calls) == 1
+
+
+async def test_failed_generation_stops_the_round(make_pool, generator):
+    pool = make_pool()
+    generator.fail = True
+    pool.start()
+    pool.take()
+    await _settle()
+
+    assert len(pool) == 0
+    assert len(generator.calls) == 1
+
+
+async def test_zero_target_size_disables_pool(make_pool, generator):
+    pool = make_pool(target_size=0)
+    pool.start()
+    pool.take()
+    await _settle()
+
+    assert pool._task is None
+    assert generator.calls == []
@@ -0,0 +1,156 @@
+"""
+Gradio 客戶端連線池的行為測試
+"""
+
+import asyncio
+import itertools
+
+import pytest
+
+from src.utils.gradio_pool import GradioClientPool
+
+
+class FakeClients:
+    """依序建立編號遞增的假客戶端，可指定接下來幾次建立失敗"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.failures = 0
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("space is down")
+        return f"client-{next(self._ids)}"
+
+
+@pytest.fixture
+def clients():
+    return FakeClients()
+
+
+@pytest.fixture
+async def make_pool(clients):
+    """建立使用假客戶端的連線池，測試結束時關閉"""
+    pools = []
+
+    def factory(**options):
+        options = {"size": 2, "retry_delay": 0.01, **options}
+        pool = GradioClientPool(clients, **options)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        await pool.close()
+
+
+async def _settle():
+    """等待背景補建的執行緒與任務完成"""
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+async def test_start_prebuilds_clients_and_reuses_them(make_pool):
+    pool = make_pool()
+    pool.start()
+    await _settle()
+    assert pool.stats()["idle"] == 2
+
+    client = await pool.acquire()
+    pool.release(client)
+    assert await pool.acquire() == client
+
+    stats = pool.stats()
+    assert stats["created"] == 2
+    assert stats["reused"] == 2
+    assert stats["in_use"] == 1
+
+
+async def test_acquire_builds_on_demand_up_to_size(make_pool):
+    pool = make_pool()
+
+    first = await pool.acquire()
+    second = await pool.acquire()
+    waiting = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    pool.release(first)
+    assert await waiting == first
+    assert pool.stats()["created"] == 2
+    pool.release(second)
+
+
+async def test_discard_refills_in_background(make_pool):
+    """丟棄的客戶端不會再被借出，背景補建新的客戶端後交給等待中的工作"""
+    pool = make_pool(size=1)
+    broken = await pool.acquire()
+    waiting = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0)
+
+    pool.discard(broken)
+    replacement = await asyncio.wait_for(waiting, timeout=1)
+
+    assert replacement != broken
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["created"] == 2
+
+
+async def test_failed_refill_retries_later(make_pool, clients):
+    """補建失敗時在 retry_delay 後重試，不會讓等待中的工作永遠等下去"""
+    pool = make_pool(size=1)
+    broken = await pool.acquire()
+    waiting = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0)
+
+    clients.failures = 2
+    pool.discard(broken)
+
+    assert await asyncio.wait_for(waiting, timeout=1) == "client-2"
+    assert clients.failures == 0
+
+
+async def test_failed_acquire_releases_its_slot(make_pool, clients):
+    pool = make_pool(size=1)
+    clients.failures = 1
+
+    with pytest.raises(ConnectionError):
+        await pool.acquire()
+
+    assert await pool.acquire() == "client-1"
+
+
+async def test_cancelled_waiter_passes_client_on(make_pool):
+    pool = make_pool(size=1)
+    client = await pool.acquire()
+    cancelled = asyncio.ensure_future(pool.acquire())
+    waiting = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    pool.release(client)
+
+    assert await asyncio.wait_for(waiting, timeout=1) == client
+
+
+async def test_health_check_discards_unhealthy_idle_clients(make_pool):
+    async def health_check(client):
+        if client == "client-2":
+            raise ConnectionError("gone")
+        return client != "client-1"
+
+    pool = make_pool(size=3, health_check=health_check, health_interval=60)
+    pool.start()
+    await _settle()
+    assert pool.stats()["idle"] == 3
+
+    await pool.check_idle()
+    await _settle()
+
+    stats = pool.stats()
+    assert stats["discarded"] == 2
+    assert stats["idle"] == 3
+    assert "client-1" not in pool._idle
+    assert "client-2" not in pool._idle
+    assert pool.stats()["last_checked"] > 0
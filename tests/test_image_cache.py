@@ -0,0 +1,178 @@
+"""
+圖片位元組快取的行為測試
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+from src.utils import image_cache
+from src.utils.image_cache import ImageByteCache
+
+URL = "https://example.com/a.png"
+
+
+class FakeResponse:
+    def __init__(self, status, data=b"", headers=None):
+        self.status = status
+        self._data = data
+        self.headers = headers or {}
+
+    async def read(self):
+        return self._data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """記錄每次請求的標頭，依序回傳預先排好的回應"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(image_cache.time, "time", lambda: now[0])
+    return now
+
+
+async def test_fresh_entry_is_served_from_memory(session, clock):
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    session.responses.append(FakeResponse(200, b"png", {"ETag": '"v1"'}))
+
+    assert await cache.fetch(session, URL) == b"png"
+    clock[0] += 30
+    assert await cache.fetch(session, URL) == b"png"
+
+    assert len(session.requests) == 1
+    assert session.requests[0][1] == {}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["downloads"] == 1
+
+
+async def test_stale_entry_revalidates_with_etag_and_last_modified(session, clock):
+    """過期的項目帶條件式標頭重新驗證，304 時沿用原本的內容"""
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    last_modified = "Wed, 01 Oct 2025 00:00:00 GMT"
+    session.responses.append(
+        FakeResponse(200, b"png", {"ETag": '"v1"', "Last-Modified": last_modified})
+    )
+    await cache.fetch(session, URL)
+
+    clock[0] += 61
+    session.responses.append(FakeResponse(304))
+    assert await cache.fetch(session, URL) == b"png"
+    assert session.requests[1][1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": last_modified,
+    }
+    assert cache.stats()["revalidated"] == 1
+
+    # 304 會重新計算有效期限
+    clock[0] += 30
+    assert await cache.fetch(session, URL) == b"png"
+    assert len(session.requests) == 2
+
+
+async def test_changed_image_replaces_cached_bytes(session, clock):
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    session.responses.append(FakeResponse(200, b"old", {"ETag": '"v1"'}))
+    await cache.fetch(session, URL)
+
+    clock[0] += 61
+    session.responses.append(FakeResponse(200, b"new", {"ETag": '"v2"'}))
+    assert await cache.fetch(session, URL) == b"new"
+
+    clock[0] += 61
+    session.responses.append(FakeResponse(304))
+    assert await cache.fetch(session, URL) == b"new"
+    assert session.requests[2][1] == {"If-None-Match": '"v2"'}
+
+
+async def test_failed_revalidation_serves_stale_bytes(session, clock):
+    """重新驗證時發生網路錯誤或非 200 回應，沿用舊的內容"""
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    session.responses.append(FakeResponse(200, b"png"))
+    await cache.fetch(session, URL)
+
+    clock[0] += 61
+    session.responses.append(aiohttp.ClientError("boom"))
+    assert await cache.fetch(session, URL) == b"png"
+
+    session.responses.append(FakeResponse(500))
+    assert await cache.fetch(session, URL) == b"png"
+
+
+async def test_failed_download_without_cache_returns_none(session, clock):
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    session.responses.append(FakeResponse(404))
+
+    assert await cache.fetch(session, URL) is None
+    assert cache.stats()["entries"] == 0
+
+
+async def test_memory_lru_is_bounded_by_bytes(session, clock):
+    cache = ImageByteCache(max_bytes=10, max_age=60)
+    for name in ("a", "b", "c"):
+        session.responses.append(FakeResponse(200, name.encode() * 4))
+        await cache.fetch(session, f"https://example.com/{name}")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 8
+    # 最舊的 a 已被淘汰，需要重新下載
+    session.responses.append(FakeResponse(200, b"aaaa"))
+    await cache.fetch(session, "https://example.com/a")
+    assert len(session.requests) == 4
+
+    # 超過整體上限的圖片不進記憶體快取
+    session.responses.append(FakeResponse(200, b"x" * 11))
+    assert await cache.fetch(session, "https://example.com/big") == b"x" * 11
+    assert "https://example.com/big" not in cache._entries
+
+
+async def test_disk_tier_survives_restart_and_revalidates(session, clock, tmp_path):
+    disk_dir = str(tmp_path / "images")
+    cache = ImageByteCache(max_bytes=1024, max_age=60, disk_dir=disk_dir)
+    session.responses.append(FakeResponse(200, b"png", {"ETag": '"v1"'}))
+    await cache.fetch(session, URL)
+
+    restarted = ImageByteCache(max_bytes=1024, max_age=60, disk_dir=disk_dir)
+    assert await restarted.fetch(session, URL) == b"png"
+    assert len(session.requests) == 1
+
+    # 重啟後過期的項目仍保留 ETag，可以重新驗證
+    restarted = ImageByteCache(max_bytes=1024, max_age=60, disk_dir=disk_dir)
+    clock[0] += 61
+    session.responses.append(FakeResponse(304))
+    assert await restarted.fetch(session, URL) == b"png"
+    assert session.requests[1][1] == {"If-None-Match": '"v1"'}
+
+
+async def test_concurrent_fetches_of_one_url_download_once(session, clock):
+    cache = ImageByteCache(max_bytes=1024, max_age=60)
+    session.responses.append(FakeResponse(200, b"png"))
+
+    results = await asyncio.gather(*(cache.fetch(session, URL) for _ in range(5)))
+
+    assert results == [b"png"] * 5
+    assert len(session.requests) == 1
@@ -0,0 +1,177 @@
+"""
+圖片生成工作佇列的行為測試
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.image_pipeline import ImageJobQueue
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+@pytest.fixture
+async def make_queue():
+    """建立 ImageJobQueue，測試結束時關閉；參數覆寫預設值"""
+    queues = []
+
+    def factory(**options):
+        options = {"worker_count": 1, "job_timeout": 1, "background_queue_limit": 10, **options}
+        queue = ImageJobQueue(**options)
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        await queue.close()
+
+
+def _job(name, order):
+    async def run():
+        order.append(name)
+        return name
+
+    return run
+
+
+async def test_interactive_jobs_run_before_background_jobs(make_queue):
+    """worker 空出來時先處理互動工作"""
+    queue = make_queue()
+    release = asyncio.Event()
+    order = []
+
+    first = asyncio.ensure_future(queue.submit(release.wait))
+    await asyncio.sleep(0.01)
+    jobs = [
+        asyncio.ensure_future(queue.submit(_job("bg", order), PRIORITY_BACKGROUND)),
+        asyncio.ensure_future(queue.submit(_job("user", order), PRIORITY_INTERACTIVE)),
+    ]
+    await asyncio.sleep(0)
+    assert queue.queued == 2
+    assert not queue.idle
+    release.set()
+    results = await asyncio.gather(first, *jobs)
+    assert queue.idle
+
+    assert order == ["user", "bg"]
+    assert results == [True, "bg", "user"]
+
+
+async def test_timeout_and_errors_reach_the_caller(make_queue):
+    """逾時與例外傳給呼叫端，worker 繼續處理下一個工作"""
+    queue = make_queue(job_timeout=0.05)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await queue.submit(slow)
+    with pytest.raises(ValueError):
+        await queue.submit(broken)
+    assert await queue.submit(_job("ok", [])) == "ok"
+
+    assert (queue.timed_out, queue.failed, queue.completed) == (1, 1, 1)
+
+
+async def test_background_jobs_are_shed_when_queue_is_long(make_queue):
+    """佇列過長時背景工作直接返回 None，互動工作照常排隊"""
+    queue = make_queue(background_queue_limit=1)
+    release = asyncio.Event()
+
+    async def blocker():
+        await release.wait()
+        return "done"
+
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0.01)
+    queued = asyncio.ensure_future(queue.submit(blocker, PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+
+    assert await queue.submit(blocker, PRIORITY_BACKGROUND) is None
+    interactive = asyncio.ensure_future(queue.submit(blocker))
+    release.set()
+
+    assert await asyncio.gather(running, queued, interactive) == ["done"] * 3
+    assert queue.shed == 1
+
+
+async def test_cancelling_caller_cancels_running_job(make_queue):
+    """呼叫端取消時一併取消進行中的工作，worker 可以處理下一個"""
+    queue = make_queue()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    caller = asyncio.ensure_future(queue.submit(slow))
+    await asyncio.sleep(0.01)
+    assert queue.running == 1
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+
+    assert await asyncio.wait_for(queue.submit(_job("ok", [])), timeout=0.5) == "ok"
+    assert cancelled == [True]
+
+
+async def test_caller_cancelled_while_queued_is_skipped(make_queue):
+    """排隊中就取消的工作不會被執行"""
+    queue = make_queue()
+    release = asyncio.Event()
+    order = []
+
+    running = asyncio.ensure_future(queue.submit(release.wait))
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(queue.submit(_job("cancelled", order)))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    release.set()
+    await running
+
+    assert await queue.submit(_job("next", order)) == "next"
+    assert order == ["next"]
+
+
+async def test_run_blocking_uses_worker_threads(make_queue):
+    """同步呼叫在專用執行緒中執行，不佔用事件迴圈的執行緒"""
+    queue = make_queue(worker_count=2)
+
+    value, thread_name = await queue.run_blocking(
+        lambda x: (x * 2, threading.current_thread().name), 21
+    )
+
+    assert value == 42
+    assert thread_name.startswith("image-gen")
+
+
+async def test_interactive_jobs_do_not_count_toward_background_limit(make_queue):
+    """排隊中的互動工作再多，背景工作只要未超過自己的上限就照常排隊"""
+    queue = make_queue(background_queue_limit=1)
+    release = asyncio.Event()
+
+    async def blocker():
+        await release.wait()
+        return "done"
+
+    running = asyncio.ensure_future(queue.submit(blocker))
+    await asyncio.sleep(0.01)
+    interactive = [asyncio.ensure_future(queue.submit(blocker)) for _ in range(3)]
+    background = asyncio.ensure_future(queue.submit(blocker, PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    assert queue.queued == 4
+    assert queue.queued_background == 1
+
+    # 第二個背景工作超過背景工作的上限
+    assert await queue.submit(blocker, PRIORITY_BACKGROUND) is None
+    release.set()
+
+    assert await asyncio.gather(running, *interactive, background) == ["done"] * 5
+    assert queue.queued_background == 0
+    assert queue.shed == 1
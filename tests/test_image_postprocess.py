@@ -0,0 +1,149 @@
+"""
+生成圖片後處理的行為測試
+"""
+
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.utils import image_postprocess
+from src.utils.image_postprocess import (
+    PROFILES,
+    ImageProfile,
+    image_filename,
+    postprocess_image,
+    process_image,
+)
+
+
+def _png(width, height, mode="RGB", noise=False):
+    """產生測試用的 PNG；noise 為 True 時是難以壓縮的雜訊圖"""
+    if noise:
+        pixels = random.Random(0).randbytes(width * height * len(mode))
+        image = Image.frombytes(mode, (width, height), pixels)
+    else:
+        image = Image.new(mode, (width, height), (200, 80, 40, 255)[: len(mode)])
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def _open(data):
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def test_webp_output_is_resized_within_budget():
+    data = _png(1024, 768, noise=True)
+    profile = ImageProfile(max_side=512, format="WEBP", max_bytes=200 * 1024)
+
+    result = process_image(data, profile)
+    image = _open(result)
+
+    assert image.format == "WEBP"
+    assert image.size == (512, 384)
+    assert len(result) <= profile.max_bytes
+    assert len(result) < len(data)
+
+
+def test_tight_budget_lowers_quality_then_shrinks():
+    """品質降到最低仍超過預算時繼續縮小，直到符合預算"""
+    data = _png(512, 512, noise=True)
+    profile = ImageProfile(max_side=512, format="WEBP", max_bytes=20 * 1024)
+
+    result = process_image(data, profile)
+    image = _open(result)
+
+    assert len(result) <= profile.max_bytes
+    assert max(image.size) < 512
+
+
+def test_png_format_is_quantized():
+    """指定 PNG 時以減色的 PNG 輸出，並保留透明度"""
+    data = _png(600, 300, mode="RGBA", noise=True)
+    profile = ImageProfile(max_side=300, format="PNG", max_bytes=200 * 1024)
+
+    result = process_image(data, profile)
+    image = _open(result)
+
+    assert image.format == "PNG"
+    assert image.mode == "P"
+    assert image.size == (300, 150)
+    assert "transparency" in image.info or image.palette.mode == "RGBA"
+
+
+def test_avatar_profile_keeps_png():
+    profile = PROFILES["avatar"]
+    assert profile.format == "PNG"
+
+    result = process_image(_png(1024, 1024, noise=True), profile)
+    image = _open(result)
+
+    assert image.format == "PNG"
+    assert max(image.size) <= profile.max_side
+    assert len(result) <= profile.max_bytes
+
+
+def test_metadata_is_stripped():
+    source = Image.new("RGB", (64, 64), "white")
+    exif = Image.Exif()
+    exif[0x010E] = "secret description"
+    output = BytesIO()
+    source.save(output, format="JPEG", exif=exif.tobytes())
+    profile = ImageProfile(max_side=64, format="WEBP", max_bytes=100 * 1024)
+
+    image = _open(process_image(output.getvalue(), profile))
+
+    assert not image.getexif()
+    assert "exif" not in image.info
+
+
+def test_small_result_never_grows_the_image(monkeypatch):
+    """處理結果反而較大時沿用原圖"""
+    data = _png(8, 8)
+    monkeypatch.setattr(
+        image_postprocess, "_encode", lambda image, *args: b"x" * (len(data) + 1)
+    )
+    profile = ImageProfile(max_side=768, format="WEBP", max_bytes=100 * 1024)
+
+    assert process_image(data, profile) == data
+
+
+def test_unreadable_image_is_returned_unchanged():
+    assert process_image(b"not an image", PROFILES["display"]) == b"not an image"
+
+
+async def test_postprocess_image_runs_in_executor(monkeypatch):
+    data = _png(1024, 1024, noise=True)
+    monkeypatch.setattr(
+        image_postprocess, "PROFILES", {"display": ImageProfile(256, "WEBP", 100 * 1024)}
+    )
+
+    result = await postprocess_image(data)
+
+    assert _open(result).size == (256, 256)
+    assert await postprocess_image(data, profile=None) == data
+
+
+async def test_postprocess_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(image_postprocess.config, "IMAGE_POSTPROCESS_ENABLED", False)
+    data = _png(1024, 1024)
+
+    assert await postprocess_image(data) == data
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (b"\x89PNG\r\n\x1a\n", "fortune.png"),
+        (b"RIFF\0\0\0\0WEBPVP8 ", "fortune.webp"),
+        (b"\xff\xd8\xff\xe0", "fortune.jpg"),
+        (b"GIF89a", "fortune.gif"),
+        (b"unknown", "fortune.png"),
+    ],
+)
+def test_image_filename_follows_content(header, expected):
+    assert image_filename("fortune", BytesIO(header)) == expected
@@ -0,0 +1,132 @@
+"""
+生成圖片結果快取的行為測試
+"""
+
+import json
+import os
+
+import pytest
+
+from src.utils.image_result_cache import ImageResultCache
+
+MODEL = "test-model"
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "images")
+
+
+async def test_prompt_alias_skips_gen_prompt(cache_dir):
+    """保存後以原始 prompt 或最終生成 prompt 都能命中"""
+    cache = ImageResultCache(cache_dir, max_bytes=1024)
+    assert await cache.get_by_prompt(MODEL, "貓") is None
+
+    await cache.put(MODEL, "貓", "a cute cat, watercolor", b"cat")
+
+    assert await cache.get_by_prompt(MODEL, "貓") == b"cat"
+    assert await cache.get(MODEL, "貓", "a cute cat, watercolor") == b"cat"
+    assert await cache.get_by_prompt("other-model", "貓") is None
+    assert cache.stats()["prompt_hits"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+async def test_gen_prompt_hit_records_new_alias(cache_dir):
+    """不同的原始 prompt 調整成相同的生成 prompt 時，共用同一張圖片"""
+    cache = ImageResultCache(cache_dir, max_bytes=1024)
+    await cache.put(MODEL, "貓", "a cute cat", b"cat")
+
+    assert await cache.get(MODEL, "小貓", "a cute cat") == b"cat"
+    assert await cache.get_by_prompt(MODEL, "小貓") == b"cat"
+    assert await cache.get(MODEL, "狗", "a dog") is None
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": 3,
+        "prompt_hits": 1,
+        "hits": 1,
+        "misses": 1,
+    }
+
+
+async def test_eviction_removes_least_recently_used(cache_dir):
+    """超過容量上限時刪除最久未使用的圖片與指向它的 prompt"""
+    cache = ImageResultCache(cache_dir, max_bytes=10)
+    await cache.put(MODEL, "a", "gen a", b"aaaa")
+    await cache.put(MODEL, "b", "gen b", b"bbbb")
+    # 使用 a 之後，最久未使用的變成 b
+    assert await cache.get_by_prompt(MODEL, "a") == b"aaaa"
+    await cache.put(MODEL, "c", "gen c", b"cccc")
+
+    assert await cache.get_by_prompt(MODEL, "b") is None
+    assert await cache.get_by_prompt(MODEL, "a") == b"aaaa"
+    assert await cache.get_by_prompt(MODEL, "c") == b"cccc"
+    assert cache.stats()["bytes"] == 8
+    assert not os.path.exists(cache._path(cache.image_key(MODEL, "gen b")))
+
+    # 超過整體上限的圖片不保存
+    await cache.put(MODEL, "big", "gen big", b"x" * 11)
+    assert await cache.get_by_prompt(MODEL, "big") is None
+
+
+async def test_restart_keeps_aliases_and_mtime_order(cache_dir):
+    """對應表與使用順序在重啟後保留，淘汰順序依檔案修改時間"""
+    cache = ImageResultCache(cache_dir, max_bytes=10)
+    await cache.put(MODEL, "a", "gen a", b"aaaa")
+    await cache.put(MODEL, "b", "gen b", b"bbbb")
+    # 讓 b 的修改時間比 a 舊，重啟後 b 就是最久未使用的
+    path_b = cache._path(cache.image_key(MODEL, "gen b"))
+    old = os.path.getmtime(path_b) - 100
+    os.utime(path_b, (old, old))
+
+    restarted = ImageResultCache(cache_dir, max_bytes=10)
+    await restarted.load(MODEL)
+    assert restarted.stats()["entries"] == 2
+    await restarted.put(MODEL, "c", "gen c", b"cccc")
+
+    assert await restarted.get_by_prompt(MODEL, "a") == b"aaaa"
+    assert await restarted.get_by_prompt(MODEL, "b") is None
+    assert await restarted.get_by_prompt(MODEL, "c") == b"cccc"
+
+
+async def test_missing_file_and_corrupt_manifest(cache_dir):
+    """被外部刪除的圖片視為未命中；損毀的對應表不影響以生成 prompt 查詢"""
+    cache = ImageResultCache(cache_dir, max_bytes=1024)
+    await cache.put(MODEL, "a", "gen a", b"aaaa")
+    await cache.put(MODEL, "b", "gen b", b"bbbb")
+    os.remove(cache._path(cache.image_key(MODEL, "gen a")))
+    assert await cache.get_by_prompt(MODEL, "a") is None
+    assert cache.stats()["bytes"] == 4
+
+    with open(os.path.join(cache_dir, "manifest.json"), "w") as f:
+        f.write("{broken")
+    restarted = ImageResultCache(cache_dir, max_bytes=1024)
+    assert await restarted.get_by_prompt(MODEL, "b") is None
+    assert await restarted.get(MODEL, "b", "gen b") == b"bbbb"
+    assert await restarted.get_by_prompt(MODEL, "b") == b"bbbb"
+
+
+async def test_prewarm_manifest_imports_images(cache_dir, tmp_path):
+    prewarm_dir = tmp_path / "prewarm"
+    prewarm_dir.mkdir()
+    (prewarm_dir / "fortune.png").write_bytes(b"fortune")
+    manifest = prewarm_dir / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {"prompt": "大吉", "file": "fortune.png"},
+                {"prompt": "小吉", "file": "fortune.png", "gen_prompt": "small luck"},
+                {"prompt": "缺檔案", "file": "missing.png"},
+                {"file": "no-prompt.png"},
+            ],
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+
+    cache = ImageResultCache(cache_dir, max_bytes=1024, prewarm_manifest=str(manifest))
+
+    assert await cache.get_by_prompt(MODEL, "大吉") == b"fortune"
+    assert await cache.get_by_prompt(MODEL, "小吉") == b"fortune"
+    assert await cache.get(MODEL, "大吉", "大吉") == b"fortune"
+    assert await cache.get_by_prompt(MODEL, "缺檔案") is None
+    assert cache.stats()["entries"] == 2
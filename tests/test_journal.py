@@ -0,0 +1,79 @@
+"""
+用戶資料變更日誌（journal 後端）的行為測試
+"""
+
+import json
+import os
+
+from src.constants import DEFAULT_MONEY
+from src.utils.journal import UserDataJournal
+
+
+async def _add_money(manager, user_id, amount):
+    user = await manager.get_user(user_id)
+    user["money"] += amount
+    await manager.update_user_data(user_id, user)
+
+
+def test_journal_replay_is_idempotent(tmp_path):
+    """日誌記錄的是設定值，重播兩次的結果相同"""
+    journal = UserDataJournal(str(tmp_path / "users.journal"))
+    journal.append(
+        [
+            {"id": "1", "record": {"name": "a", "money": 10}},
+            {"id": "1", "set": {"money": 15}},
+            {"id": "2", "set": {"exp": 3}},
+        ]
+    )
+
+    users = {}
+    assert journal.replay(users) == 3
+    journal.replay(users)
+
+    assert users == {"1": {"name": "a", "money": 15}, "2": {"exp": 3}}
+
+
+async def test_changes_survive_restart_without_snapshot(make_manager, user_data_path):
+    """只寫入日誌、沒有寫入快照就中止時，重新載入仍能還原所有變更"""
+    manager = await make_manager(backend="journal")
+    for _ in range(5):
+        await _add_money(manager, 1, 10)
+    user = await manager.get_user(2)
+    user["pet_name"] = "小白"
+    await manager.update_user_data(2, user)
+    # 模擬當機：快照檔還沒被寫入
+    assert not os.path.exists(user_data_path)
+
+    restarted = await make_manager(backend="journal")
+
+    assert restarted.users["1"]["money"] == DEFAULT_MONEY + 50
+    assert restarted.users["2"]["pet_name"] == "小白"
+    # 重播後寫成新快照並清空日誌
+    assert os.path.exists(user_data_path)
+    assert os.path.getsize(f"{user_data_path}.journal") == 0
+
+
+async def test_torn_journal_tail_is_ignored(make_manager, user_data_path):
+    """寫到一半的最後一行被略過，之前的變更照常重播"""
+    manager = await make_manager(backend="journal")
+    await _add_money(manager, 1, 30)
+    with open(f"{user_data_path}.journal", "a", encoding="utf-8") as f:
+        f.write('{"id": "1", "set": {"money": 99')
+
+    restarted = await make_manager(backend="journal")
+
+    assert restarted.users["1"]["money"] == DEFAULT_MONEY + 30
+
+
+async def test_journal_is_compacted_into_snapshot(make_manager, user_data_path):
+    """日誌超過大小上限時寫入完整快照並清空日誌"""
+    manager = await make_manager(backend="journal", journal_max_bytes=2048)
+    for _ in range(50):
+        await _add_money(manager, 1, 1)
+
+    journal_path = f"{user_data_path}.journal"
+    assert os.path.getsize(journal_path) < 2048
+    with open(user_data_path, encoding="utf-8") as f:
+        users = json.load(f)
+    UserDataJournal(journal_path).replay(users)
+    assert users["1"]["money"] == manager.users["1"]["money"] == DEFAULT_MONEY + 50
@@ -0,0 +1,140 @@
+"""
+排行榜索引的行為測試
+"""
+
+import random
+
+import pytest
+
+from src.utils.leaderboard import LEADERBOARD_METRICS, SortedIndex
+
+
+def _money_index(users):
+    index = SortedIndex(LEADERBOARD_METRICS["money"])
+    index.rebuild(users)
+    return index
+
+
+def test_ties_are_ordered_by_user_id():
+    """同分時依用戶 ID 排序，名次依序遞增"""
+    index = _money_index({"3": {"money": 10}, "1": {"money": 10}, "2": {"money": 50}})
+
+    assert index.top(3) == ["2", "1", "3"]
+    assert [index.rank(user_id) for user_id in ("2", "1", "3")] == [1, 2, 3]
+
+
+def test_update_moves_user_and_remove_drops_it():
+    """更新分數會移動位置，移除後不再出現在排行榜"""
+    index = _money_index({"1": {"money": 10}, "2": {"money": 20}, "3": {"money": 30}})
+
+    index.update("1", {"money": 100})
+    assert index.top(3) == ["1", "3", "2"]
+
+    # 分數沒變時位置不變
+    index.update("3", {"money": 30, "name": "改名"})
+    assert index.top(3) == ["1", "3", "2"]
+
+    index.remove("3")
+    index.remove("404")
+    assert index.top(3) == ["1", "2"]
+    assert index.rank("3") is None
+    assert len(index) == 2
+
+
+def test_new_user_and_invalid_scores():
+    """新用戶插入正確的位置；缺少或無效的數值視為 0"""
+    index = _money_index({"1": {"money": 10}})
+    index.update("2", {"money": None})
+    index.update("3", {})
+    index.update("4", {"money": 5})
+
+    assert index.top(10) == ["1", "4", "2", "3"]
+
+
+def test_multi_field_score():
+    """等級排行先比等級再比經驗值"""
+    index = SortedIndex(LEADERBOARD_METRICS["exp"])
+    index.rebuild(
+        {
+            "1": {"lv": 2, "exp": 0},
+            "2": {"lv": 1, "exp": 999},
+            "3": {"lv": 2, "exp": 50},
+        }
+    )
+
+    assert index.top(3) == ["3", "1", "2"]
+
+
+def test_incremental_updates_match_full_sort():
+    """隨機的更新與移除之後，結果與重新排序所有用戶相同"""
+    rng = random.Random(7)
+    users = {str(i): {"money": rng.randrange(20)} for i in range(50)}
+    index = _money_index(users)
+
+    for _ in range(500):
+        user_id = str(rng.randrange(60))
+        if rng.random() < 0.1:
+            users.pop(user_id, None)
+            index.remove(user_id)
+        else:
+            users[user_id] = {"money": rng.randrange(20)}
+            index.update(user_id, users[user_id])
+
+    expected = sorted(users, key=lambda user_id: (-users[user_id]["money"], user_id))
+    assert index.top(len(users)) == expected
+    assert all(index.rank(user_id) == rank for rank, user_id in enumerate(expected, 1))
+
+
+async def test_manager_leaderboard_follows_updates(make_manager):
+    """UserDataManager 的排行榜隨 incr / set_fields 更新，重新載入後相同"""
+    manager = await make_manager()
+    for user_id in (1, 2, 3):
+        await manager.set_fields(user_id, money=user_id * 10)
+    await manager.incr(1, money=100)
+    await manager.set_fields(3, money=0)
+
+    assert [user_id for user_id, _ in manager.get_top_users("money", 3)] == ["1", "2", "3"]
+    await manager.close()
+
+    restarted = await make_manager()
+    assert [user_id for user_id, _ in restarted.get_top_users("money", 3)] == ["1", "2", "3"]
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_rank_of_after_incr_and_set_fields(make_manager, write_behind):
+    """rank_of 立即反映 incr / set_fields 的結果（寫回模式下也不必等寫檔）"""
+    manager = await make_manager(write_behind=write_behind, flush_interval=60)
+    for user_id in (1, 2, 3):
+        await manager.set_fields(user_id, money=100)
+
+    # 同分時依用戶 ID
+    assert [manager.rank_of(user_id, "money") for user_id in (1, 2, 3)] == [1, 2, 3]
+
+    await manager.incr(3, money=1)
+    assert manager.rank_of(3, "money") == 1
+    assert manager.rank_of("1", "money") == 2
+
+    await manager.set_fields(3, money=0)
+    assert manager.rank_of(3, "money") == 3
+
+    await manager.incr(2, exp=5)
+    assert manager.rank_of(2, "exp") == 1
+    assert manager.rank_of(404, "money") is None
+    with pytest.raises(KeyError):
+        manager.rank_of(1, "unknown")
+
+
+async def test_pet_affection_ranking_matches_indexed_values(make_manager):
+    """寵物好感度排行榜的名次與返回的 pet_affection 數值一致（排行榜顯示的就是此數值）"""
+    manager = await make_manager()
+    for user_id, affection in ((1, 5), (2, 30), (3, 12)):
+        await manager.set_fields(user_id, pet_name=f"寵物{user_id}", pet_affection=affection)
+    await manager.set_fields(1, pet_affection=40)
+    await manager.incr(3, pet_affection=-12)
+
+    top = manager.get_top_users("pet_affection", 3)
+
+    assert [user_id for user_id, _ in top] == ["1", "2", "3"]
+    values = [record["pet_affection"] for _, record in top]
+    assert values == sorted(values, reverse=True) == [40, 30, 0]
+    assert manager.rank_of(1, "pet_affection") == 1
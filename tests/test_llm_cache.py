@@ -0,0 +1,137 @@
+"""
+LLM 回應快取的行為測試
+"""
+
+import asyncio
+import os
+import types
+
+import pytest
+
+from src.utils import llm_cache
+from src.utils.llm_cache import LLMResponseCache, make_cache_key, normalize_prompt
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動前進的時鐘，取代快取模組使用的 time.time"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_prompts_are_normalized_before_hashing():
+    """空白差異不影響快取鍵，模型與內容不同時鍵也不同；圖片等內容不快取"""
+    assert normalize_prompt("  hello \n  world ") == "hello world"
+    assert make_cache_key("m", "hello  world") == make_cache_key("m", " hello world\n")
+    assert make_cache_key("m", "hello") != make_cache_key("other", "hello")
+    assert make_cache_key("m", ["a", "b"]) != make_cache_key("m", "a b")
+    assert make_cache_key("m", ["text", object()]) is None
+
+
+async def test_lru_evicts_least_recently_used(clock):
+    """超過數量上限時淘汰最久未使用的項目"""
+    cache = LLMResponseCache(max_entries=2, ttl=60)
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    assert await cache.get("a") == "A"
+    await cache.set("c", "C")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "A"
+    assert await cache.get("c") == "C"
+
+
+async def test_entries_expire_after_ttl(clock):
+    """過期的項目視為未命中；個別呼叫可指定較長的 TTL"""
+    cache = LLMResponseCache(max_entries=10, ttl=60)
+    await cache.set("short", "S")
+    await cache.set("long", "L", ttl=600)
+
+    clock[0] += 61
+    assert await cache.get("short") is None
+    assert await cache.get("long") == "L"
+
+    clock[0] += 600
+    assert await cache.get("long") is None
+
+
+async def test_hit_and_miss_counters(clock):
+    """記錄命中、磁碟命中與未命中次數"""
+    cache = LLMResponseCache(max_entries=10, ttl=60)
+    await cache.get("a")
+    await cache.set("a", "A")
+    await cache.get("a")
+    await cache.get("a")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["disk_hits"]) == (2, 1, 0)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    assert stats["entries"] == 1
+
+
+async def test_disk_tier_survives_restart(tmp_path, clock):
+    """磁碟層的項目在重新建立快取後仍可命中，過期後被刪除"""
+    disk_dir = str(tmp_path / "llm_cache")
+    cache = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    await cache.set("a", "回應")
+
+    restarted = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    assert await restarted.get("a") == "回應"
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock[0] += 61
+    fresh = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    assert await fresh.get("a") is None
+    assert os.listdir(disk_dir) == []
+
+
+async def test_corrupt_disk_entry_is_discarded(tmp_path, clock):
+    """無法解析的快取檔視為未命中並刪除"""
+    disk_dir = str(tmp_path / "llm_cache")
+    cache = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    with open(os.path.join(disk_dir, "a.json"), "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    assert await cache.get("a") is None
+    assert os.listdir(disk_dir) == []
+
+
+async def test_disk_prune_uses_each_entry_expiry(tmp_path, clock):
+    """清理磁碟層時依各項目自己的過期時間，而不是預設 TTL"""
+    disk_dir = str(tmp_path / "llm_cache")
+    cache = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    await cache.set("short", "S")
+    await cache.set("long", "L", ttl=600)
+
+    clock[0] += 61
+    cache._prune_disk()
+
+    assert sorted(os.listdir(disk_dir)) == ["long.json"]
+    restarted = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    assert await restarted.get("long") == "L"
+
+
+async def test_disk_prune_caps_entry_count(tmp_path, clock):
+    """數量超過上限時先刪除最快過期的項目"""
+    disk_dir = str(tmp_path / "llm_cache")
+    cache = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir, disk_max_entries=2)
+    await cache.set("a", "A", ttl=300)
+    await cache.set("b", "B", ttl=100)
+    await cache.set("c", "C", ttl=200)
+
+    cache._prune_disk()
+
+    assert sorted(os.listdir(disk_dir)) == ["a.json", "c.json"]
+
+
+async def test_disk_writes_leave_no_temporary_files(tmp_path, clock):
+    """同一個鍵同時寫入時各自使用暫存檔，完成後只留下一個快取檔"""
+    disk_dir = str(tmp_path / "llm_cache")
+    cache = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+
+    await asyncio.gather(*(cache.set("a", f"回應{i}") for i in range(10)))
+
+    assert os.listdir(disk_dir) == ["a.json"]
+    restarted = LLMResponseCache(max_entries=10, ttl=60, disk_dir=disk_dir)
+    assert (await restarted.get("a")).startswith("回應")
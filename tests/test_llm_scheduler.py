@@ -0,0 +1,145 @@
+"""
+LLM 請求排程器的行為測試
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.utils.llm_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    is_rate_limit_error,
+)
+
+
+@pytest.fixture
+def scheduler():
+    """不限速率、同時只放行一個請求的排程器"""
+    return LLMScheduler(
+        rate_per_minute=0,
+        burst=1,
+        max_concurrency=1,
+        background_queue_limit=1,
+        backoff_base=0.05,
+        backoff_max=0.2,
+    )
+
+
+async def test_interactive_requests_jump_the_queue(scheduler):
+    """名額釋出時先放行互動請求，同優先順序先到先得"""
+    scheduler.background_queue_limit = 10
+    order = []
+
+    async def request(name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+        scheduler.release()
+
+    assert await scheduler.acquire()
+    tasks = [
+        asyncio.ensure_future(request("bg1", PRIORITY_BACKGROUND)),
+        asyncio.ensure_future(request("bg2", PRIORITY_BACKGROUND)),
+        asyncio.ensure_future(request("chat", PRIORITY_INTERACTIVE)),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["chat", "bg1", "bg2"]
+
+
+async def test_background_requests_are_shed_when_queue_is_long(scheduler):
+    """背景請求排隊過長時直接返回 False，互動請求不受影響"""
+    assert await scheduler.acquire()
+    queued = asyncio.ensure_future(scheduler.acquire(PRIORITY_BACKGROUND))
+    interactive = asyncio.ensure_future(scheduler.acquire(PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+
+    assert await scheduler.acquire(PRIORITY_BACKGROUND) is False
+    stats = scheduler.stats()
+    assert stats["shed"] == 1
+    assert stats["queued"] == 2
+
+    scheduler.release()
+    assert await interactive
+    scheduler.release()
+    assert await queued
+    scheduler.release()
+
+
+async def test_cancelled_waiter_returns_its_slot(scheduler):
+    """剛被放行就被取消的請求會歸還名額，不會讓排程器卡住"""
+    assert await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await asyncio.sleep(0)
+
+    # 放行與取消發生在同一輪事件迴圈
+    scheduler.release()
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    assert scheduler.stats()["active"] == 0
+    assert await asyncio.wait_for(scheduler.acquire(), timeout=1)
+
+
+async def test_token_bucket_limits_rate_after_burst():
+    """突發額度用完後，依速率等待下一個令牌"""
+    # 每秒 10 個令牌，突發 2 個
+    scheduler = LLMScheduler(
+        rate_per_minute=600,
+        burst=2,
+        max_concurrency=5,
+        background_queue_limit=10,
+        backoff_base=1,
+        backoff_max=1,
+    )
+    start = time.monotonic()
+    for _ in range(2):
+        await scheduler.acquire()
+        scheduler.release()
+    burst_elapsed = time.monotonic() - start
+    await scheduler.acquire()
+    scheduler.release()
+
+    assert burst_elapsed < 0.05
+    assert time.monotonic() - start >= 0.08
+
+
+async def test_rate_limit_pauses_with_exponential_backoff(scheduler):
+    """收到 429 時暫停送出，連續發生時暫停時間加倍，成功後重設"""
+    scheduler.report_rate_limited()
+    first_pause = scheduler.stats()["paused_for"]
+    scheduler.report_rate_limited()
+    second_pause = scheduler.stats()["paused_for"]
+
+    start = time.monotonic()
+    await scheduler.acquire()
+    scheduler.release()
+    waited = time.monotonic() - start
+
+    scheduler.report_success()
+    scheduler.report_rate_limited()
+
+    assert 0 < first_pause <= 0.05
+    assert 0.05 < second_pause <= 0.1
+    assert waited >= 0.05
+    assert scheduler.stats()["rate_limited"] == 3
+    assert scheduler.stats()["paused_for"] <= 0.05
+
+
+def test_rate_limit_errors_are_recognized():
+    """以狀態碼、例外名稱或訊息判斷 429"""
+
+    class ResourceExhausted(Exception):
+        pass
+
+    error_with_code = Exception("quota")
+    error_with_code.code = 429
+
+    assert is_rate_limit_error(error_with_code)
+    assert is_rate_limit_error(ResourceExhausted("quota"))
+    assert is_rate_limit_error(RuntimeError("HTTP 429 Too Many Requests"))
+    assert not is_rate_limit_error(RuntimeError("HTTP 500"))
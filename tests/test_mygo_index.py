@@ -0,0 +1,222 @@
+"""
+MyGO 台詞檢索索引的行為測試
+"""
+
+import json
+import os
+
+import pytest
+
+from src.utils.mygo_index import (
+    MmapQuoteIndex,
+    QuoteIndex,
+    build_quote_index,
+    char_ngrams,
+    edit_distance,
+    load_quotes,
+    normalize_text,
+    write_artifact,
+)
+
+QUOTES = [
+    {"alt": "為什麼要演奏春日影", "url": "a.webp"},
+    {"alt": "我想成為人類", "url": "b.webp"},
+    {"alt": "為什麼要演奏春日影", "url": "c.webp"},
+    {"alt": "一輩子，要跟我組一輩子的樂團嗎？", "url": "d.webp"},
+    {"alt": "妳全身都濕透了，沒事吧", "url": "e.webp"},
+    {"alt": "Ave Mujica", "url": "f.webp"},
+    "損毀的項目",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_quote_index(QUOTES)
+
+
+def test_normalize_text():
+    """全形轉半形、英文小寫、簡體轉繁體，並去除空白與標點"""
+    assert normalize_text("为什么要演奏春日影？") == "為什麼要演奏春日影"
+    assert normalize_text("ＡＶＥ　Mujica!") == "avemujica"
+    assert normalize_text("妳好，裏面") == "你好裡面"
+    assert normalize_text("？！ ") == ""
+
+
+def test_char_ngrams_split_normalized_text():
+    """切成單字與相鄰雙字"""
+    assert char_ngrams("春日影") == ["春", "日", "影", "春日", "日影"]
+    assert char_ngrams(normalize_text("Ab c")) == ["a", "b", "c", "ab", "bc"]
+    assert char_ngrams("") == []
+
+
+def test_edit_distance():
+    assert edit_distance("春日影", "春日影") == 0
+    assert edit_distance("春日影", "春影") == 1
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "abc") == 3
+
+
+def test_doc_ids_follow_quote_positions(index):
+    """台詞編號與原始清單的位置相同，無效的項目以空字串占位"""
+    assert len(index) == len(QUOTES)
+    assert index.texts[3] == QUOTES[3]["alt"]
+    assert index.texts[-1] == ""
+
+
+def test_bm25_ranks_closest_quote_first(index):
+    """與查詢最相近的台詞分數最高，完全無關的查詢沒有結果"""
+    assert index.bm25("一輩子的樂團", limit=3)[0][1] == 3
+    assert index.bm25("濕透了", limit=3)[0][1] == 4
+    assert index.bm25("ave", limit=1)[0][1] == 5
+    assert index.bm25("ㄅㄆㄇ", limit=3) == []
+
+
+def test_find_exact_matches_normalized_substrings(index):
+    """包含關鍵字的台詞都會找到，不受簡繁、全半形與標點影響"""
+    assert index.find_exact("春日影") == [0, 2]
+    assert index.find_exact("为什么") == [0, 2]
+    assert index.find_exact("ＡＶＥ") == [5]
+    assert index.find_exact("濕透了！") == [4]
+    assert index.find_exact("人") == [1]
+    assert index.find_exact("春日影子") == []
+    assert index.find_exact("   ") == []
+
+
+def test_find_exact_punctuation_only_query_matches_raw_text(index):
+    """只有標點的關鍵字直接比對原文"""
+    assert index.find_exact("？") == [3]
+    assert index.find_exact("……") == []
+
+
+def test_search_scores_and_order(index):
+    """包含關鍵字的分數為 1，相近的台詞依相似度排序，無關的查詢沒有結果"""
+    results = index.search("春日影")
+    assert results[:2] == [(1.0, 0), (1.0, 2)]
+
+    score, doc_id = index.search("我想成為人")[0]
+    assert (score, doc_id) == (1.0, 1)
+
+    # 錯一個字仍然是最相近的台詞，但分數低於 1
+    score, doc_id = index.search("我想變成人類")[0]
+    assert doc_id == 1
+    assert 0.6 <= score < 1.0
+
+    assert index.search("ㄅㄆㄇ") == []
+    assert index.search("？！") == []
+
+
+def test_search_threshold_separates_typos_from_unrelated_queries(index):
+    """預設門檻 0.6：錯字仍能命中，只共用少數字的查詢則低於門檻"""
+    typo = index.search("為甚麼要演奏春日影")[0]
+    assert typo[1] in (0, 2)
+    assert typo[0] >= 0.6
+
+    loose = index.search("樂團練習")
+    assert loose and loose[0][0] < 0.6
+
+
+def test_search_respects_limit(index):
+    assert len(index.search("為什麼要演奏春日影", limit=1)) == 1
+
+
+def test_shortlist_removes_duplicates_and_respects_limit(index):
+    """候選清單不包含重複的台詞，數量不超過上限"""
+    shortlist = index.shortlist("為什麼要演奏春日影", limit=2)
+
+    assert shortlist[0] == "為什麼要演奏春日影"
+    assert len(shortlist) == 2
+    assert len(set(shortlist)) == 2
+
+
+def test_each_quote_is_in_its_own_shortlist():
+    """以台詞本身查詢時，候選清單一定包含該台詞"""
+    texts = [f"第{i}句台詞，內容編號{i * 7}" for i in range(200)]
+    index = QuoteIndex(texts)
+
+    for text in texts[::13]:
+        assert text in index.shortlist(text, limit=5)
+
+
+# ===== 預先編譯的索引檔 =====
+
+QUERIES = ["春日影", "为什么", "ＡＶＥ", "濕透了！", "人", "我想變成人類", "一輩子的樂團", "？", "ㄅㄆㄇ"]
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = str(tmp_path / "mygo.idx")
+    write_artifact(QUOTES, path)
+    return path
+
+
+def test_mmap_index_matches_in_memory_index(index, artifact):
+    """mmap 索引的 find_exact、search 與 shortlist 結果與記憶體中的索引相同"""
+    mapped = MmapQuoteIndex(artifact)
+
+    assert len(mapped) == len(index)
+    assert list(mapped.texts) == list(index.texts)
+    for query in QUERIES:
+        assert mapped.find_exact(query) == index.find_exact(query), query
+        assert mapped.search(query) == index.search(query), query
+        assert mapped.shortlist(query, limit=3) == index.shortlist(query, limit=3), query
+
+
+def test_mmap_quote_table_matches_json(artifact):
+    """mmap 的台詞表與 JSON 的 {"url", "alt"} 項目相同，無效的項目為空字串"""
+    quotes = MmapQuoteIndex(artifact).quotes
+
+    assert len(quotes) == len(QUOTES)
+    assert quotes[1] == QUOTES[1]
+    assert quotes[-1] == {"url": "", "alt": ""}
+    with pytest.raises(IndexError):
+        quotes[len(QUOTES)]
+
+
+def test_mmap_rejects_invalid_artifact(tmp_path):
+    path = tmp_path / "broken.idx"
+    path.write_bytes(b"not an index" * 10)
+
+    with pytest.raises(ValueError):
+        MmapQuoteIndex(str(path))
+
+
+def _write_json(path, quotes):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(quotes, f, ensure_ascii=False)
+
+
+def test_load_quotes_uses_fresh_artifact(tmp_path):
+    json_path = str(tmp_path / "mygo.json")
+    artifact_path = str(tmp_path / "mygo.idx")
+    _write_json(json_path, QUOTES)
+    write_artifact(QUOTES, artifact_path)
+
+    quotes, index = load_quotes(json_path, artifact_path)
+
+    assert isinstance(index, MmapQuoteIndex)
+    assert quotes[0] == QUOTES[0]
+
+
+def test_load_quotes_rebuilds_when_artifact_is_stale(tmp_path):
+    """JSON 比索引檔新時不使用舊的索引檔，改從 JSON 重新建立"""
+    json_path = str(tmp_path / "mygo.json")
+    artifact_path = str(tmp_path / "mygo.idx")
+    write_artifact(QUOTES, artifact_path)
+    updated = QUOTES[:2] + [{"alt": "新的台詞", "url": "g.webp"}]
+    _write_json(json_path, updated)
+    stale = os.path.getmtime(json_path) - 10
+    os.utime(artifact_path, (stale, stale))
+
+    quotes, index = load_quotes(json_path, artifact_path)
+
+    assert not isinstance(index, MmapQuoteIndex)
+    assert quotes == updated
+    assert index.find_exact("新的") == [2]
+
+
+def test_load_quotes_without_files(tmp_path):
+    quotes, index = load_quotes(str(tmp_path / "none.json"), str(tmp_path / "none.idx"))
+
+    assert quotes == []
+    assert index.find_exact("春日影") == []
+    assert index.search("春日影") == []
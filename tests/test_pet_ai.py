@@ -0,0 +1,127 @@
+"""
+寵物行為敘述微批次生成的行為測試
+"""
+
+import asyncio
+import json
+import re
+
+import pytest
+
+from src import config
+from src.utils import pet_ai
+from src.utils.pet_ai import PetAIGenerator
+
+
+class FakeLLM:
+    """取代 generate_text：依 prompt 判斷是批次還是個別生成"""
+
+    def __init__(self, batch_response):
+        self.batch_response = batch_response
+        self.batch_prompts = []
+        self.single_names = []
+
+    async def __call__(self, prompt, **kwargs):
+        await asyncio.sleep(0)
+        if 'id: "' in prompt:
+            self.batch_prompts.append(prompt)
+            if isinstance(self.batch_response, Exception):
+                raise self.batch_response
+            return self.batch_response(re.findall(r'id: "([^"]+)"', prompt))
+        name = re.search(r"名叫「(.+?)」", prompt).group(1)
+        self.single_names.append(name)
+        return f"single:{name}"
+
+
+@pytest.fixture(autouse=True)
+def fast_batches(monkeypatch):
+    monkeypatch.setattr(config, "PET_BEHAVIOR_BATCH_WINDOW", 0.01)
+    monkeypatch.setattr(config, "PET_BEHAVIOR_BATCH_SIZE", 10)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """以指定的批次回應建立 FakeLLM 並取代 pet_ai.generate_text"""
+
+    def install(batch_response):
+        llm = FakeLLM(batch_response)
+        monkeypatch.setattr(pet_ai, "generate_text", llm)
+        return llm
+
+    return install
+
+
+async def _describe(names, pet_ids=None):
+    generator = PetAIGenerator()
+    pet_ids = pet_ids or [None] * len(names)
+    return await asyncio.gather(
+        *(
+            generator.generate_pet_behavior_description(name, "活潑", "dance", pet_id)
+            for name, pet_id in zip(names, pet_ids)
+        )
+    )
+
+
+async def test_requests_in_window_share_one_prompt(fake_llm):
+    """同一個時間窗內的請求合併成一次生成，結果依 id 對應回各自的請求"""
+    llm = fake_llm(lambda ids: json.dumps({key: f"batch:{key}" for key in ids}))
+
+    results = await _describe(["小白", "小黑", "小花"], pet_ids=[11, 22, 33])
+
+    assert len(llm.batch_prompts) == 1
+    assert llm.single_names == []
+    assert results == ["batch:11", "batch:22", "batch:33"]
+
+
+async def test_missing_and_invalid_entries_fall_back(fake_llm):
+    """批次回應缺少或無效的項目個別重新生成，其餘沿用批次結果"""
+    llm = fake_llm(
+        lambda ids: json.dumps({ids[0]: "batch:first", ids[1]: "  ", "bogus": "x"})
+    )
+
+    results = await _describe(["小白", "小黑", "小花"])
+
+    assert len(llm.batch_prompts) == 1
+    assert sorted(llm.single_names) == ["小花", "小黑"]
+    assert results == ["batch:first", "single:小黑", "single:小花"]
+
+
+@pytest.mark.parametrize(
+    "batch_response",
+    [lambda ids: "這不是 JSON", lambda ids: "", lambda ids: "[1, 2]", RuntimeError("boom")],
+    ids=["not-json", "empty", "not-object", "error"],
+)
+async def test_unusable_batch_falls_back_for_every_pet(fake_llm, batch_response):
+    """批次回應無法解析或生成失敗時，每隻寵物都改為個別生成"""
+    fake_llm(batch_response)
+
+    assert await _describe(["小白", "小黑"]) == ["single:小白", "single:小黑"]
+
+
+async def test_fenced_json_and_duplicate_ids(fake_llm):
+    """可解析包在 ``` 區塊中的 JSON；重複的 pet_id 會分配不同的鍵"""
+    llm = fake_llm(
+        lambda ids: "```json\n" + json.dumps({key: f"batch:{key}" for key in ids}) + "\n```"
+    )
+
+    results = await _describe(["小白", "小黑"], pet_ids=[7, 7])
+
+    assert llm.single_names == []
+    assert results == ["batch:7", "batch:7#1"]
+
+
+async def test_single_request_skips_batch_prompt(fake_llm):
+    """時間窗內只有一個請求時直接個別生成"""
+    llm = fake_llm(lambda ids: pytest.fail("不應送出批次 prompt"))
+
+    assert await _describe(["小白"]) == ["single:小白"]
+    assert llm.batch_prompts == []
+
+
+async def test_full_batch_flushes_without_waiting(fake_llm, monkeypatch):
+    """收集到 PET_BEHAVIOR_BATCH_SIZE 個請求時立即送出，不等時間窗結束"""
+    monkeypatch.setattr(config, "PET_BEHAVIOR_BATCH_WINDOW", 60)
+    monkeypatch.setattr(config, "PET_BEHAVIOR_BATCH_SIZE", 2)
+    fake_llm(lambda ids: json.dumps({key: "ok" for key in ids}))
+
+    assert await asyncio.wait_for(_describe(["小白", "小黑"]), timeout=1) == ["ok", "ok"]
@@ -0,0 +1,97 @@
+"""
+逐步更新的訊息與長訊息切割的行為測試
+"""
+
+import pytest
+
+from src.utils.progressive_message import ProgressiveMessage, split_message
+
+
+class FakeChannel:
+    """記錄送出與編輯的訊息；每則訊息以其在 messages 中的位置代表"""
+
+    def __init__(self):
+        self.messages = []
+        self.edits = 0
+
+    async def send(self, content):
+        self.messages.append(content)
+        return len(self.messages) - 1
+
+    async def edit(self, message, content):
+        self.messages[message] = content
+        self.edits += 1
+
+
+@pytest.fixture
+def channel():
+    return FakeChannel()
+
+
+def test_split_prefers_newlines_then_spaces():
+    """優先在換行處切開，其次是空白，都沒有時直接切斷"""
+    assert split_message("aaaaaa\nbb cccc", limit=10) == ["aaaaaa\n", "bb cccc"]
+    assert split_message("aaaa bbbb cccc", limit=10) == ["aaaa bbbb ", "cccc"]
+    assert split_message("a" * 25, limit=10) == ["a" * 10, "a" * 10, "a" * 5]
+    assert split_message("", limit=10) == []
+
+
+def test_split_parts_fit_and_reassemble():
+    """每段都不超過上限，接起來與原文相同"""
+    text = "\n".join(f"第 {i} 行：" + "字" * (i % 37) for i in range(300))
+    parts = split_message(text)
+
+    assert all(len(part) <= 2000 for part in parts)
+    assert "".join(parts) == text
+
+
+async def test_edits_are_throttled(channel):
+    """第一段立即送出，之後在間隔內不編輯，finish 時顯示完整內容"""
+    reply = ProgressiveMessage(channel.send, channel.edit, edit_interval=60)
+    for chunk in ("你好", "，", "今天", "天氣很好"):
+        await reply.append(chunk)
+
+    assert channel.messages == ["你好"]
+    assert channel.edits == 0
+
+    await reply.finish()
+    assert channel.messages == ["你好，今天天氣很好"]
+    assert channel.edits == 1
+
+
+async def test_edits_follow_interval(channel):
+    """間隔為 0 時每段新文字都會更新訊息，內容沒變時不重複編輯"""
+    reply = ProgressiveMessage(channel.send, channel.edit, edit_interval=0)
+    await reply.consume(_stream(["a", "b", "c"]))
+
+    assert channel.messages == ["abc"]
+    assert channel.edits == 2
+
+
+async def test_long_stream_overflows_into_new_messages(channel):
+    """超過字元上限時定稿目前的訊息，剩下的文字接續到新訊息"""
+    reply = ProgressiveMessage(channel.send, channel.edit, edit_interval=60, limit=10)
+    text = "one two three four five six seven"
+    await reply.consume(_stream(text[i : i + 4] for i in range(0, len(text), 4)))
+
+    assert len(channel.messages) == 4
+    assert all(len(message) <= 10 for message in channel.messages)
+    assert "".join(channel.messages) == text
+    assert reply.message_count == 4
+
+
+async def test_whitespace_is_not_sent_and_suffix_is_appended(channel):
+    """只有空白時不送出訊息；finish 可附加結尾文字"""
+    reply = ProgressiveMessage(channel.send, channel.edit, edit_interval=0)
+    await reply.append("  \n")
+    assert channel.messages == []
+    assert not reply.has_content
+
+    await reply.append("回應")
+    await reply.finish("……（回應中斷了）")
+    assert channel.messages == ["  \n回應……（回應中斷了）"]
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
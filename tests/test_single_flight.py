@@ -0,0 +1,131 @@
+"""
+請求合併（SingleFlight）的行為測試
+"""
+
+import asyncio
+
+import pytest
+
+from src.utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from src.utils.single_flight import SingleFlight
+
+
+@pytest.fixture
+def flight():
+    return SingleFlight()
+
+
+async def test_identical_requests_run_once(flight):
+    """相同鍵的並行請求只執行一次並共用結果，不同鍵各自執行"""
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"result:{key}"
+
+    results = await asyncio.gather(
+        *(flight.run("a", lambda: work("a")) for _ in range(5)),
+        flight.run("b", lambda: work("b")),
+    )
+
+    assert calls == ["a", "b"]
+    assert results == ["result:a"] * 5 + ["result:b"]
+    assert flight.coalesced == 4
+    assert len(flight) == 0
+
+
+async def test_error_is_shared_and_key_is_released(flight):
+    """例外傳給所有等待者；完成後同一個鍵會重新執行"""
+    attempts = []
+
+    async def failing():
+        attempts.append("fail")
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def succeeding():
+        attempts.append("ok")
+        return "ok"
+
+    results = await asyncio.gather(
+        *(flight.run("k", failing) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await flight.run("k", succeeding) == "ok"
+    assert attempts == ["fail", "ok"]
+
+
+async def test_cancelled_caller_does_not_cancel_shared_work(flight):
+    """其中一個呼叫端被取消時，其他呼叫端仍拿到結果"""
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return 42
+
+    first = asyncio.ensure_future(flight.run("k", work))
+    second = asyncio.ensure_future(flight.run("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == 42
+
+
+async def test_interactive_caller_does_not_join_background_flight(flight):
+    """背景請求可能被排程器放棄，互動請求不加入，而是另外執行"""
+    release = asyncio.Event()
+    calls = []
+
+    async def work(name, result):
+        calls.append(name)
+        await release.wait()
+        return result
+
+    # 背景請求被放棄時返回 None
+    background = asyncio.ensure_future(
+        flight.run("k", lambda: work("background", None), PRIORITY_BACKGROUND)
+    )
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(
+        flight.run("k", lambda: work("interactive", "ok"), PRIORITY_INTERACTIVE)
+    )
+    await asyncio.sleep(0)
+    assert len(flight) == 2
+    release.set()
+
+    assert await background is None
+    assert await interactive == "ok"
+    assert calls == ["background", "interactive"]
+    assert flight.coalesced == 0
+    assert len(flight) == 0
+
+
+async def test_background_caller_joins_interactive_flight(flight):
+    """背景請求可以加入優先順序較高的進行中請求"""
+    release = asyncio.Event()
+    calls = []
+
+    async def work(name):
+        calls.append(name)
+        await release.wait()
+        return name
+
+    interactive = asyncio.ensure_future(
+        flight.run("k", lambda: work("interactive"), PRIORITY_INTERACTIVE)
+    )
+    await asyncio.sleep(0)
+    background = asyncio.ensure_future(
+        flight.run("k", lambda: work("background"), PRIORITY_BACKGROUND)
+    )
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(interactive, background) == ["interactive"] * 2
+    assert calls == ["interactive"]
+    assert flight.coalesced == 1
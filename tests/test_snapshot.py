@@ -0,0 +1,84 @@
+"""
+原子性快照寫入與損毀復原的行為測試
+"""
+
+import glob
+import json
+import os
+
+import pytest
+
+from src.utils.snapshot import (
+    load_json_snapshot,
+    submit_json_snapshot,
+    write_json_snapshot,
+)
+
+
+def _corrupt(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"1": {"money": ')
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "data.json")
+
+
+def test_snapshot_rotates_generations(snapshot_path):
+    """每次寫入都把舊快照往後移一代，只保留指定的代數"""
+    for version in range(4):
+        write_json_snapshot(snapshot_path, {"version": version}, generations=2)
+
+    assert load_json_snapshot(snapshot_path, generations=2) == {"version": 3}
+    for generation, version in ((1, 2), (2, 1)):
+        with open(f"{snapshot_path}.{generation}", encoding="utf-8") as f:
+            assert json.load(f) == {"version": version}
+    assert not os.path.exists(f"{snapshot_path}.3")
+    assert not os.path.exists(f"{snapshot_path}.tmp")
+
+
+def test_corrupt_latest_snapshot_falls_back_to_previous(snapshot_path):
+    """最新快照損毀時讀取上一代"""
+    write_json_snapshot(snapshot_path, {"version": 1}, generations=2)
+    write_json_snapshot(snapshot_path, {"version": 2}, generations=2)
+    _corrupt(snapshot_path)
+
+    assert load_json_snapshot(snapshot_path, generations=2) == {"version": 1}
+
+
+def test_all_snapshots_corrupt_or_missing(snapshot_path):
+    """所有快照都損毀時拋出 JSONDecodeError，都不存在時拋出 FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        load_json_snapshot(snapshot_path, generations=2)
+
+    write_json_snapshot(snapshot_path, {"version": 1}, generations=2)
+    write_json_snapshot(snapshot_path, {"version": 2}, generations=2)
+    _corrupt(snapshot_path)
+    _corrupt(f"{snapshot_path}.1")
+    with pytest.raises(json.JSONDecodeError):
+        load_json_snapshot(snapshot_path, generations=2)
+
+
+def test_submitted_snapshot_is_built_in_writer_thread(snapshot_path):
+    """submit_json_snapshot 在背景執行緒中產生資料並寫入"""
+    future = submit_json_snapshot(snapshot_path, lambda: {"pets": [1, 2]}, generations=1)
+    future.result(timeout=5)
+
+    assert load_json_snapshot(snapshot_path, generations=1) == {"pets": [1, 2]}
+
+
+async def test_user_data_recovers_from_backup_snapshot(make_manager, user_data_path):
+    """用戶資料檔損毀時從備份快照載入；完全無法讀取時隔離原檔並以空資料開始"""
+    write_json_snapshot(user_data_path, {"1": {"name": "a", "money": 10}})
+    write_json_snapshot(user_data_path, {"1": {"name": "a", "money": 20}})
+    _corrupt(user_data_path)
+
+    manager = await make_manager(backend="json")
+    assert manager.users["1"]["money"] == 10
+
+    for candidate in glob.glob(f"{user_data_path}*"):
+        _corrupt(candidate)
+    manager = await make_manager(backend="json")
+    assert manager.users == {}
+    assert glob.glob(f"{user_data_path}.corrupt-*")
@@ -0,0 +1,23 @@
+"""
+風格轉換 Webhook 訊息 URL 的行為測試
+"""
+
+import pytest
+
+from src.cogs.style_transfer import webhook_message_url
+
+BASE = "https://discord.com/api/webhooks/123/token"
+
+
+@pytest.mark.parametrize(
+    "webhook_url, expected",
+    [
+        (BASE, f"{BASE}/messages/42"),
+        (f"{BASE}/", f"{BASE}/messages/42"),
+        (f"{BASE}?thread_id=7", f"{BASE}/messages/42?thread_id=7"),
+        (f"{BASE}/?thread_id=7&wait=true", f"{BASE}/messages/42?thread_id=7&wait=true"),
+    ],
+)
+def test_message_url_keeps_query_string(webhook_url, expected):
+    """訊息路徑接在 Webhook 路徑之後，查詢字串與結尾斜線不影響結果"""
+    assert webhook_message_url(webhook_url, "42") == expected
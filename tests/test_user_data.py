@@ -0,0 +1,198 @@
+"""
+UserDataManager 寫入與並行更新的行為測試
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from src.constants import DEFAULT_MONEY, USER_SCHEMA_VERSION
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def test_write_through_saves_every_update(make_manager, user_data_path, count_writes):
+    """關閉寫回模式時每次更新都立即寫檔"""
+    manager = await make_manager()
+    user = await manager.get_user(1)
+    user["money"] = 42
+    await manager.update_user_data(1, user)
+
+    assert len(count_writes) == 2
+    assert _read(user_data_path)["1"]["money"] == 42
+
+
+async def test_write_behind_coalesces_updates(make_manager, user_data_path, count_writes):
+    """寫回模式下多次更新合併成一次寫檔，關閉時寫入剩餘變更"""
+    manager = await make_manager(write_behind=True, flush_interval=60, flush_threshold=1000)
+    for money in range(50):
+        user = await manager.get_user(1)
+        user["money"] = money
+        await manager.update_user_data(1, user)
+
+    assert count_writes == []
+    assert not os.path.exists(user_data_path)
+
+    await manager.close()
+
+    assert len(count_writes) == 1
+    assert _read(user_data_path)["1"]["money"] == 49
+
+
+async def test_write_behind_flushes_on_threshold(make_manager, user_data_path):
+    """待寫入的用戶數達到門檻時不必等待時間間隔"""
+    manager = await make_manager(write_behind=True, flush_interval=60, flush_threshold=3)
+    for user_id in (1, 2, 3):
+        await manager.get_user(user_id)
+    await asyncio.sleep(0.05)
+
+    assert set(_read(user_data_path)) == {"1", "2", "3"}
+
+
+async def test_write_behind_flushes_on_interval(make_manager, user_data_path):
+    """未達門檻的變更在時間間隔到時寫入"""
+    manager = await make_manager(write_behind=True, flush_interval=0.01, flush_threshold=1000)
+    await manager.get_user(1)
+    await asyncio.sleep(0.1)
+
+    assert set(_read(user_data_path)) == {"1"}
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_concurrent_incr_loses_no_updates(make_manager, backend, write_behind):
+    """大量並行的 incr 不會遺失更新，且全部寫入儲存"""
+    manager = await make_manager(backend=backend, write_behind=write_behind, flush_interval=0.01)
+    user_ids = (1, 2, 3)
+    rounds = 100
+    await asyncio.gather(
+        *(manager.incr(user_id, money=1, exp=2) for _ in range(rounds) for user_id in user_ids)
+    )
+    await manager.close()
+
+    restarted = await make_manager(backend=backend)
+
+    for users in (manager.users, restarted.users):
+        for user_id in map(str, user_ids):
+            assert users[user_id]["money"] == DEFAULT_MONEY + rounds
+            assert users[user_id]["exp"] == 2 * rounds
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_concurrent_update_fields_read_modify_write(make_manager, backend):
+    """update_fields 的讀取、修改、寫入在鎖內完成，並行時不會互相覆蓋"""
+    manager = await make_manager(backend=backend)
+
+    def add_flag(flag):
+        def apply(user):
+            user["found_flags"] = list(user["found_flags"]) + [flag]
+            return len(user["found_flags"])
+
+        return apply
+
+    counts = await asyncio.gather(
+        *(manager.update_fields(1, add_flag(f"flag{i}")) for i in range(50))
+    )
+    await manager.close()
+
+    restarted = await make_manager(backend=backend)
+
+    assert sorted(counts) == list(range(1, 51))
+    assert sorted(restarted.users["1"]["found_flags"]) == sorted(f"flag{i}" for i in range(50))
+
+
+async def test_update_fields_writes_only_changed_fields(make_manager, user_data_path):
+    """只有變更的欄位會寫入日誌；沒有變更時不寫入"""
+    manager = await make_manager(backend="journal")
+    await manager.get_user(1)
+    await manager.set_fields(1, pet_name="小白", money=DEFAULT_MONEY)
+    await manager.update_fields(1, lambda user: None)
+
+    with open(f"{user_data_path}.journal", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1]) == {"id": "1", "set": {"pet_name": "小白"}}
+
+
+async def test_user_locks_are_striped(make_manager):
+    """同一把分段鎖上的用戶互相等待，其他用戶的更新不受影響"""
+    manager = await make_manager(lock_stripes=4)
+    for user_id in (1, 2, 5):
+        await manager.get_user(user_id)
+
+    # 用戶 1 與 5 對應到同一把鎖，用戶 2 則是另一把
+    async with manager._get_user_lock("1"):
+        await asyncio.wait_for(manager.incr(2, money=1), timeout=1)
+        blocked = asyncio.ensure_future(manager.incr(5, money=1))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+    await asyncio.wait_for(blocked, timeout=1)
+
+    assert manager.users["5"]["money"] == DEFAULT_MONEY + 1
+
+
+async def test_reset_all_flags_with_concurrent_updates(make_manager):
+    """取得所有分段鎖的重置與並行的更新不會死結，也不會遺失更新"""
+    manager = await make_manager(backend="journal", lock_stripes=3)
+
+    def add_flag(user):
+        user["found_flags"] = list(user["found_flags"]) + ["flag"]
+
+    updates = [manager.update_fields(user_id, add_flag) for user_id in range(1, 21)]
+    increments = [manager.incr(user_id, money=1) for user_id in range(1, 21)]
+    await asyncio.wait_for(
+        asyncio.gather(*updates, manager.reset_all_flags(), *increments), timeout=5
+    )
+
+    for user in manager.users.values():
+        assert user["money"] == DEFAULT_MONEY + 1
+        assert user["found_flags"] in ([], ["flag"])
+
+
+def _write_legacy_users(path, count):
+    legacy = {str(i): {"name": f"user{i}", "money": 0} for i in range(1, count + 1)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+
+
+async def test_legacy_records_are_upgraded_on_access(make_manager, user_data_path):
+    """載入時不重寫舊格式資料，存取到的用戶才升級"""
+    _write_legacy_users(user_data_path, 3)
+    mtime = os.path.getmtime(user_data_path)
+    manager = await make_manager()
+
+    assert os.path.getmtime(user_data_path) == mtime
+    user = await manager.get_user(2)
+
+    assert user["schema_version"] == USER_SCHEMA_VERSION
+    assert user["found_flags"] == []
+    assert "schema_version" not in manager.users["1"]
+    assert _read(user_data_path)["2"]["schema_version"] == USER_SCHEMA_VERSION
+
+
+@pytest.mark.parametrize("backend", ["json", "journal"])
+async def test_background_migration_with_concurrent_incr(make_manager, user_data_path, backend):
+    """背景升級舊格式資料時，同時進行的 incr 不會被覆蓋，所有用戶最後都升級完成"""
+    _write_legacy_users(user_data_path, 100)
+    manager = await make_manager(backend=backend, lock_stripes=8)
+    manager.migration_batch_size = 7
+
+    manager.start_migration()
+    await asyncio.gather(*(manager.incr(i % 100 + 1, money=1) for i in range(300)))
+    await manager._migration_task
+    await manager.close()
+
+    restarted = await make_manager(backend=backend)
+
+    assert len(restarted.users) == 100
+    for user in restarted.users.values():
+        assert user["money"] == 3
+        assert user["schema_version"] == USER_SCHEMA_VERSION
+        assert user["found_flags"] == []
@@ -0,0 +1,79 @@
+"""
+用戶資料儲存後端的行為測試
+"""
+
+import json
+import os
+
+import pytest
+
+from src.constants import DEFAULT_MONEY
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_changes_survive_restart(make_manager, backend):
+    """各後端寫入的資料重新載入後完全相同，包含列表與非固定欄位"""
+    manager = await make_manager(backend=backend)
+    user = await manager.get_user(1)
+    user["money"] = 321
+    user["found_flags"] = ["flag_a", "flag_b"]
+    user["pet_name"] = "小白"
+    user["custom_field"] = {"nested": True}
+    await manager.update_user_data(1, user)
+    await manager.get_user(2)
+    await manager.close()
+
+    restarted = await make_manager(backend=backend)
+
+    user = restarted.users["1"]
+    assert user["money"] == 321
+    assert user["found_flags"] == ["flag_a", "flag_b"]
+    assert user["pet_name"] == "小白"
+    assert user["custom_field"] == {"nested": True}
+    assert user["last_sign_in"] is None
+    assert restarted.users["2"]["money"] == DEFAULT_MONEY
+
+
+async def test_sqlite_imports_existing_json(make_manager, user_data_path):
+    """第一次使用 SQLite 時匯入原本的 JSON 資料，之後以資料庫為準"""
+    with open(user_data_path, "w", encoding="utf-8") as f:
+        json.dump({"7": {"name": "舊用戶", "money": 88, "found_flags": ["x"]}}, f)
+
+    manager = await make_manager(backend="sqlite")
+    assert manager.users["7"]["money"] == 88
+    assert manager.users["7"]["found_flags"] == ["x"]
+    await manager.get_user(8)
+    await manager.close()
+
+    # 之後 JSON 檔的內容不再被匯入
+    os.remove(user_data_path)
+    restarted = await make_manager(backend="sqlite")
+    assert restarted.users["7"]["name"] == "舊用戶"
+    assert restarted.users["8"]["money"] == DEFAULT_MONEY
+
+
+async def test_sqlite_writes_only_changed_users(make_manager, user_data_path):
+    """SQLite 後端以增量寫入有變更的用戶，不會刪除其他用戶"""
+    manager = await make_manager(backend="sqlite")
+    for user_id in (1, 2, 3):
+        await manager.get_user(user_id)
+
+    written = []
+    original = manager.storage.write_changes
+
+    async def recording(changes, *args, **kwargs):
+        written.append(set(changes))
+        return await original(changes, *args, **kwargs)
+
+    manager.storage.write_changes = recording
+    user = await manager.get_user(2)
+    user["money"] = 5
+    await manager.update_user_data(2, user)
+    await manager.close()
+
+    assert written == [{"2"}]
+    restarted = await make_manager(backend="sqlite")
+    assert set(restarted.users) == {"1", "2", "3"}
+    assert restarted.users["2"]["money"] == 5